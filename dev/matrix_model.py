@@ -0,0 +1,300 @@
+import highspy
+import numpy as np
+
+BINARY = "binary"
+INTEGER = "integer"
+CONTINUOUS = "continuous"
+
+
+class MatrixModel:
+    """
+    MIP container that stores variables and constraints as NumPy blocks and passes them to HiGHS in one call
+
+    Variables are created in blocks and referred to by their integer column indices. A column index of -1 marks an entry
+    that does not exist in the model (e.g. ``tr_out_first`` for players without a price change), and such entries are
+    skipped when they appear in constraints or in the objective.
+
+    The objective is stored as a sum of per-period terms, so that the same model can report the contribution of each
+    gameweek and be re-weighted (e.g. with a different decay base) without rebuilding it.
+
+    Once passed to HiGHS, columns and rows added later can be pushed to the same instance with ``update_highs``, so the
+    solver keeps its state between re-solves.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.variables = {}
+        self.labels = {}
+        self.constraints = {}
+        self.num_col = 0
+        self.num_row = 0
+        self.col_lower = np.zeros(0)
+        self.col_upper = np.zeros(0)
+        self.integrality = np.zeros(0, dtype=bool)
+        self.row_lower = []
+        self.row_upper = []
+        self._row_idx = []
+        self._col_idx = []
+        self._values = []
+        self._obj_period = []
+        self._obj_col = []
+        self._obj_coef = []
+        self._obj_keep = []
+        self._passed = (0, 0, 0)
+
+    def add_variables(self, name, labels, vartype=BINARY, ub=None, mask=None):
+        """
+        Creates a block of variables over the product of ``labels`` and returns their column indices
+
+        Parameters
+        ----------
+        name: str
+            Name of the variable family, also used to generate column names
+        labels: list of lists
+            Index labels for each axis of the block, e.g. ``[players, gws]``
+        vartype: str
+            One of ``binary``, ``integer`` or ``continuous``
+        ub: float
+            Upper bound of the variables (defaults to 1 for binaries and infinity otherwise), all lower bounds start at 0
+        mask: np.ndarray of bool, optional
+            Only entries where ``mask`` is True are created, others get a column index of -1
+        """
+        shape = tuple(len(axis) for axis in labels)
+        cols = np.full(shape, -1, dtype=np.int64)
+        count = int(np.prod(shape)) if mask is None else int(np.count_nonzero(mask))
+        new_cols = np.arange(self.num_col, self.num_col + count, dtype=np.int64)
+        if mask is None:
+            cols[...] = new_cols.reshape(shape)
+        else:
+            cols[mask] = new_cols
+        if ub is None:
+            ub = 1 if vartype == BINARY else np.inf
+        self.col_lower = np.concatenate([self.col_lower, np.zeros(count)])
+        self.col_upper = np.concatenate([self.col_upper, np.full(count, ub, dtype=float)])
+        self.integrality = np.concatenate([self.integrality, np.full(count, vartype != CONTINUOUS)])
+        self.num_col += count
+        self.variables[name] = cols
+        self.labels[name] = [list(axis) for axis in labels]
+        return cols
+
+    def add_constraints(self, name, terms, sense, rhs):
+        """
+        Adds a family of linear constraints and returns their row indices
+
+        Parameters
+        ----------
+        name: str
+            Name of the constraint family
+        terms: list of (cols, coefs) pairs
+            ``cols`` is an integer array of shape ``(n,)`` or ``(n, k)`` with the columns used in each of the ``n`` rows,
+            and ``coefs`` is broadcast to the shape of ``cols``
+        sense: str
+            One of ``<=``, ``>=`` or ``==``
+        rhs: float or np.ndarray
+            Right hand side, broadcast to ``(n,)``
+        """
+        n = np.shape(terms[0][0])[0]
+        for term_cols, coefs in terms:
+            block = np.asarray(term_cols)
+            width = int(np.prod(block.shape[1:]))
+            values = np.broadcast_to(np.asarray(coefs, dtype=float), block.shape).reshape(n, width)
+            block = block.reshape(n, width)
+            rows = np.broadcast_to(np.arange(self.num_row, self.num_row + n)[:, None], block.shape)
+            keep = block >= 0
+            self._row_idx.append(rows[keep])
+            self._col_idx.append(block[keep])
+            self._values.append(values[keep])
+        rhs = np.broadcast_to(np.asarray(rhs, dtype=float), (n,))
+        self.row_lower.append(rhs if sense in (">=", "==") else np.full(n, -np.inf))
+        self.row_upper.append(rhs if sense in ("<=", "==") else np.full(n, np.inf))
+        row_ids = np.arange(self.num_row, self.num_row + n)
+        self.constraints[name] = np.concatenate([self.constraints[name], row_ids]) if name in self.constraints else row_ids
+        self.num_row += n
+        return row_ids
+
+    def set_bounds(self, cols, lb=None, ub=None):
+        """Tightens the bounds of the given columns, ignoring entries that do not exist"""
+        cols = np.asarray(cols)
+        keep = cols >= 0
+        if lb is not None:
+            lb = np.broadcast_to(np.asarray(lb, dtype=float), cols.shape)[keep]
+            self.col_lower[cols[keep]] = np.maximum(self.col_lower[cols[keep]], lb)
+        if ub is not None:
+            ub = np.broadcast_to(np.asarray(ub, dtype=float), cols.shape)[keep]
+            self.col_upper[cols[keep]] = np.minimum(self.col_upper[cols[keep]], ub)
+
+    def fix(self, cols, value):
+        self.set_bounds(cols, lb=value, ub=value)
+
+    def set_row_bounds(self, rows, lb=None, ub=None):
+        """Replaces the lower and/or upper bounds of the given rows"""
+        self.row_lower = [np.concatenate(self.row_lower)]
+        self.row_upper = [np.concatenate(self.row_upper)]
+        if lb is not None:
+            self.row_lower[0][rows] = lb
+        if ub is not None:
+            self.row_upper[0][rows] = ub
+
+    def add_objective(self, period, cols, coefs):
+        """
+        Adds ``coefs * x[cols]`` to the objective contribution of the given period (maximized)
+
+        Returns a handle to the added terms, which can be used to change their coefficients later with
+        ``set_objective_coefficients``.
+        """
+        cols = np.asarray(cols)
+        coefs = np.broadcast_to(np.asarray(coefs, dtype=float), cols.shape)
+        period = np.broadcast_to(np.asarray(period), cols.shape)
+        keep = cols >= 0
+        self._obj_period.append(period[keep])
+        self._obj_col.append(cols[keep])
+        self._obj_coef.append(coefs[keep])
+        self._obj_keep.append(keep)
+        return len(self._obj_coef) - 1
+
+    def set_objective_coefficients(self, handle, coefs):
+        """Replaces the coefficients of objective terms added by ``add_objective``, ``coefs`` has the shape of their ``cols``"""
+        keep = self._obj_keep[handle]
+        self._obj_coef[handle] = np.broadcast_to(np.asarray(coefs, dtype=float), keep.shape)[keep]
+
+    def objective_coefficients(self, weights):
+        """Returns the dense cost vector where each period's terms are scaled by ``weights[period]``"""
+        period, cols, coefs = self._objective_terms()
+        return np.bincount(cols, weights=coefs * np.asarray(weights, dtype=float)[period], minlength=self.num_col)
+
+    def period_values(self, x, num_periods):
+        """Returns the objective contribution of each period for the solution vector ``x``"""
+        period, cols, coefs = self._objective_terms()
+        return np.bincount(period, weights=coefs * x[cols], minlength=num_periods)
+
+    def get_values(self, x, name):
+        """Returns the values of a variable block, with zeros for entries that do not exist"""
+        cols = self.variables[name]
+        return np.where(cols >= 0, x[np.maximum(cols, 0)], 0.0)
+
+    def column_names(self):
+        names = np.empty(self.num_col, dtype=object)
+        for name, cols in self.variables.items():
+            labels = self.labels[name]
+            for key in zip(*np.nonzero(cols >= 0), strict=True):
+                key_labels = [labels[axis][i] for axis, i in enumerate(key)]
+                key_labels = [str(k) for label in key_labels for k in (label if isinstance(label, tuple) else (label,))]
+                names[cols[key]] = f"{name}[{','.join(key_labels)}]"
+        return names.tolist()
+
+    def get_matrix(self, new_rows_only=False):
+        """
+        Returns the constraint matrix in row-wise (CSR) format with duplicate entries merged
+
+        With ``new_rows_only``, only the rows added since the model was last passed to HiGHS are returned.
+        """
+        _, first_row, first_chunk = self._passed if new_rows_only else (0, 0, 0)
+        rows = np.concatenate([np.zeros(0, dtype=np.int64), *self._row_idx[first_chunk:]]) - first_row
+        cols = np.concatenate([np.zeros(0, dtype=np.int64), *self._col_idx[first_chunk:]])
+        values = np.concatenate([np.zeros(0), *self._values[first_chunk:]])
+        keys, inverse = np.unique(rows * max(self.num_col, 1) + cols, return_inverse=True)
+        values = np.bincount(inverse.ravel(), weights=values, minlength=len(keys))
+        keep = values != 0
+        keys, values = keys[keep], values[keep]
+        rows, cols = np.divmod(keys, max(self.num_col, 1))
+        start = np.searchsorted(rows, np.arange(self.num_row - first_row + 1))
+        return start, cols, values
+
+    def to_highs(self, weights, names=False):
+        """
+        Passes the model to a new ``highspy.Highs`` instance
+
+        Parameters
+        ----------
+        weights: list of float
+            Objective weight of each period
+        names: bool
+            Whether to pass column names to HiGHS, which is only needed when the model is written to a file
+        """
+        start, index, value = self.get_matrix()
+        lp = highspy.HighsLp()
+        lp.model_name_ = self.name
+        lp.num_col_ = self.num_col
+        lp.num_row_ = self.num_row
+        lp.sense_ = highspy.ObjSense.kMaximize
+        lp.col_cost_ = self.objective_coefficients(weights)
+        lp.col_lower_ = self.col_lower
+        lp.col_upper_ = self.col_upper
+        lp.row_lower_ = np.concatenate(self.row_lower) if self.row_lower else np.zeros(0)
+        lp.row_upper_ = np.concatenate(self.row_upper) if self.row_upper else np.zeros(0)
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+        lp.a_matrix_.num_col_ = self.num_col
+        lp.a_matrix_.num_row_ = self.num_row
+        lp.a_matrix_.start_ = start
+        lp.a_matrix_.index_ = index
+        lp.a_matrix_.value_ = value
+        lp.integrality_ = [highspy.HighsVarType.kInteger if i else highspy.HighsVarType.kContinuous for i in self.integrality]
+        if names:
+            lp.col_names_ = self.column_names()
+        solver_instance = highspy.Highs()
+        solver_instance.passModel(lp)
+        self._passed = (self.num_col, self.num_row, len(self._row_idx))
+        return solver_instance
+
+    def update_highs(self, solver_instance, weights):
+        """
+        Brings a HiGHS instance created by ``to_highs`` up to date with the model
+
+        New columns and rows are appended, and the costs, bounds and integrality of all columns and the bounds of all rows are
+        refreshed. Coefficients of rows already passed are not changed.
+        """
+        num_col, num_row, _ = self._passed
+        new_cols = np.arange(num_col, self.num_col)
+        if len(new_cols) > 0:
+            solver_instance.addCols(
+                len(new_cols),
+                np.zeros(len(new_cols)),
+                self.col_lower[new_cols],
+                self.col_upper[new_cols],
+                0,
+                np.zeros(len(new_cols), dtype=np.int32),
+                np.zeros(0, dtype=np.int32),
+                np.zeros(0),
+            )
+        row_lower = np.concatenate(self.row_lower) if self.row_lower else np.zeros(0)
+        row_upper = np.concatenate(self.row_upper) if self.row_upper else np.zeros(0)
+        if self.num_row > num_row:
+            start, index, value = self.get_matrix(new_rows_only=True)
+            solver_instance.addRows(
+                self.num_row - num_row,
+                row_lower[num_row:],
+                row_upper[num_row:],
+                len(index),
+                start[:-1].astype(np.int32),
+                index.astype(np.int32),
+                value,
+            )
+        if num_row > 0:
+            solver_instance.changeRowsBounds(num_row, np.arange(num_row, dtype=np.int32), row_lower[:num_row], row_upper[:num_row])
+        all_cols = np.arange(self.num_col, dtype=np.int32)
+        solver_instance.changeColsCost(self.num_col, all_cols, self.objective_coefficients(weights))
+        solver_instance.changeColsBounds(self.num_col, all_cols, self.col_lower, self.col_upper)
+        integrality = np.where(self.integrality, highspy.HighsVarType.kInteger.value, highspy.HighsVarType.kContinuous.value)
+        solver_instance.changeColsIntegrality(self.num_col, all_cols, integrality.astype(np.uint8))
+        self._passed = (self.num_col, self.num_row, len(self._row_idx))
+
+    def set_start(self, solver_instance, x, cols=None):
+        """
+        Passes ``x`` to HiGHS as a starting solution for the next run
+
+        With ``cols``, only those entries are given and HiGHS completes the rest of the solution itself.
+        """
+        if cols is None:
+            solution = highspy.HighsSolution()
+            solution.col_value = np.asarray(x, dtype=float)
+            solution.value_valid = True
+            solver_instance.setSolution(solution)
+        else:
+            cols = np.asarray(cols)
+            cols = cols[cols >= 0]
+            solver_instance.setSolution(len(cols), cols.astype(np.int32), np.asarray(x, dtype=float)[cols])
+
+    def _objective_terms(self):
+        if not self._obj_col:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+        return np.concatenate(self._obj_period), np.concatenate(self._obj_col), np.concatenate(self._obj_coef)
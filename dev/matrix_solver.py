@@ -0,0 +1,2807 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import time
+from pathlib import Path
+
+import highspy
+import numpy as np
+
+from dev.matrix_model import CONTINUOUS, INTEGER, MatrixModel
+from dev.solver import (
+    BINARY_THRESHOLD,
+    LINEUP_SIZE,
+    MAX_GAMEWEEK,
+    MAX_PLAYERS_PER_TEAM,
+    SQUAD_SIZE,
+    build_player_week_matrices,
+    get_best_feasible_solution,
+    get_chip_gws,
+    get_ft_moves,
+    get_ft_state_values,
+    get_objective_coefficients,
+    get_opposing_pairs,
+    get_player_groups,
+    get_player_gws,
+    get_player_week_matrices,
+    randomize_points,
+    read_gurobi_solution,
+    run_gurobi,
+    set_highs_options,
+    summarize_solution,
+)
+from utils import get_chip_combinations, get_random_id
+
+BOUND_TOLERANCE = 1e-6  # LP bounds within this distance of an incumbent cannot improve on it
+ILLEGAL_LINEUP_PENALTY = 100  # points the heuristic takes off a gameweek in which it finds no lineup that follows the rules
+HEURISTIC_CANDIDATES = 20  # swaps with the largest raw gains that the heuristic scores on the best lineups
+RACE_CONFIGS = [{}, {"random_seed": 1}, {"random_seed": 2}, {"presolve": "off"}, {"mip_heuristic_effort": 0.3}, {"mip_heuristic_effort": 0.01}]
+RACE_STARTUP_SECS = 60  # time a racer process gets on top of the time limit to start up and build its model
+FH_BUDGET_STEP = 0.1  # prices move in steps of 0.1, so a Free Hit budget grid with this step loses nothing between levels
+
+
+def per_row(terms):
+    """Broadcasts (cols, coefs) terms against each other and flattens them, so that every entry becomes one constraint"""
+    cols = np.broadcast_arrays(*[c for c, _ in terms])
+    return [(c.ravel(), np.broadcast_to(np.asarray(v, dtype=float), c.shape).ravel()) for c, (_, v) in zip(cols, terms, strict=True)]
+
+
+def build_matrix_model(data, options):
+    """
+    Builds the same multi-period FPL model as ``solve_multi_period_fpl``, directly as NumPy blocks
+
+    Players, gameweeks and bench slots are mapped to dense integer positions, and each constraint family is generated
+    with a few array operations instead of one sasoptpy object per row. Each ``add_*`` step below adds one part of the
+    model to the problem dict that the steps share.
+
+    Parameters
+    ----------
+    data: dict
+        Pre-processed data for the problem definition
+    options: dict
+        User controlled values for the problem instance
+
+    Returns
+    -------
+    dict
+        The MatrixModel together with the sets and parameters needed to read its solutions
+    """
+    problem = get_matrix_sets(data, options)
+    add_matrix_variables(problem, options)
+    add_squad_constraints(problem, data, options)
+    add_transfer_constraints(problem, options)
+    add_ft_constraints(problem, options)
+    add_chip_constraints(problem, options)
+    add_player_rules(problem, options)
+    add_transfer_rules(problem, options)
+    add_booked_transfers(problem, options)
+    problem["lazy_opposing_play"] = add_opposing_play(problem, options)
+    add_squad_rules(problem, options)
+    if options.get("transfer_itb_buffer"):
+        add_itb_buffer(problem, float(options["transfer_itb_buffer"]))
+    add_matrix_objective(problem, options)
+    problem["free_hit"] = add_free_hit_levels(problem, data, options) if problem["fh_precompute"] else None
+    return problem
+
+
+def get_matrix_sets(data, options):
+    """Sets, dense positions and parameters of the model built by ``build_matrix_model``, with an empty MatrixModel"""
+    horizon = options.get("horizon", 3)
+    objective = options.get("objective", "decay")
+    decay_base = options.get("decay_base", 0.84)
+    fh_precompute = options.get("fh_precompute", False)
+    if fh_precompute and (options.get("no_opposing_play") in [True, "penalty"] or options.get("double_defense_pick") is True):
+        print("Free Hit precomputation does not cover opposing play and double defense rules, keeping the full Free Hit block")
+        fh_precompute = False
+
+    problem_name = f"mp_h{horizon}_regular" if objective == "regular" else f"mp_h{horizon}_o{objective[0]}_d{decay_base}"
+    merged_data = data["merged_data"]
+    next_gw = data["next_gw"]
+    last_gw = min(next_gw + horizon - 1, MAX_GAMEWEEK)
+    gws = list(range(next_gw, last_gw + 1))
+    players = merged_data.index.to_list()
+    teams = data["team_data"]["name"].to_list()
+    price_modified = np.isin(players, data["price_modified_players"])
+    buy_price = np.array([data["buy_price"][p] for p in players], dtype=float)
+    sell_price = np.array([data["sell_price"].get(p, data["buy_price"][p]) for p in players], dtype=float)
+    player_team = merged_data["name"].to_numpy()
+    points, minutes = get_player_week_matrices(data, gws)
+    bench_weights = options.get("bench_weights", {0: 0.03, 1: 0.21, 2: 0.06, 3: 0.002})
+
+    return {
+        "model": MatrixModel(name=problem_name),
+        "problem_name": problem_name,
+        "weights": np.ones(len(gws)) if objective == "regular" else np.power(decay_base, np.array(gws) - next_gw),
+        "merged_data": merged_data,
+        "type_data": data["type_data"],
+        "fixtures": data["fixtures"],
+        "initial_squad": data["initial_squad"],
+        "players": players,
+        "teams": teams,
+        "gws": gws,
+        "all_gw": [next_gw - 1, *gws],
+        "next_gw": next_gw,
+        "last_gw": last_gw,
+        "order": [0, 1, 2, 3],
+        "ft_states": [0, 1, 2, 3, 4, 5],
+        "player_index": {p: i for i, p in enumerate(players)},
+        "gw_index": {w: j for j, w in enumerate(gws)},
+        "all_gw_index": {w: j for j, w in enumerate([next_gw - 1, *gws])},
+        "player_type": merged_data["element_type"].to_numpy(),
+        "player_pos": merged_data["Pos"].to_numpy(),
+        "team_players": {t: np.flatnonzero(player_team == t) for t in teams},
+        "points": points,
+        "minutes": minutes,
+        "buy_price": buy_price,
+        "sell_price": sell_price,
+        "fh_sell_price": np.where(price_modified, sell_price, buy_price),
+        "price_modified": price_modified,
+        "itb": 100 if options.get("preseason", False) else data["itb"],
+        "itb_loss_per_transfer": options.get("itb_loss_per_transfer", None) or 0,
+        "compact_lineup": options.get("lineup_formulation", "full") == "compact",
+        "fh_precompute": fh_precompute,
+        "vcap_weight": options.get("vcap_weight", 0.1),
+        "bench_weights": {int(key): value for (key, value) in bench_weights.items()},
+    }
+
+
+def add_matrix_variables(problem, options):
+    """Adds the variables of the model, and the transfer out pairs (regular and first sales) as ``transfer_out``"""
+    model = problem["model"]
+    players, gws, all_gw, order = problem["players"], problem["gws"], problem["all_gw"], problem["order"]
+    num_gws = len(gws)
+    model.add_variables("squad", [players, all_gw])
+    if not problem["fh_precompute"]:
+        model.add_variables("squad_fh", [players, gws])
+    model.add_variables("lineup", [players, gws])
+    model.add_variables("captain", [players, gws])
+    if problem["compact_lineup"]:
+        # vicecap and bench only pick among integral lineup and squad entries, so they can stay continuous, and bench slot 0
+        # is only created for goalkeepers and the other slots only for outfield players
+        model.add_variables("vicecap", [players, gws], CONTINUOUS, ub=1)
+        bench_mask = (problem["player_type"] == 1)[:, None, None] == (np.array(order) == 0)[None, None, :]
+        model.add_variables("bench", [players, gws, order], CONTINUOUS, ub=1, mask=np.broadcast_to(bench_mask, (len(players), num_gws, len(order))))
+    else:
+        model.add_variables("vicecap", [players, gws])
+        model.add_variables("bench", [players, gws, order])
+    model.add_variables("transfer_in", [players, gws])
+    first = model.add_variables("tr_out_first", [players, gws], mask=np.repeat(problem["price_modified"][:, None], num_gws, axis=1))
+    regular = model.add_variables("tr_out_reg", [players, gws])
+    problem["transfer_out"] = np.stack([regular, first], axis=-1)
+    model.add_variables("itb", [all_gw], CONTINUOUS)
+    model.add_variables("ft", [all_gw], INTEGER, ub=5)
+    if options.get("ft_formulation", "big_m") != "state":
+        model.add_variables("ft_above", [gws])
+        model.add_variables("ft_below", [gws])
+    model.add_variables("ft_state", [gws, problem["ft_states"]])
+    model.add_variables("pt", [gws], INTEGER)
+    model.add_variables("aux", [gws])
+    model.add_variables("trc", [gws], INTEGER, ub=SQUAD_SIZE)
+    for chip in ["wc", "bb", "fh"]:
+        model.add_variables(f"use_{chip}", [gws])
+    if problem["compact_lineup"]:
+        # TC is picked per gameweek and follows the captain
+        model.add_variables("use_tc", [players, gws], CONTINUOUS, ub=1)
+        model.add_variables("tc_chip", [gws])
+    else:
+        model.add_variables("use_tc", [players, gws])
+
+
+def fh_empty(problem, count, fh_cols=None):
+    """Terms that leave the regular lineup, bench and captains empty in a Free Hit week, with precomputed Free Hit values"""
+    if not problem["fh_precompute"]:
+        return []
+    return [(problem["model"].variables["use_fh"] if fh_cols is None else fh_cols, count)]
+
+
+def add_squad_constraints(problem, data, options):
+    """Adds the initial conditions, the squad, lineup, bench and captain counts and links, and the formation and team limits"""
+    model = problem["model"]
+    v = model.variables
+    squad, lineup, bench, use_fh, use_bb = v["squad"], v["lineup"], v["bench"], v["use_fh"], v["use_bb"]
+    squad_fh = v.get("squad_fh")
+    type_data = problem["type_data"]
+    player_type = problem["player_type"]
+    num_players = len(problem["players"])
+    initial_ft = max(0, data.get("ft", 1))
+
+    # Initial conditions
+    model.fix(squad[:, 0], np.isin(problem["players"], data["initial_squad"]))
+    model.fix(v["itb"][0], problem["itb"])
+    model.add_constraints("initial_ft", [(v["ft"][1:2], 1), (v["use_wc"][0:1], initial_ft - data.get("ft_base", 1))], "==", initial_ft)
+    model.set_bounds(v["ft"][2:], lb=1)
+
+    # Constraints
+    model.add_constraints("squad_count", [(squad[:, 1:].T, 1)], "==", SQUAD_SIZE)
+    model.add_constraints("lineup_count", [(lineup.T, 1), (use_bb, -(SQUAD_SIZE - LINEUP_SIZE)), *fh_empty(problem, LINEUP_SIZE)], "==", LINEUP_SIZE)
+    model.add_constraints("bench_gk", [(bench[player_type == 1, :, 0].T, 1), (use_bb, 1), *fh_empty(problem, 1)], "==", 1)
+    model.add_constraints(
+        "bench_count",
+        [(bench[:, :, 1:].transpose(1, 2, 0).reshape(-1, num_players), 1), (np.repeat(use_bb, 3), 1), *fh_empty(problem, 1, np.repeat(use_fh, 3))],
+        "==",
+        1,
+    )
+    model.add_constraints("captain_count", [(v["captain"].T, 1), *fh_empty(problem, 1)], "==", 1)
+    model.add_constraints("vicecap_count", [(v["vicecap"].T, 1), *fh_empty(problem, 1)], "==", 1)
+    if squad_fh is not None:
+        model.add_constraints("squad_fh_count", [(squad_fh.T, 1), (use_fh, -SQUAD_SIZE)], "==", 0)
+    if problem["compact_lineup"]:
+        add_compact_lineup_constraints(problem)
+    else:
+        add_full_lineup_constraints(problem)
+    for t in type_data.index:
+        type_players = player_type == t
+        squad_select = type_data.loc[t, "squad_select"]
+        squad_min_play = type_data.loc[t, "squad_min_play"]
+        model.add_constraints("valid_formation_lb", [(lineup[type_players].T, 1), *fh_empty(problem, squad_min_play)], ">=", squad_min_play)
+        model.add_constraints("valid_formation_ub", [(lineup[type_players].T, 1), (use_bb, -1)], "<=", type_data.loc[t, "squad_max_play"])
+        model.add_constraints("valid_squad", [(squad[type_players, 1:].T, 1)], "==", squad_select)
+        if squad_fh is not None:
+            model.add_constraints("valid_squad_fh", [(squad_fh[type_players].T, 1), (use_fh, -squad_select)], "==", 0)
+    add_team_limits(problem, data)
+
+
+def add_compact_lineup_constraints(problem):
+    """Adds the lineup, bench and captain links of the compact lineup formulation"""
+    model = problem["model"]
+    v = model.variables
+    lineup, bench, squad = v["lineup"], v["bench"], v["squad"]
+    # a squad player fills at most one lineup or bench slot, and captain and vicecap share a lineup spot
+    player_slots = [(lineup.ravel(), 1), (bench.reshape(-1, len(problem["order"])), 1)]
+    if problem["fh_precompute"]:
+        model.add_constraints("lineup_squad_rel", [*player_slots, (squad[:, 1:].ravel(), -1)], "<=", 0)
+    else:
+        fh_cols = np.tile(v["use_fh"], len(problem["players"]))
+        model.add_constraints("lineup_squad_rel", [*player_slots, (squad[:, 1:].ravel(), -1), (fh_cols, -1)], "<=", 0)
+        model.add_constraints("lineup_squad_fh_rel", [*player_slots, (v["squad_fh"].ravel(), -1), (fh_cols, 1)], "<=", 1)
+    model.add_constraints("captain_vicecap_rel", per_row([(v["captain"], 1), (v["vicecap"], 1), (lineup, -1)]), "<=", 0)
+
+
+def add_full_lineup_constraints(problem):
+    """Adds the lineup, bench and captain links of the full lineup formulation"""
+    model = problem["model"]
+    v = model.variables
+    lineup, bench, squad, captain, vicecap, use_fh = v["lineup"], v["bench"], v["squad"], v["captain"], v["vicecap"], v["use_fh"]
+    if problem["fh_precompute"]:
+        # the lineup is empty in a Free Hit week, so it always comes from the regular squad, which also tightens the LP
+        model.add_constraints("lineup_squad_rel", per_row([(lineup, 1), (squad[:, 1:], -1)]), "<=", 0)
+        model.add_constraints("bench_squad_rel", per_row([(bench, 1), (squad[:, 1:, None], -1)]), "<=", 0)
+    else:
+        squad_fh = v["squad_fh"]
+        model.add_constraints("lineup_squad_rel", per_row([(lineup, 1), (squad[:, 1:], -1), (use_fh, -1)]), "<=", 0)
+        model.add_constraints("bench_squad_rel", per_row([(bench, 1), (squad[:, 1:, None], -1), (use_fh[:, None], -1)]), "<=", 0)
+        model.add_constraints("lineup_squad_fh_rel", per_row([(lineup, 1), (squad_fh, -1), (use_fh, 1)]), "<=", 1)
+        model.add_constraints("bench_squad_fh_rel", per_row([(bench, 1), (squad_fh[:, :, None], -1), (use_fh[:, None], 1)]), "<=", 1)
+    model.add_constraints("captain_lineup_rel", per_row([(captain, 1), (lineup, -1)]), "<=", 0)
+    model.add_constraints("vicecap_lineup_rel", per_row([(vicecap, 1), (lineup, -1)]), "<=", 0)
+    model.add_constraints("cap_vc_rel", per_row([(captain, 1), (vicecap, 1)]), "<=", 1)
+    fh_cols = np.tile(use_fh, len(problem["players"]))
+    model.add_constraints(
+        "lineup_bench_rel", [(lineup.ravel(), 1), (bench.reshape(-1, len(problem["order"])), 1), *fh_empty(problem, 1, fh_cols)], "<=", 1
+    )
+
+
+def add_team_limits(problem, data):
+    """Adds the limit of players from each team, to the regular and the Free Hit squads"""
+    model = problem["model"]
+    v = model.variables
+    squad = v["squad"]
+    team_players = problem["team_players"]
+    # special case where user's current squad has too many players from the same team
+    # only works for 4 players from same team at the moment
+    if data["max_players_from_team"] > MAX_PLAYERS_PER_TEAM:
+        no_transfer = model.add_variables("no_transfer", [problem["gws"]])
+        model.add_constraints("no_transfer_1", [(v["trc"], 1), (no_transfer, SQUAD_SIZE)], "<=", SQUAD_SIZE)
+        model.add_constraints("no_transfer_2", [(v["trc"], 1), (no_transfer, SQUAD_SIZE)], ">=", 1)
+        for t in problem["teams"]:
+            model.add_constraints("team_limit", [(squad[team_players[t], 1:].T, 1), (no_transfer, -1)], "<=", MAX_PLAYERS_PER_TEAM)
+    else:  # normal case where user has a valid squad
+        for t in problem["teams"]:
+            model.add_constraints("team_limit", [(squad[team_players[t]].T, 1)], "<=", MAX_PLAYERS_PER_TEAM)
+
+    if not problem["fh_precompute"]:
+        for t in problem["teams"]:
+            model.add_constraints("team_limit_fh", [(v["squad_fh"][team_players[t]].T, 1), (v["use_fh"], -MAX_PLAYERS_PER_TEAM)], "<=", 0)
+
+
+def add_transfer_constraints(problem, options):
+    """Adds the squad and budget updates, the Free Hit budget, the multiple-sell fix and the transfer counts"""
+    model = problem["model"]
+    v = model.variables
+    squad, transfer_in, first, regular, in_the_bank, transfer_count = (
+        v[name] for name in ["squad", "transfer_in", "tr_out_first", "tr_out_reg", "itb", "trc"]
+    )
+    num_gws = len(problem["gws"])
+    num_transfers = problem["transfer_out"].transpose(1, 0, 2).reshape(num_gws, -1)
+    model.add_constraints(
+        "squad_transfer_rel", per_row([(squad[:, 1:], 1), (squad[:, :-1], -1), (transfer_in, -1), (regular, 1), (first, 1)]), "==", 0
+    )
+    model.add_constraints(
+        "cont_budget",
+        [
+            (in_the_bank[1:], 1),
+            (in_the_bank[:-1], -1),
+            (first.T, -problem["sell_price"]),
+            (regular.T, -problem["buy_price"]),
+            (transfer_in.T, problem["buy_price"]),
+            (transfer_count, np.where(np.array(problem["gws"]) > problem["next_gw"], problem["itb_loss_per_transfer"], 0)),
+        ],
+        "==",
+        0,
+    )
+    if not problem["fh_precompute"]:
+        fh_sell_price = problem["fh_sell_price"]
+        model.add_constraints("fh_budget", [(squad[:, :-1].T, fh_sell_price), (in_the_bank[:-1], 1), (v["squad_fh"].T, -fh_sell_price)], ">=", 0)
+    model.add_constraints("no_tr_in_fh", per_row([(transfer_in, 1), (v["use_fh"], 1)]), "<=", 1)
+    model.add_constraints("no_tr_out_fh", per_row([(regular, 1), (first, 1), (v["use_fh"], 1)]), "<=", 1)
+
+    ## Multiple-sell fix
+    first = first[problem["price_modified"]]
+    regular = regular[problem["price_modified"]]
+    num_modified = len(first)
+    model.add_constraints("multi_sell_1", per_row([(first, 1), (regular, 1)]), "<=", 1)
+    model.add_constraints(
+        "multi_sell_2",
+        [
+            (np.repeat(first, num_gws, axis=0), np.tile(num_gws * np.tril(np.ones((num_gws, num_gws))), (num_modified, 1))),
+            (np.repeat(regular, num_gws, axis=0), np.tile(-np.triu(np.ones((num_gws, num_gws))), (num_modified, 1))),
+        ],
+        ">=",
+        0,
+    )
+    model.add_constraints("multi_sell_3", [(first, 1)], "<=", 1)
+
+    ## Transfer in/out fix
+    model.add_constraints("tr_in_out_limit", per_row([(transfer_in, 1), (v["tr_out_reg"], 1), (v["tr_out_first"], 1)]), "<=", 1)
+
+    ## Tr Count Constraints
+    model.add_constraints("trc_lb", [(transfer_count, 1), (num_transfers, -1), (v["use_wc"], SQUAD_SIZE)], ">=", 0)
+    model.add_constraints("trc_ub1", [(transfer_count, 1), (num_transfers, -1)], "<=", 0)
+    model.add_constraints("trc_ub2", [(transfer_count, 1), (v["use_wc"], SQUAD_SIZE)], "<=", SQUAD_SIZE)
+    if options.get("ft_use_penalty", None) is not None:
+        model.add_objective(np.arange(num_gws), transfer_count, -options["ft_use_penalty"])
+
+
+def add_ft_constraints(problem, options):
+    """Adds the FT count of each gameweek, its state and the penalized transfers"""
+    model = problem["model"]
+    v = model.variables
+    fts, fts_state = v["ft"], v["ft_state"]
+    gws = problem["gws"]
+    ft_states = problem["ft_states"]
+    # 2056-26 afcon variation: always have 5 ft in gw16 no matter what
+    afcon_gw = 15
+    ft_gain = np.array([5 if w == afcon_gw else 1 for w in gws])
+
+    if options.get("ft_formulation", "big_m") == "state":
+        add_ft_state_moves(problem, ft_gain)
+    else:
+        add_ft_big_m(problem, ft_gain)
+
+    model.add_constraints("ftsc1", [(fts[1:], 1), (fts_state, -np.array(ft_states))], "==", 0)
+    model.add_constraints("ftsc2", [(fts_state, 1)], "==", 1)
+
+    threshold_gw = 2
+    if options.get("preseason", False) and threshold_gw in gws:
+        model.fix(fts[problem["all_gw_index"][threshold_gw]], 1)
+    num_transfers = problem["transfer_out"].transpose(1, 0, 2).reshape(len(gws), -1)
+    model.add_constraints("pen_transfer_rel", [(v["pt"], 1), (num_transfers, -1), (fts[1:], 1), (v["use_wc"], SQUAD_SIZE)], ">=", 0)
+
+
+def add_ft_state_moves(problem, ft_gain):
+    """Adds the FT STATE MOVES formulation: the FT state of the next gameweek is reached by a move from this one"""
+    model = problem["model"]
+    v = model.variables
+    gws = problem["gws"]
+    ft_states = problem["ft_states"]
+    # each move fixes the range of FTs used
+    move_range = np.zeros((len(gws) - 1, len(ft_states), len(ft_states), 2))
+    move_mask = np.zeros((len(gws) - 1, len(ft_states), len(ft_states)), dtype=bool)
+    for j, gain in enumerate(ft_gain[:-1]):
+        for (s, t), used in get_ft_moves(ft_states, gain).items():
+            move_range[j, s, t] = used
+            move_mask[j, s, t] = True
+    ft_move = model.add_variables("ft_move", [gws[:-1], ft_states, ft_states], CONTINUOUS, mask=move_mask)
+    ft_used = [(v["trc"][:-1], 1), (v["use_wc"][:-1], 1), (v["use_fh"][:-1], 1)]
+    fts_state = v["ft_state"]
+    model.add_constraints("ft_move_from", [(ft_move.reshape(-1, len(ft_states)), 1), (fts_state[:-1].ravel(), -1)], "==", 0)
+    model.add_constraints("ft_move_to", [(ft_move.transpose(0, 2, 1).reshape(-1, len(ft_states)), 1), (fts_state[1:].ravel(), -1)], "==", 0)
+    model.add_constraints("ft_used_lb", [*ft_used, (ft_move, -move_range[..., 0])], ">=", 0)
+    model.add_constraints("ft_used_ub", [*ft_used, (ft_move, -move_range[..., 1])], "<=", 0)
+
+
+def add_ft_big_m(problem, ft_gain):
+    """Adds the big-M formulation that tells apart the rollover cases of the FT count"""
+    model = problem["model"]
+    v = model.variables
+    fts, ft_above_ub, ft_below_lb = v["ft"], v["ft_above"], v["ft_below"]
+    raw_gw_ft = [(fts[1:], 1), (v["trc"], -1), (v["use_wc"], -1), (v["use_fh"], -1)]
+    m = 20  # big m for bounding constraints, picked 20 because nobody will ever get to 20 ft in a solve
+
+    # ft_above_ub[w] == 1  <=>  raw_gw_ft[w] > 5
+    model.add_constraints("ft_above_ub_lb", [*raw_gw_ft, (ft_above_ub, -m)], ">=", 6 - m - ft_gain)
+    model.add_constraints("ft_above_ub_ub", [*raw_gw_ft, (ft_above_ub, -m)], "<=", 5 - ft_gain)
+
+    # ft_below_lb[w] == 1  <=>  raw_gw_ft[w] < 1, i.e. all FTs and more were used
+    model.add_constraints("ft_below_lb_ub", [*raw_gw_ft, (ft_below_lb, m)], "<=", m - ft_gain)
+    model.add_constraints("ft_below_lb_lb", [*raw_gw_ft, (ft_below_lb, m)], ">=", 1 - ft_gain)
+
+    # FREE TRANSFER LOGIC (for w with w + 1 in gws)
+    next_fts = fts[2:]
+    raw_ft = [(c[:-1], coef) for c, coef in raw_gw_ft]
+    above = ft_above_ub[:-1]
+    below = ft_below_lb[:-1]
+    model.add_constraints("ft_cap_upper_ub", [(next_fts, 1), (above, m)], "<=", 5 + m)
+    model.add_constraints("ft_cap_upper_lb", [(next_fts, 1), (above, -m)], ">=", 5 - m)
+    model.add_constraints("ft_cap_lower_ub", [(next_fts, 1), (below, m)], "<=", 1 + m)
+    model.add_constraints("ft_cap_lower_lb", [(next_fts, 1), (below, -m)], ">=", 1 - m)
+    model.add_constraints("ft_inrange_ub", [(next_fts, 1), *[(c, -coef) for c, coef in raw_ft], (above, -m), (below, -m)], "<=", ft_gain[:-1])
+    model.add_constraints("ft_inrange_lb", [*raw_ft, (next_fts, -1), (above, -m), (below, -m)], "<=", -ft_gain[:-1])
+
+
+def add_chip_constraints(problem, options):
+    """
+    Adds the chip rules: one chip per gameweek, the forced and allowed chip gameweeks and the limit of each chip
+
+    Chip variables outside the gameweeks ``get_chip_gws`` gives are fixed to 0, as the sasoptpy builder leaves them out.
+    """
+    model = problem["model"]
+    v = model.variables
+    use_wc, use_bb, use_fh, use_tc, aux = v["use_wc"], v["use_bb"], v["use_fh"], v["use_tc"], v["aux"]
+    gws = problem["gws"]
+    gw_index = problem["gw_index"]
+    chip_limits = dict(options.get("chip_limits", {}))
+    model.add_constraints("single_chip", [(use_wc, 1), (use_fh, 1), (use_bb, 1), (use_tc.T, 1)], "<=", 1)
+    model.add_constraints("ft_after_wc", [(aux[1:], 1), (use_wc[:-1], 1)], "<=", 1)
+    model.add_constraints("ft_after_fh", [(aux[1:], 1), (use_fh[:-1], 1)], "<=", 1)
+    model.add_constraints("tc_cap_rel", per_row([(use_tc, 1), (v["captain"], -1)]), "<=", 0)
+    if problem["compact_lineup"]:
+        model.add_constraints("tc_chip_rel", [(use_tc.T, 1), (v["tc_chip"], -1)], "==", 0)
+
+    chip_vars = {"wc": use_wc, "fh": use_fh, "bb": use_bb, "tc": use_tc}
+    for chip in ["wc", "bb", "fh"]:
+        chip_gws = options.get(f"use_{chip}", [])
+        if len(chip_gws) > 0:
+            model.fix(chip_vars[chip][[gw_index[w] for w in chip_gws]], 1)
+            chip_limits[chip] = len(chip_gws)
+
+    tc = options.get("use_tc", [])
+    if len(tc) > 0:
+        model.add_constraints("force_tc", [(use_tc[:, [gw_index[w] for w in tc]].T, 1)], "==", 1)
+        chip_limits["tc"] = len(tc)
+
+    for chip, weeks in options.get("allowed_chip_gws", {}).items():
+        if len(weeks) > 0:
+            gws_banned = [gw_index[w] for w in gws if w not in weeks]
+            model.fix(chip_vars[chip][..., gws_banned], 0)
+            chip_limits[chip] = 1
+
+    for chip, weeks in options.get("forced_chip_gws", {}).items():
+        if len(weeks) > 0:
+            cols = chip_vars[chip][..., [gw_index[w] for w in weeks]]
+            model.add_constraints(f"force_{chip}_gw", [(cols.reshape(1, -1), 1)], "==", 1)
+            chip_limits[chip] = 1
+
+    chip_gws = get_chip_gws(options, gws)
+    for chip in ["wc", "bb", "fh", "tc"]:
+        cols = chip_vars[chip]
+        model.add_constraints(f"use_{chip}_limit", [(cols.reshape(1, -1), 1)], "<=", chip_limits.get(chip, 0))
+        model.fix(cols[..., [gw_index[w] for w in gws if w not in chip_gws[chip]]], 0)
+    if not problem["fh_precompute"]:
+        model.add_constraints("fh_squad_logic", per_row([(v["squad_fh"], 1), (use_fh, -1)]), "<=", 0)
+    problem["chip_limits"] = chip_limits
+
+
+def add_player_rules(problem, options):
+    """Adds the banned and locked players"""
+    model = problem["model"]
+    v = model.variables
+    squad, squad_fh = v["squad"], v.get("squad_fh")
+    player_index, gw_index, all_gw_index = problem["player_index"], problem["gw_index"], problem["all_gw_index"]
+
+    if options.get("banned", None):
+        print("OC - Banned")
+        banned_players = [player_index[p] for p in options["banned"] if p in player_index]
+        model.fix(squad[banned_players, 1:], 0)
+        if squad_fh is not None:
+            model.fix(squad_fh[banned_players], 0)
+
+    if options.get("banned_next_gw", None):
+        print("OC - Banned Next GW")
+        for p, w in get_player_gws(options["banned_next_gw"], problem["next_gw"]):
+            if p in player_index:
+                model.fix(squad[player_index[p], all_gw_index[w]], 0)
+                if squad_fh is not None:
+                    model.fix(squad_fh[player_index[p], gw_index[w]], 0)
+
+    if options.get("locked", None):
+        print("OC - Locked")
+        add_locked_players(problem, options)
+
+    if options.get("locked_next_gw", None):
+        print("OC - Locked Next GW")
+        for p, w in get_player_gws(options["locked_next_gw"], problem["next_gw"]):
+            model.fix(squad[player_index[p], all_gw_index[w]], 1)
+
+
+def add_locked_players(problem, options):
+    """Keeps each ``locked`` player in the regular or the Free Hit squad of every gameweek"""
+    model = problem["model"]
+    v = model.variables
+    squad = v["squad"]
+    locked_players = [problem["player_index"][p] for p in options["locked"]]
+    if problem["fh_precompute"]:
+        # a locked player is in the regular or the Free Hit squad, and the regular squad keeps him through a Free Hit
+        # once he is in it, so only a Free Hit in the first gameweek can take a locked player who is not in the squad yet
+        held = np.isin(options["locked"], problem["initial_squad"])
+        bought = np.array(locked_players, dtype=np.int64)[~held]
+        model.fix(squad[np.array(locked_players, dtype=np.int64)[held], 1:], 1)
+        model.fix(squad[bought, 2:], 1)
+        if len(bought) > 0:
+            model.add_constraints("lock_player", [(squad[bought, 1], 1), (np.repeat(v["use_fh"][0], len(bought)), 1)], "==", 1)
+    else:
+        model.add_constraints("lock_player", per_row([(squad[locked_players, 1:], 1), (v["squad_fh"][locked_players], 1)]), "==", 1)
+
+
+def add_booked_transfers(problem, options):
+    """Adds the transfers of ``booked_transfers``, and with ``only_booked_transfers``, bans the others of the next gameweek"""
+    model = problem["model"]
+    transfer_in = model.variables["transfer_in"]
+    player_index, gw_index = problem["player_index"], problem["gw_index"]
+    for booked_transfer in options.get("booked_transfers", []):
+        print("OC - Booked TRs")
+        transfer_gw = booked_transfer.get("gw", None)
+        if transfer_gw is None:
+            continue
+        player_in = booked_transfer.get("transfer_in", None)
+        player_out = booked_transfer.get("transfer_out", None)
+        if player_in is not None:
+            model.fix(transfer_in[player_index[player_in], gw_index[transfer_gw]], 1)
+        if player_out is not None:
+            model.add_constraints(
+                f"booked_transfer_out_{transfer_gw}_{player_out}",
+                [(problem["transfer_out"][player_index[player_out], gw_index[transfer_gw]][None, :], 1)],
+                "==",
+                1,
+            )
+
+    if options.get("only_booked_transfers") is True:
+        print("OC - Only Booked Transfers")
+        booked = [bt for bt in options.get("booked_transfers", []) if bt["gw"] == problem["next_gw"]]
+        forced_in = [bt["transfer_in"] for bt in booked if bt.get("transfer_in") is not None]
+        forced_out = [bt["transfer_out"] for bt in booked if bt.get("transfer_out") is not None]
+        model.fix(transfer_in[:, 0], np.isin(problem["players"], forced_in))
+        model.add_constraints("fix_tgw_tr_out", [(problem["transfer_out"][:, 0], 1)], "==", np.isin(problem["players"], forced_out))
+
+
+def add_transfer_rules(problem, options):
+    """Adds the optional limits on when and how many transfers are made"""
+    model = problem["model"]
+    v = model.variables
+    transfer_in, use_wc = v["transfer_in"], v["use_wc"]
+    gws = problem["gws"]
+    gw_array = np.array(gws)
+
+    if options.get("no_future_transfer", None):
+        print("OC - No Future Tr")
+        model.fix(transfer_in[:, gw_array > problem["next_gw"]], 0)
+
+    if options.get("no_transfer_last_gws", None):
+        print("OC - No TR last GWs")
+        no_tr_gws = options["no_transfer_last_gws"]
+        if len(gws) > no_tr_gws:
+            last_gws = gw_array > problem["last_gw"] - no_tr_gws
+            model.add_constraints("tr_ban_gws", [(transfer_in[:, last_gws].T, 1), (use_wc[last_gws], -SQUAD_SIZE)], "<=", 0)
+
+    if options.get("num_transfers", None) is not None:
+        print("OC - Num Transfers")
+        model.add_constraints("tr_limit", [(transfer_in[:, 0].reshape(1, -1), 1)], "==", options["num_transfers"])
+
+    if options.get("hit_limit", None):
+        print("OC - Hit Limit")
+        model.add_constraints("horizon_hit_limit", [(v["pt"].reshape(1, -1), 1)], "<=", int(options["hit_limit"]))
+
+    if options.get("weekly_hit_limit") is not None:
+        model.set_bounds(v["pt"], ub=int(options.get("weekly_hit_limit")))
+
+    if options.get("future_transfer_limit", None):
+        print("OC - Future TR Limit")
+        future_gws = [j for j, w in enumerate(gws) if w > problem["next_gw"] and w not in options.get("use_wc", [])]
+        model.add_constraints("future_tr_limit", [(transfer_in[:, future_gws].reshape(1, -1), 1)], "<=", options["future_transfer_limit"])
+
+    if options.get("no_transfer_gws", None):
+        print("OC - No TR GWs")
+        if len(options["no_transfer_gws"]) > 0:
+            model.fix(transfer_in[:, [problem["gw_index"][w] for w in options["no_transfer_gws"]]], 0)
+
+    if options.get("no_transfer_by_position", None):
+        print("OC - No TR by position")
+        if len(options["no_transfer_by_position"]) > 0:
+            # ignore w=1 as you must transfer in a full squad
+            position_players = np.isin(problem["player_pos"], options["no_transfer_by_position"])
+            later_gws = gw_array > 1
+            model.add_constraints("no_tr_by_pos", per_row([(transfer_in[position_players][:, later_gws], 1), (use_wc[later_gws], -1)]), "<=", 0)
+
+    if options.get("no_trs_except_wc", False) is True:
+        print("OC - No TRS except WC")
+        num_transfers = problem["transfer_out"].transpose(1, 0, 2).reshape(len(gws), -1)
+        model.add_constraints("wc_trs_only", [(num_transfers, 1), (use_wc, -SQUAD_SIZE)], "<=", 0)
+
+
+def add_itb_buffer(problem, buffer_amount):
+    """Keeps at least ``buffer_amount`` in the bank after each gameweek with transfers"""
+    model = problem["model"]
+    v = model.variables
+    num_transfers = problem["transfer_out"].transpose(1, 0, 2).reshape(len(problem["gws"]), -1)
+    gw_with_tr = model.add_variables("gw_with_tr", [problem["gws"]])
+    model.add_constraints("gw_with_tr_lb", [(gw_with_tr, SQUAD_SIZE), (num_transfers, -1)], ">=", 0)
+    model.add_constraints("gw_with_tr_ub", [(gw_with_tr, 1), (num_transfers, -1)], "<=", 0)
+    model.add_constraints("buffer_con", [(v["itb"][1:], 1), (gw_with_tr, -buffer_amount)], ">=", 0)
+
+
+def add_squad_rules(problem, options):
+    """Adds the optional rules on the squad and lineup makeup, the chip gameweeks and the FT states"""
+    model = problem["model"]
+    v = model.variables
+    squad, lineup = v["squad"], v["lineup"]
+    gw_array = np.array(problem["gws"])
+    player_type, player_pos, team_players = problem["player_type"], problem["player_pos"], problem["team_players"]
+
+    max_defs_per_team = options.get("max_defenders_per_team", 3)
+    if max_defs_per_team < MAX_PLAYERS_PER_TEAM:  # only add constraints if necessary
+        for t in problem["teams"]:
+            defenders = team_players[t][np.isin(player_pos[team_players[t]], ["G", "D"])]
+            model.add_constraints("defenders_per_team_limit", [(squad[defenders, 1:].T, 1)], "<=", max_defs_per_team)
+            if not problem["fh_precompute"]:
+                model.add_constraints("defenders_per_team_limit_fh", [(v["squad_fh"][defenders].T, 1), (v["use_fh"], -max_defs_per_team)], "<=", 0)
+
+    if options.get("double_defense_pick") is True:
+        print("OC - Double Defense Pick")
+        def_aux = model.add_variables("daux", [problem["teams"], problem["gws"]])
+        for k, t in enumerate(problem["teams"]):
+            gk_df_players = team_players[t][np.isin(player_type[team_players[t]], [1, 2])]
+            weekly_sum = (lineup[gk_df_players].T, 1)
+            model.add_constraints("dauxc1", [weekly_sum, (def_aux[k], -3)], "<=", 0)
+            model.add_constraints("dauxc2", [weekly_sum, (def_aux[k], -3)], ">=", -1)
+
+    if options.get("pick_prices", None) not in [None, {"G": "", "D": "", "M": "", "F": ""}]:
+        print("OC - Pick Prices")
+        add_pick_prices(problem, options["pick_prices"])
+
+    if options.get("no_gk_rotation_after", None):
+        print("OC - No GK rotation")
+        target_gw = int(options["no_gk_rotation_after"])
+        later_gws = gw_array > target_gw
+        if later_gws.any():
+            players_gk = player_type == 1
+            model.add_constraints(
+                "fixed_lineup_gk",
+                per_row(
+                    [
+                        (lineup[players_gk][:, later_gws], 1),
+                        (lineup[players_gk, problem["gw_index"][target_gw]][:, None], -1),
+                        (v["use_fh"][later_gws], 1),
+                    ]
+                ),
+                ">=",
+                0,
+            )
+
+    if len(options.get("no_chip_gws", [])) > 0:
+        print("OC - No Chip GWs")
+        no_chip_gws = [problem["gw_index"][w] for w in options["no_chip_gws"] if w in problem["gw_index"]]
+        model.fix(np.concatenate([v["use_bb"][no_chip_gws], v["use_wc"][no_chip_gws], v["use_fh"][no_chip_gws]]), 0)
+
+    for key, bound in [("force_ft_state_lb", "lb"), ("force_ft_state_ub", "ub")]:
+        if options.get(key, None):
+            print(f"OC - Force FT {bound.upper()}")
+            for gw, ft_pos in options[key]:
+                model.set_bounds(v["ft"][problem["all_gw_index"][gw]], **{bound: ft_pos})
+
+
+def add_pick_prices(problem, price_choices):
+    """Keeps as many squad players of each position near each price of ``pick_prices`` as the price is listed"""
+    model = problem["model"]
+    squad = model.variables["squad"]
+    player_pos, buy_price = problem["player_pos"], problem["buy_price"]
+    buffer = 0.2
+    for pos, val in price_choices.items():
+        if val == "":
+            continue
+        price_points = [float(i) for i in val.split(",")]
+        value_dict = {i: price_points.count(i) for i in set(price_points)}
+        for con_iter, (key, count) in enumerate(value_dict.items()):
+            target_players = (player_pos == pos) & (buy_price >= key - buffer) & (buy_price <= key + buffer)
+            model.add_constraints(f"price_point_{pos}_{con_iter}", [(squad[target_players, 1:].T, 1)], ">=", count)
+
+
+def add_opposing_play(problem, options):
+    """
+    Adds the opposing play rules of ``no_opposing_play``, as hard constraints or as penalties
+
+    Returns
+    -------
+    dict or None
+        The pairs to add lazily with ``opposing_play_lazy``, or None when they are all added up front
+    """
+    if options.get("no_opposing_play") not in [True, "penalty"]:
+        return None
+    model = problem["model"]
+    gws = problem["gws"]
+    player_index = problem["player_index"]
+    opposing_play_lazy = options.get("opposing_play_lazy", False)
+    if opposing_play_lazy and options.get("solver", "highs").lower() != "highs":
+        print("Lazy opposing play constraints need HiGHS, adding all pairs up front")
+        opposing_play_lazy = False
+
+    cp_pen_var = None
+    if options.get("no_opposing_play") is True:
+        print("OC - No Opposing Play")
+        opposing_play_group = options.get("opposing_play_group", "all")
+        opposing_pairs = {w: [] for w in gws}
+        if opposing_play_group in ["all", "position"]:
+            opposing_pairs = get_opposing_pairs(problem["fixtures"], gws, get_player_groups(problem["merged_data"]), opposing_play_group)
+        pair_index = [(player_index[p1], player_index[p2], j) for j, w in enumerate(gws) for p1, p2 in opposing_pairs[w]]
+    else:
+        print("OC - Penalty Opposing Play")
+        opposing_play_group = "all" if options.get("opposing_play_group") == "all" else "position"
+        opposing_pairs = get_opposing_pairs(problem["fixtures"], gws, get_player_groups(problem["merged_data"]), opposing_play_group)
+        minutes = problem["minutes"]
+        pairs = [(p1, p2, w, player_index[p1], player_index[p2], j) for j, w in enumerate(gws) for p1, p2 in opposing_pairs[w]]
+        pairs = [pair for pair in pairs if minutes[pair[3], pair[5]] > 0 and minutes[pair[4], pair[5]] > 0]
+        pair_index = [pair[3:] for pair in pairs]
+        cp_pen_var = model.add_variables("cp_v", [[pair[:3] for pair in pairs]])
+        opposing_play_penalty = options.get("opposing_play_penalty", 0.5)
+        model.add_objective(np.array([j for _, _, j in pair_index], dtype=np.int64), cp_pen_var, -opposing_play_penalty)
+
+    pair_index = np.array(pair_index, dtype=np.int64).reshape(-1, 3)
+    if opposing_play_lazy:
+        print("OC - Lazy Opposing Play")
+        return {"pairs": pair_index, "cp": cp_pen_var, "added": np.zeros(len(pair_index), dtype=bool)}
+    add_opposing_play_rows(model, pair_index, cp_pen_var)
+    return None
+
+
+def add_matrix_objective(problem, options):
+    """Adds the FT gain, the expected points, the hits and the value of money in the bank to the objective"""
+    model = problem["model"]
+    v = model.variables
+    num_gws = len(problem["gws"])
+    ft_value_list = options.get("ft_value_list", {})
+
+    # FT gain
+    state_values = get_ft_state_values(problem["ft_states"], options)
+    print(f"Using FT values of {ft_value_list}")
+    model.add_objective(np.arange(num_gws)[:, None], v["ft_state"], state_values)
+    model.add_objective(np.arange(1, num_gws)[:, None], v["ft_state"][:-1], -state_values)
+
+    # Objectives
+    gw_period = np.arange(num_gws)
+    slots = np.concatenate([np.stack([v["lineup"], v["captain"], v["vicecap"], v["use_tc"]], axis=-1), v["bench"]], axis=-1)
+    coefficients = get_objective_coefficients(problem["points"], problem["vcap_weight"], problem["bench_weights"])
+    problem["xp_objective"] = model.add_objective(gw_period[:, None], slots, coefficients)
+    model.add_objective(gw_period, v["pt"], -options.get("hit_cost", 4))
+    model.add_objective(gw_period, v["itb"][1:], options.get("itb_value", 0.08))
+
+
+def add_free_hit_levels(problem, data, options):
+    """
+    Values Free Hit weeks by budget level: the week picks one level its budget covers, and gets the best squad for it
+
+    Returns
+    -------
+    dict
+        The Free Hit weeks, the budget levels, the best squad of each week and level, and the objective rows of the levels
+    """
+    model = problem["model"]
+    v = model.variables
+    gws = problem["gws"]
+    use_fh = v["use_fh"]
+    fh_weeks = [problem["gw_index"][w] for w in options.get("use_fh", [])]
+    if len(fh_weeks) == 0 and problem["chip_limits"].get("fh", 0) > 0:
+        fh_weeks = [j for j in range(len(gws)) if model.col_upper[use_fh[j]] > 0]
+    # the budget of a Free Hit week only moves away from its starting value through the sale price drops of the
+    # price-modified players and itb_loss_per_transfer, so the grid covers every budget a plan can reach
+    fh_sell_price = problem["fh_sell_price"]
+    budget = problem["itb"] + fh_sell_price[np.isin(problem["players"], data["initial_squad"])].sum()
+    price_drops = np.abs(problem["buy_price"] - problem["sell_price"])[problem["price_modified"]].sum()
+    transfer_loss = problem["itb_loss_per_transfer"] * SQUAD_SIZE * max([j - 1 for j in fh_weeks], default=0)
+    lowest = np.floor((budget - price_drops - transfer_loss) / FH_BUDGET_STEP + BOUND_TOLERANCE)
+    highest = np.ceil((budget + price_drops) / FH_BUDGET_STEP - BOUND_TOLERANCE)
+    budgets = np.round(FH_BUDGET_STEP * np.arange(lowest, highest + 1), 1)
+    fh_values, fh_picks = get_free_hit_values(data, options, problem["points"], budgets, fh_weeks)
+    fh_level = model.add_variables("fh_level", [gws, budgets.tolist()], mask=np.isfinite(fh_values))
+    model.add_constraints("fh_level_count", [(fh_level, 1), (use_fh, -1)], "==", 0)
+    model.add_constraints("fh_budget", [(v["squad"][:, :-1].T, fh_sell_price), (v["itb"][:-1], 1), (fh_level, -budgets)], ">=", 0)
+    fh_objective = model.add_objective(np.arange(len(gws))[:, None], fh_level, np.where(np.isfinite(fh_values), fh_values, 0))
+    return {"weeks": fh_weeks, "budgets": budgets, "picks": fh_picks, "objective": fh_objective}
+
+
+def build_free_hit_model(data, options, order, price, budget):
+    """
+    Single-week model of a Free Hit squad, with the squad, lineup, bench and captain rules, and a budget row on ``price``
+
+    Returns
+    -------
+    tuple
+        The model and the row ID of the budget constraint
+    """
+    merged_data = data["merged_data"]
+    type_data = data["type_data"]
+    players = merged_data.index.to_list()
+    player_type = merged_data["element_type"].to_numpy()
+    player_team = merged_data["name"].to_numpy()
+    player_pos = merged_data["Pos"].to_numpy()
+
+    model = MatrixModel(name="free_hit")
+    squad = model.add_variables("squad", [players])
+    lineup = model.add_variables("lineup", [players])
+    captain = model.add_variables("captain", [players])
+    vicecap = model.add_variables("vicecap", [players])
+    bench = model.add_variables("bench", [players, order])
+    model.add_constraints("lineup_count", [(lineup[None, :], 1)], "==", LINEUP_SIZE)
+    model.add_constraints("bench_gk", [(bench[player_type == 1, 0][None, :], 1)], "==", 1)
+    model.add_constraints("bench_count", [(bench[:, 1:].T, 1)], "==", 1)
+    model.add_constraints("captain_count", [(captain[None, :], 1)], "==", 1)
+    model.add_constraints("vicecap_count", [(vicecap[None, :], 1)], "==", 1)
+    model.add_constraints("lineup_squad_rel", [(lineup, 1), (squad, -1)], "<=", 0)
+    model.add_constraints("bench_squad_rel", per_row([(bench, 1), (squad[:, None], -1)]), "<=", 0)
+    model.add_constraints("captain_lineup_rel", [(captain, 1), (lineup, -1)], "<=", 0)
+    model.add_constraints("vicecap_lineup_rel", [(vicecap, 1), (lineup, -1)], "<=", 0)
+    model.add_constraints("cap_vc_rel", [(captain, 1), (vicecap, 1)], "<=", 1)
+    model.add_constraints("lineup_bench_rel", [(lineup, 1), (bench, 1)], "<=", 1)
+    for t in type_data.index:
+        type_players = player_type == t
+        model.add_constraints("valid_formation_lb", [(lineup[type_players][None, :], 1)], ">=", type_data.loc[t, "squad_min_play"])
+        model.add_constraints("valid_formation_ub", [(lineup[type_players][None, :], 1)], "<=", type_data.loc[t, "squad_max_play"])
+        model.add_constraints("valid_squad", [(squad[type_players][None, :], 1)], "==", type_data.loc[t, "squad_select"])
+    max_defs_per_team = options.get("max_defenders_per_team", 3)
+    for t in np.unique(player_team):
+        model.add_constraints("team_limit", [(squad[player_team == t][None, :], 1)], "<=", MAX_PLAYERS_PER_TEAM)
+        if max_defs_per_team < MAX_PLAYERS_PER_TEAM:
+            defenders = (player_team == t) & np.isin(player_pos, ["G", "D"])
+            model.add_constraints("defenders_per_team_limit", [(squad[defenders][None, :], 1)], "<=", max_defs_per_team)
+    budget_row = model.add_constraints("budget", [(squad[None, :], price)], "<=", budget)
+    return model, budget_row
+
+
+def solve_free_hit_budgets(model, solver_instance, budget_row, price, budgets):
+    """
+    Solves the Free Hit model for each budget in ``budgets`` (ascending), from the largest down
+
+    Returns
+    -------
+    tuple
+        Array of values by budget, ``-inf`` where no squad fits, the picks of each budget position with a value, and the
+        number of solves that stopped before optimality
+    """
+    values = np.full(len(budgets), -np.inf)
+    picks = {}
+    unsolved = 0
+    k = len(budgets) - 1
+    while k >= 0:
+        model.set_row_bounds(budget_row, ub=budgets[k])
+        model.update_highs(solver_instance, [1])
+        solver_instance.run()
+        status = solver_instance.getModelStatus()
+        if status == highspy.HighsModelStatus.kInfeasible:
+            break  # no squad fits, and smaller budgets cannot do better
+        if status != highspy.HighsModelStatus.kOptimal:
+            unsolved += 1
+        if solver_instance.getInfo().primal_solution_status != highspy.SolutionStatus.kSolutionStatusFeasible:
+            k -= 1
+            continue
+        x = np.array(solver_instance.getSolution().col_value)
+        pick = {name: model.get_values(x, name) > BINARY_THRESHOLD for name in ["squad", "lineup", "captain", "vicecap", "bench"]}
+        cost = float(np.dot(price, pick["squad"])) if status == highspy.HighsModelStatus.kOptimal else budgets[k]
+        while k >= 0 and budgets[k] >= cost - BOUND_TOLERANCE:
+            values[k] = solver_instance.getInfo().objective_function_value
+            picks[k] = pick
+            k -= 1
+    return values, picks, unsolved
+
+
+def get_free_hit_values(data, options, points, budgets, weeks):
+    """
+    Values of the best Free Hit squad in each of the gameweek positions ``weeks``, for each budget in ``budgets`` (ascending)
+
+    A single-week model with the squad, lineup, bench and captain rules of a Free Hit week, and the same objective
+    coefficients, solved exactly. Banned players are left out, and locked players follow the lock rows of the full model:
+    the Free Hit squad takes them only in the first gameweek, and only those not in the current squad. Budgets are solved
+    from the largest down: a squad that costs ``c`` is also the best for every budget between ``c`` and the one it was
+    solved for, so these levels are filled without another solve. A solve that stops at the time limit only gives a
+    lower bound, so its squad is kept for its own level alone, and a warning is printed.
+
+    Returns
+    -------
+    tuple
+        Gameweeks x budgets array of values, ``-inf`` where no squad fits (or the week is not a candidate), and the
+        squad, lineup, captain, vicecap and bench of each ``(week, budget)`` position with a value
+    """
+    players = data["merged_data"].index.to_list()
+    buy_price = np.array([data["buy_price"][p] for p in players], dtype=float)
+    sell_price = np.array([data["sell_price"].get(p, data["buy_price"][p]) for p in players], dtype=float)
+    price = np.where(np.isin(players, data["price_modified_players"]), sell_price, buy_price)
+    bench_weights = {int(key): value for (key, value) in options.get("bench_weights", {0: 0.03, 1: 0.21, 2: 0.06, 3: 0.002}).items()}
+    order = sorted(bench_weights)
+    gws = list(range(data["next_gw"], data["next_gw"] + points.shape[1]))
+    values = np.full((len(gws), len(budgets)), -np.inf)
+    picks = {}
+    if len(weeks) == 0:
+        return values, picks
+
+    model, budget_row = build_free_hit_model(data, options, order, price, budgets[-1])
+    v = model.variables
+    squad = v["squad"]
+    model.fix(squad[np.isin(players, options.get("banned") or [])], 0)
+    locked = np.isin(players, options.get("locked") or [])
+    held = np.isin(players, data["initial_squad"])
+
+    # slots of get_objective_coefficients without the triple captain
+    slots = np.concatenate([np.stack([v["lineup"], v["captain"], v["vicecap"]], axis=-1), v["bench"]], axis=-1)
+    slot_index = [0, 1, 2, *range(4, 4 + len(order))]
+    coefficients = get_objective_coefficients(points, options.get("vcap_weight", 0.1), bench_weights)[:, :, slot_index]
+    xp_objective = model.add_objective(0, slots, coefficients[:, 0])
+    banned_in_gw = get_player_gws(options.get("banned_next_gw") or [], gws[0])
+    base_lower = model.col_lower.copy()
+    base_upper = model.col_upper.copy()
+
+    solver_instance = model.to_highs([1])
+    set_highs_options(solver_instance, options)
+    solver_instance.setOptionValue("mip_rel_gap", 0)
+    unsolved = 0
+    for j in weeks:
+        model.set_objective_coefficients(xp_objective, coefficients[:, j])
+        model.col_lower[:] = base_lower
+        model.col_upper[:] = base_upper
+        model.fix(squad[np.isin(players, [p for p, w in banned_in_gw if w == gws[j]])], 0)
+        model.fix(squad[locked & (held | (j > 0))], 0)
+        model.set_bounds(squad[locked & ~held & (j == 0)], lb=1)
+        week_values, week_picks, week_unsolved = solve_free_hit_budgets(model, solver_instance, budget_row, price, budgets)
+        values[j] = week_values
+        picks.update({(j, k): pick for k, pick in week_picks.items()})
+        unsolved += week_unsolved
+    if unsolved > 0:
+        print(f"{unsolved} Free Hit budget levels were not solved to optimality, their values are lower bounds or missing")
+    return values, picks
+
+
+def add_opposing_play_rows(model, pairs, cp_cols=None):
+    """
+    Adds the opposing-play rows for the given ``(player, player, gameweek)`` positions
+
+    Without ``cp_cols`` the two players cannot both start, otherwise the penalty variables are linked to the pairs.
+    """
+    lineup = model.variables["lineup"]
+    p1, p2, j = pairs.T
+    if cp_cols is None:
+        model.add_constraints("no_opp", [(np.stack([lineup[p1, j], lineup[p2, j]], axis=1), 1)], "<=", 1)
+    else:
+        model.add_constraints("cp1", [(lineup[p1, j], 1), (lineup[p2, j], 1), (cp_cols, -1)], "<=", 1)
+        model.add_constraints("cp2", [(cp_cols, 1), (lineup[p1, j], -1)], "<=", 0)
+        model.add_constraints("cp3", [(cp_cols, 1), (lineup[p2, j], -1)], "<=", 0)
+
+
+def solve_lazy_opposing_play(problem, solver_instance):
+    """
+    Adds the opposing pairs fielded by the current solution as cuts, and re-solves until no fielded pair is left uncovered
+
+    Each re-solve starts from the previous solution. With penalties, switching on the penalty variables of the new pairs
+    keeps it feasible. With hard constraints, only the squad and transfer plan is given and HiGHS completes the lineup.
+    """
+    model = problem["model"]
+    lazy = problem["lazy_opposing_play"]
+    lineup = model.variables["lineup"]
+    p1, p2, j = lazy["pairs"].T
+    lineup_families = ["lineup", "captain", "vicecap", "bench", "use_tc", "tc_chip", "daux"]
+    lineup_cols = np.concatenate([model.variables[name].ravel() for name in lineup_families if name in model.variables])
+    plan_cols = np.setdiff1d(np.arange(model.num_col), lineup_cols)
+
+    rounds = 0
+    cuts = 0
+    while solver_instance.getInfo().primal_solution_status == highspy.SolutionStatus.kSolutionStatusFeasible:
+        x = np.array(solver_instance.getSolution().col_value)
+        violated = ~lazy["added"] & (x[lineup[p1, j]] + x[lineup[p2, j]] > 1 + BINARY_THRESHOLD)
+        if not violated.any():
+            break
+        lazy["added"] |= violated
+        cp_cols = None if lazy["cp"] is None else lazy["cp"][violated]
+        add_opposing_play_rows(model, lazy["pairs"][violated], cp_cols)
+        model.update_highs(solver_instance, problem["weights"])
+        if cp_cols is None:
+            model.set_start(solver_instance, x, plan_cols)
+        else:
+            x[cp_cols] = 1
+            model.set_start(solver_instance, x)
+        solver_instance.run()
+        rounds += 1
+        cuts += int(violated.sum())
+    print(f"Lazy opposing play: {rounds} re-solves, {cuts} of {len(lazy['pairs'])} pairs added")
+
+
+def get_conflict_free_lineup(ranked, player_type, play_limits, conflicts):
+    """
+    Positions in ``ranked`` of a lineup picked greedily with no two players in ``conflicts``, or None when the greedy finds none
+
+    A player joins when the formation maximum of their type allows it and the open slots still cover the formation minimums.
+    """
+    minimums, maximums = play_limits.tolist()
+    types = player_type[ranked].tolist()
+    squad_conflicts = conflicts[np.ix_(ranked, ranked)].tolist()
+    counts = [0] * len(minimums)
+    missing = sum(minimums)
+    lineup = []
+    for k, t in enumerate(types):
+        fills_minimum = counts[t] < minimums[t]
+        if counts[t] == maximums[t] or len(lineup) + 1 + missing - fills_minimum > LINEUP_SIZE or any(squad_conflicts[k][m] for m in lineup):
+            continue
+        lineup.append(k)
+        counts[t] += 1
+        missing -= fills_minimum
+        if len(lineup) == LINEUP_SIZE:
+            return lineup
+    return None
+
+
+def get_heuristic_chips(problem, options, targets):
+    """
+    Chip of each gameweek index the heuristic plays one in
+
+    These are the ``use_*`` weeks, the first free week of each ``forced_chip_gws`` chip, and the chips of ``targets`` where
+    the chip limits and the model still allow them.
+    """
+    variables = problem["model"].variables
+    gw_index = problem["gw_index"]
+    chips = {}
+    for chip in ["wc", "bb", "fh", "tc"]:
+        chips.update({gw_index[w]: chip for w in options.get(f"use_{chip}", [])})
+    for chip, chip_gws in options.get("forced_chip_gws", {}).items():
+        free_weeks = [gw_index[w] for w in chip_gws if gw_index[w] not in chips]
+        if chip not in chips.values() and len(free_weeks) > 0:
+            chips[free_weeks[0]] = chip
+    for j, chip in targets["chips"].items():
+        cols = variables["use_tc"][:, j] if chip == "tc" else variables[f"use_{chip}"][j]
+        limit = options.get("chip_limits", {}).get(chip, 0)
+        if j not in chips and list(chips.values()).count(chip) < limit and problem["model"].col_upper[cols].max() > 0:
+            chips[j] = chip
+    return chips
+
+
+def get_heuristic_conflicts(problem, data, options):
+    """Gameweeks x players x players flags of the opposing players that cannot start together, None when they can"""
+    opposing_play_group = options.get("opposing_play_group", "all")
+    if options.get("no_opposing_play") is not True or opposing_play_group not in ["all", "position"]:
+        return None
+    gws = problem["gws"]
+    player_index = problem["player_index"]
+    num_players = len(problem["players"])
+    conflicts = np.zeros((len(gws), num_players, num_players), dtype=bool)
+    opposing_pairs = get_opposing_pairs(data["fixtures"], gws, get_player_groups(problem["merged_data"]), opposing_play_group)
+    for j, w in enumerate(gws):
+        pairs = np.array([(player_index[p1], player_index[p2]) for p1, p2 in opposing_pairs[w]], dtype=int).reshape(-1, 2)
+        conflicts[j, pairs[:, 0], pairs[:, 1]] = True
+        conflicts[j, pairs[:, 1], pairs[:, 0]] = True
+    return conflicts
+
+
+def get_heuristic_setup(problem, data, options, targets):
+    """Player data, limits and chips that the steps of ``get_heuristic_plan`` share"""
+    merged_data = problem["merged_data"]
+    type_data = problem["type_data"]
+    player_type = merged_data["element_type"].to_numpy()
+    player_pos = merged_data["Pos"].to_numpy()
+    num_gws = problem["points"].shape[1]
+    itb_loss = options.get("itb_loss_per_transfer") or 0
+    play_limits = np.zeros((2, player_type.max() + 1), dtype=int)
+    for t in type_data.index:
+        play_limits[:, t] = type_data.loc[t, ["squad_min_play", "squad_max_play"]]
+    chips = get_heuristic_chips(problem, options, targets)
+    # weeks where only a Wildcard allows transfers
+    wc_only = np.full(num_gws, options.get("no_trs_except_wc", False) is True)
+    no_tr_last_gws = options.get("no_transfer_last_gws", None)
+    if no_tr_last_gws and num_gws > no_tr_last_gws:
+        wc_only[num_gws - no_tr_last_gws :] = True
+    return {
+        "problem": problem,
+        "options": options,
+        "targets": targets,
+        "itb": data["itb"],
+        "ft": data.get("ft", 1),
+        "player_type": player_type,
+        "team_id": np.unique(merged_data["name"].to_numpy(), return_inverse=True)[1],
+        "defenders": np.isin(player_pos, ["G", "D"]),
+        "locked": np.isin(problem["players"], options.get("locked", [])),
+        "no_buy_positions": np.isin(player_pos, options.get("no_transfer_by_position", [])),
+        "bench_weights": np.array([problem["bench_weights"][o] for o in problem["order"]]),
+        "play_limits": play_limits,
+        "hit_cost": options.get("hit_cost", 4),
+        "ft_value": options.get("ft_value", 1.5),
+        "ft_values": get_ft_state_values(range(6), options),
+        "ft_use_penalty": options.get("ft_use_penalty") or 0,
+        "itb_value": options.get("itb_value", 0.08),
+        "itb_buffer": float(options.get("transfer_itb_buffer") or 0),
+        "hit_limit": options.get("hit_limit") or np.inf,
+        "weekly_hit_limit": np.inf if options.get("weekly_hit_limit") is None else options["weekly_hit_limit"],
+        "future_transfer_limit": options.get("future_transfer_limit") or np.inf,
+        "max_defs_per_team": options.get("max_defenders_per_team", 3),
+        "chips": chips,
+        "use_bb": np.array([chips.get(j) == "bb" for j in range(num_gws)]),
+        "use_wc": np.array([chips.get(j) == "wc" for j in range(num_gws)]),
+        "captain_weight": np.array([2 if chips.get(j) == "tc" else 1 for j in range(num_gws)]),
+        # Free Hit weeks do not depend on the plan, so plans are compared on the other weeks
+        "regular_weeks": np.array([j for j in range(num_gws) if chips.get(j) != "fh"], dtype=int),
+        "wc_only": wc_only,
+        "conflicts": get_heuristic_conflicts(problem, data, options),
+        # money lost per transfer, which the first gameweek and Wildcards do not charge
+        "transfer_loss": np.array([itb_loss if w > problem["next_gw"] and chips.get(j) != "wc" else 0 for j, w in enumerate(problem["gws"])]),
+    }
+
+
+def get_best_lineups(setup, squads, weeks):
+    """
+    Best lineups of ``squads`` (count x 15 x weeks) in the gameweek indices ``weeks``
+
+    Players are ranked by points, the formation minimums are filled first and the rest with the best players the maximums
+    allow. Lineups with opposing players are picked again by ``get_conflict_free_lineup``, and a Bench Boost week needs a
+    squad without them.
+
+    Returns
+    -------
+    tuple
+        The ranked players, their points, whether they start, the bench slot of the others (goalkeeper first) and whether
+        the lineup is legal
+    """
+    player_type, play_limits, use_bb, conflicts = setup["player_type"], setup["play_limits"], setup["use_bb"], setup["conflicts"]
+    week_points = setup["problem"]["points"][:, weeks][squads, np.arange(len(weeks))]
+    order = np.argsort(-week_points, axis=1, kind="stable")
+    ranked = np.take_along_axis(squads, order, axis=1)
+    week_points = np.take_along_axis(week_points, order, axis=1)
+    types = player_type[ranked]
+    same_type = types[..., None] == np.arange(play_limits.shape[1])
+    rank_in_type = (np.cumsum(same_type, axis=1) * same_type).sum(axis=-1) - 1
+    required = rank_in_type < play_limits[0][types]
+    optional = ~required & (rank_in_type < play_limits[1][types])
+    lineup = required | (optional & (np.cumsum(optional, axis=1) <= LINEUP_SIZE - required.sum(axis=1, keepdims=True)))
+    lineup[:, :, use_bb[weeks]] = True
+    legal = np.ones((len(squads), len(weeks)), dtype=bool)
+    if conflicts is not None:
+        week_conflicts = conflicts[weeks]
+        pair_conflicts = week_conflicts[np.arange(len(weeks)), ranked[:, :, None, :], ranked[:, None, :, :]]
+        in_conflict = (pair_conflicts & lineup[:, :, None, :] & lineup[:, None, :, :]).any(axis=(1, 2))
+        for c, k in zip(*np.nonzero(in_conflict), strict=True):
+            repaired = None if use_bb[weeks[k]] else get_conflict_free_lineup(ranked[c, :, k], player_type, play_limits, week_conflicts[k])
+            if repaired is None:
+                legal[c, k] = False
+            else:
+                lineup[c, :, k] = False
+                lineup[c, repaired, k] = True
+    bench_outfield = ~lineup & (types != 1)
+    bench_slot = np.where(lineup, -1, np.where(bench_outfield, np.cumsum(bench_outfield, axis=1), 0))
+    return ranked, week_points, lineup, bench_slot, legal
+
+
+def get_week_values(setup, squads, weeks):
+    """Expected points of the best lineups of ``squads`` (count x 15 x weeks), one column per week"""
+    _, week_points, lineup, bench_slot, legal = get_best_lineups(setup, squads, weeks)
+    # the captain and vice-captain are the two best players of the lineup
+    lineup_rank = np.where(lineup, np.cumsum(lineup, axis=1), 0)
+    slot_weights = lineup + (lineup_rank == 1) * setup["captain_weight"][weeks] + (lineup_rank == 2) * setup["problem"]["vcap_weight"]  # noqa: PLR2004
+    slot_weights = slot_weights + np.where(bench_slot >= 0, setup["bench_weights"][np.maximum(bench_slot, 0)], 0)
+    return (week_points * slot_weights).sum(axis=1) - ILLEGAL_LINEUP_PENALTY * ~legal
+
+
+def get_horizon_values(setup, squads, j):
+    """Weighted expected points of ``squads`` kept from gameweek index ``j`` on, in the units of gameweek ``j``"""
+    regular_weeks = setup["regular_weeks"]
+    weights = setup["problem"]["weights"]
+    weeks = regular_weeks[regular_weeks >= j]
+    return get_week_values(setup, np.repeat(squads[:, :, None], len(weeks), axis=2), weeks) @ weights[weeks] / weights[j]
+
+
+def get_plan_sale_prices(setup, state):
+    """Sale price of each player in the plan ``state``, which is the buy price once a player was sold and bought back"""
+    problem = setup["problem"]
+    return np.where(problem["price_modified"] & ~state["sold"], problem["sell_price"], problem["buy_price"])
+
+
+def get_legal_swaps(setup, state, j, outs, ins):
+    """Raw gains, outs and ins of the ``HEURISTIC_CANDIDATES`` best legal swaps, the raw gain being the difference of the weighted points left"""
+    problem = setup["problem"]
+    points, weights, buy_price = problem["points"], problem["weights"], problem["buy_price"]
+    team_id, defenders, player_type = setup["team_id"], setup["defenders"], setup["player_type"]
+    in_squad = state["in_squad"]
+    outs = np.flatnonzero(outs)
+    value = (points[:, j:] @ weights[j:]) / weights[j]
+    team_count = np.bincount(team_id[in_squad], minlength=team_id.max() + 1)[team_id]
+    same_team = team_id[None, :] == team_id[outs, None]
+    budget = state["itb"] + get_plan_sale_prices(setup, state)[outs] - setup["itb_buffer"] - setup["transfer_loss"][j]
+    legal = ins & ~in_squad & (player_type == player_type[outs, None]) & (buy_price <= budget[:, None] + 1e-6)
+    legal &= team_count - same_team < MAX_PLAYERS_PER_TEAM
+    if setup["max_defs_per_team"] < MAX_PLAYERS_PER_TEAM:
+        def_count = np.bincount(team_id[in_squad & defenders], minlength=team_id.max() + 1)[team_id]
+        legal &= ~defenders | (def_count - same_team * defenders[outs, None] < setup["max_defs_per_team"])
+    out_index, in_index = np.nonzero(legal)
+    gains = value[in_index] - value[outs[out_index]]
+    best = np.argsort(-gains, kind="stable")[:HEURISTIC_CANDIDATES]
+    return gains[best], outs[out_index[best]], in_index[best]
+
+
+def get_scored_swaps(setup, state, j, can_buy, can_sell):
+    """The candidate swaps of ``get_legal_swaps``, sorted by their gain on the best lineups"""
+    _, outs, ins = get_legal_swaps(setup, state, j, state["in_squad"] & can_sell, can_buy)
+    squad = np.flatnonzero(state["in_squad"])
+    squads = np.repeat(squad[None, :], len(outs) + 1, axis=0)
+    squads[1:][squad[None, :] == outs[:, None]] = ins
+    values = get_horizon_values(setup, squads, j)
+    gains = values[1:] - values[0]
+    order = np.argsort(-gains, kind="stable")
+    return gains[order], outs[order], ins[order]
+
+
+def get_transfer_threshold(setup, state, j):
+    """The gain a further transfer of gameweek index ``j`` has to beat, or None when the limits do not allow one"""
+    count = state["count"][j]
+    if setup["chips"].get(j) == "wc":
+        return 0
+    free = count < state["ft"]
+    if not free and (state["hits"] + 1 > setup["hit_limit"] or count - state["ft"] + 1 > setup["weekly_hit_limit"]):
+        return None
+    if j > 0 and state["future"] + 1 > setup["future_transfer_limit"]:
+        return None
+    return setup["ft_value"] if free else setup["hit_cost"]
+
+
+def make_plan_transfer(setup, state, j, o, i):
+    """Sells player index ``o`` and buys ``i`` in gameweek index ``j`` of the plan ``state``"""
+    price_modified = setup["problem"]["price_modified"]
+    if setup["chips"].get(j) != "wc":
+        state["hits"] += state["count"][j] >= state["ft"]
+        state["future"] += j > 0
+    state["transfer_out"][o, j, int(price_modified[o] and not state["sold"][o])] = True
+    state["transfer_in"][i, j] = True
+    state["itb"] += get_plan_sale_prices(setup, state)[o] - setup["problem"]["buy_price"][i] - setup["transfer_loss"][j]
+    state["sold"][o] = True
+    state["in_squad"][o] = False
+    state["in_squad"][i] = True
+    state["can_buy"][o] = False
+    state["can_sell"][i] = False
+    state["count"][j] += 1
+
+
+def start_plan_week(setup, state, j):
+    """Sets what can be bought and sold in gameweek index ``j`` of the plan ``state``, and makes the booked transfers"""
+    problem = setup["problem"]
+    model = problem["model"]
+    squad_cols, transfer_in_cols = model.variables["squad"], model.variables["transfer_in"]
+    player_index, player_type = problem["player_index"], setup["player_type"]
+    state["can_buy"] = (model.col_upper[transfer_in_cols[:, j]] > 0) & (model.col_upper[squad_cols[:, j + 1]] > 0)
+    state["can_sell"] = (model.col_lower[squad_cols[:, j + 1]] < 1) & ~setup["locked"]
+    if setup["chips"].get(j) != "wc":
+        state["can_buy"] &= ~setup["no_buy_positions"] & ~setup["wc_only"][j]
+    for bt in setup["options"].get("booked_transfers", []):
+        if bt.get("gw") != problem["gws"][j]:
+            continue
+        i = player_index.get(bt.get("transfer_in"))
+        o = player_index.get(bt.get("transfer_out"))
+        if i is not None and o is None:
+            outs = state["in_squad"] & state["can_sell"] & (player_type == player_type[i])
+            _, outs, _ = get_legal_swaps(setup, state, j, outs, np.arange(len(player_type)) == i)
+            o = outs[0] if len(outs) > 0 else None
+        elif o is not None and i is None:
+            _, _, ins = get_legal_swaps(setup, state, j, np.arange(len(player_type)) == o, state["can_buy"])
+            i = ins[0] if len(ins) > 0 else None
+        if i is not None and o is not None:
+            make_plan_transfer(setup, state, j, o, i)
+
+
+def continue_greedy(setup, state, j):
+    """Makes the best transfers of gameweek index ``j`` while they beat their threshold, or up to ``num_transfers``"""
+    target = setup["options"].get("num_transfers") if j == 0 else None
+    while target is None or state["count"][j] < target:
+        threshold = get_transfer_threshold(setup, state, j)
+        if threshold is None:
+            break
+        gains, outs, ins = get_scored_swaps(setup, state, j, state["can_buy"], state["can_sell"])
+        if len(gains) == 0 or (gains[0] <= threshold and target is None):
+            break
+        make_plan_transfer(setup, state, j, outs[0], ins[0])
+    return state
+
+
+def follow_target(setup, state, j, target):
+    """
+    Makes the transfers of gameweek index ``j`` toward the ``target`` squad
+
+    Its sales and buys are paired by their gain, and players the model sells are replaced by their best legal transfer.
+    """
+    model = setup["problem"]["model"]
+    must_sell = model.col_upper[model.variables["squad"][:, j + 1]] < 1
+    target = target & ~must_sell
+    while get_transfer_threshold(setup, state, j) is not None:
+        outs = state["in_squad"] & state["can_sell"] & ~target
+        _, sold, bought = get_legal_swaps(setup, state, j, outs, target & state["can_buy"])
+        if len(sold) == 0:
+            _, sold, bought = get_scored_swaps(setup, state, j, state["can_buy"], outs & must_sell)
+        if len(sold) == 0:
+            break
+        make_plan_transfer(setup, state, j, sold[0], bought[0])
+    return state
+
+
+def finish_plan_week(setup, state, j):
+    """Records the squad, FTs and money of gameweek index ``j`` and rolls the FTs"""
+    state["squad"][:, j] = state["in_squad"]
+    state["fts"][j] = state["ft"]
+    state["itbs"][j] = state["itb"]
+    # same FT rollover as the model: chip weeks use one FT, and at least one FT is left after using them all
+    used = 1 if setup["chips"].get(j) in ["wc", "fh"] else state["count"][j]
+    state["ft"] = 1 if state["ft"] - used < 1 else min(state["ft"] - used + 1, 5)
+    return state
+
+
+def get_plan_value(setup, state, j):
+    """Objective of the plan ``state`` up to gameweek index ``j``, with the squad kept and FTs rolled afterwards"""
+    chips, ft_values, regular_weeks = setup["chips"], setup["ft_values"], setup["regular_weeks"]
+    num_gws = len(state["count"])
+    squads = np.repeat(np.flatnonzero(state["in_squad"])[:, None], num_gws, axis=1)
+    squads[:, : j + 1] = np.argsort(~state["squad"][:, : j + 1], axis=0, kind="stable")[:SQUAD_SIZE]
+    fts = state["fts"].copy()
+    ft = state["ft"]
+    for k in range(j + 1, num_gws):
+        fts[k] = ft
+        ft = ft if chips.get(k) in ["wc", "fh"] else min(ft + 1, 5)
+    itbs = np.where(np.arange(num_gws) <= j, state["itbs"], state["itb"])
+    hits = np.where(setup["use_wc"], 0, np.maximum(state["count"] - fts, 0))
+    weekly = setup["itb_value"] * itbs + ft_values[fts] - setup["hit_cost"] * hits - setup["ft_use_penalty"] * state["count"]
+    weekly[1:] -= ft_values[fts[:-1]]
+    weekly[regular_weeks] += get_week_values(setup, squads[None, :, regular_weeks], regular_weeks)[0]
+    return weekly @ setup["problem"]["weights"]
+
+
+def branch_plan(state):
+    """Copy of the plan ``state`` that can be changed without changing it"""
+    return {key: value.copy() if isinstance(value, np.ndarray) else value for key, value in state.items()}
+
+
+def search_heuristic_plan(setup, in_squad, beam_width):
+    """Runs the beam search of ``get_heuristic_plan`` from the squad ``in_squad`` and returns the best plan state"""
+    problem, chips, targets = setup["problem"], setup["chips"], setup["targets"]
+    num_players, num_gws = problem["points"].shape
+    beam = [
+        {
+            "in_squad": in_squad,
+            "sold": np.zeros(num_players, dtype=bool),
+            "itb": setup["itb"],
+            "ft": max(0, setup["ft"]),
+            "hits": 0,
+            "future": 0,
+            "count": np.zeros(num_gws, dtype=int),
+            "fts": np.zeros(num_gws, dtype=int),
+            "itbs": np.zeros(num_gws),
+            "squad": np.zeros((num_players, num_gws), dtype=bool),
+            "transfer_in": np.zeros((num_players, num_gws), dtype=bool),
+            "transfer_out": np.zeros((num_players, num_gws, 2), dtype=bool),
+        }
+    ]
+    for j in range(num_gws):
+        children = []
+        for state in beam:
+            if chips.get(j) == "fh":
+                children.append(finish_plan_week(setup, branch_plan(state), j))
+                continue
+            start_plan_week(setup, state, j)
+            if j in targets["squads"]:
+                children.append(finish_plan_week(setup, follow_target(setup, branch_plan(state), j, targets["squads"][j]), j))
+                continue
+            children.append(finish_plan_week(setup, continue_greedy(setup, branch_plan(state), j), j))
+            if beam_width > 1:
+                children.extend(get_beam_branches(setup, state, j, beam_width))
+        values = [get_plan_value(setup, child, j) for child in children]
+        beam = []
+        seen = set()
+        for k in np.argsort(-np.array(values), kind="stable"):
+            key = (children[k]["in_squad"].tobytes(), children[k]["ft"], round(children[k]["itb"], 1))
+            if key not in seen and len(beam) < beam_width:
+                seen.add(key)
+                beam.append(children[k])
+    return beam[0]
+
+
+def get_beam_branches(setup, state, j, beam_width):
+    """Branches of ``state`` in gameweek index ``j`` besides the greedy one, rolling the transfer and the other greedy sequences"""
+    children = []
+    target = setup["options"].get("num_transfers") if j == 0 else None
+    if target is None or state["count"][j] >= target:
+        children.append(finish_plan_week(setup, branch_plan(state), j))
+    if get_transfer_threshold(setup, state, j) is None:
+        return children
+    _, outs, ins = get_scored_swaps(setup, state, j, state["can_buy"], state["can_sell"])
+    for o, i in zip(outs[1:beam_width], ins[1:beam_width], strict=True):
+        child = branch_plan(state)
+        make_plan_transfer(setup, child, j, o, i)
+        children.append(finish_plan_week(setup, continue_greedy(setup, child, j), j))
+    return children
+
+
+def get_plan_lineups(setup, plan):
+    """
+    Lineup, captain, vicecap, triple captain and bench picks of the squads of ``plan`` in the regular weeks
+
+    Weeks that kept the squad and chip of an earlier plan keep its lineups, which follow every lineup rule. None when a
+    week has no legal lineup, which is then left for HiGHS to complete.
+    """
+    chips, targets, regular_weeks = setup["chips"], setup["targets"], setup["regular_weeks"]
+    num_players = len(setup["player_type"])
+    squads = np.argsort(~plan["squad"][:, regular_weeks], axis=0, kind="stable")[:SQUAD_SIZE]
+    ranked, _, lineup, bench_slot, legal = get_best_lineups(setup, squads[None], regular_weeks)
+    kept = np.array(
+        [
+            j in targets["picks"] and chips.get(j) == targets["chips"].get(j) and (plan["squad"][:, j] == targets["squads"][j]).all()
+            for j in regular_weeks
+        ],
+        dtype=bool,
+    )
+    if not (legal[0] | kept).all():
+        return None
+    picks = {name: np.zeros((num_players, len(regular_weeks))) for name in ["lineup", "captain", "vicecap", "use_tc"]}
+    picks["bench"] = np.zeros((num_players, len(regular_weeks), len(setup["bench_weights"])))
+    for k, j in enumerate(regular_weeks):
+        if kept[k]:
+            previous = targets["picks"][j]
+            for name in ["lineup", "captain", "vicecap"]:
+                picks[name][:, k] = previous[name]
+            picks["use_tc"][:, k] = previous["captain"] & (chips.get(j) == "tc")
+            on_bench = previous["bench"] >= 0
+            picks["bench"][on_bench, k, previous["bench"][on_bench]] = 1
+            continue
+        players_k, lineup_k, slot_k = ranked[0, :, k], lineup[0, :, k], bench_slot[0, :, k]
+        picks["lineup"][players_k[lineup_k], k] = 1
+        picks["captain"][players_k[lineup_k][0], k] = 1
+        picks["vicecap"][players_k[lineup_k][1], k] = 1
+        picks["use_tc"][players_k[lineup_k][0], k] = chips.get(j) == "tc"
+        picks["bench"][players_k[~lineup_k], k, slot_k[~lineup_k]] = 1
+    return picks
+
+
+def get_heuristic_plan(problem, data, options, beam_width=1, targets=None):
+    """
+    Builds a plan by a beam search over transfer sequences, as a solution for the model of ``problem``
+
+    Starting from the current squad, each gameweek of a plan branches into rolling the transfer, the greedy sequence of
+    single transfers that gain the most over the rest of the horizon, and the greedy sequences that start from the next
+    best ``beam_width - 1`` transfers. Greedy sequences stop once the best gain no longer beats ``ft_value`` while free
+    transfers are left, or ``hit_cost`` after them, and a Wildcard week takes every transfer that gains. Gains are measured
+    on the best lineups. The ``beam_width`` plans with the best objective, counting the squad as kept for the rest of the
+    horizon, go on to the next gameweek. With a width of 1, only the greedy sequence is followed.
+
+    Each week fields its best lineup and bench and captains its top scorer. With ``no_opposing_play``, lineups skip opposing
+    players, and squads that cannot field a lineup without them lose ``ILLEGAL_LINEUP_PENALTY`` points a week. Chips are
+    only played where ``use_*`` or ``forced_chip_gws`` ask for them, and a Free Hit week keeps the squad and leaves its
+    Free Hit picks to HiGHS.
+
+    With ``targets`` of ``get_plan_targets``, the gameweeks of an earlier plan follow its squads instead: the transfers
+    toward each target squad are made best gain first, as far as the new prices, pool and limits allow, players the model
+    sells are replaced by their best legal transfer, and the chips of the plan are played where they are still available.
+    Weeks that end up with the squad and chip of the plan keep its lineups.
+
+    Returns
+    -------
+    tuple or None
+        Solution vector and the columns it sets, the other columns are for HiGHS to complete. None without a full current
+        squad to start from.
+    """
+    model = problem["model"]
+    variables = model.variables
+    in_squad = np.isin(problem["players"], data["initial_squad"])
+    if in_squad.sum() != SQUAD_SIZE:
+        return None
+    setup = get_heuristic_setup(problem, data, options, targets or {"squads": {}, "chips": {}, "picks": {}})
+    plan = search_heuristic_plan(setup, in_squad, beam_width)
+    chips, regular_weeks = setup["chips"], setup["regular_weeks"]
+    num_gws = len(problem["gws"])
+
+    x = np.zeros(model.num_col)
+    given = []
+
+    def assign(cols, values):
+        cols = np.asarray(cols)
+        keep = cols >= 0
+        x[cols[keep]] = np.broadcast_to(values, cols.shape)[keep]
+        given.append(cols[keep])
+
+    assign(variables["squad"][:, 1:], plan["squad"])
+    assign(variables["transfer_in"], plan["transfer_in"])
+    assign(problem["transfer_out"], plan["transfer_out"])
+    for chip in ["wc", "bb", "fh"]:
+        assign(variables[f"use_{chip}"], [chips.get(j) == chip for j in range(num_gws)])
+    if "squad_fh" in variables:
+        assign(variables["squad_fh"][:, regular_weeks], 0)
+    # lineup rules the greedy lineup does not follow, and lineups it finds no legal pick for, are left for HiGHS to complete
+    lineup_rules = options.get("double_defense_pick") is True or options.get("no_gk_rotation_after")
+    picks = None if lineup_rules else get_plan_lineups(setup, plan)
+    if picks is None:
+        return x, np.concatenate(given)
+    for name, values in picks.items():
+        assign(variables[name][:, regular_weeks], values)
+    if "tc_chip" in variables:
+        assign(variables["tc_chip"][regular_weeks], [chips.get(j) == "tc" for j in regular_weeks])
+    return x, np.concatenate(given)
+
+
+def get_plan_targets(problem, plan):
+    """
+    Maps the ``picks`` of an earlier plan onto the gameweeks and players of ``problem``, as the targets of ``get_heuristic_plan``
+
+    Players that left the pool are dropped from the squads, and a Free Hit week of the plan keeps the squad of the week
+    before it. Gameweeks past the end of the plan get no target.
+
+    Returns
+    -------
+    dict
+        ``squads``, the target squad of each gameweek index as a boolean array over the players, ``chips``, the chip of
+        each gameweek index the plan played one in, and ``picks``, the ``lineup``, ``captain`` and ``vicecap`` flags and the
+        ``bench`` slot (-1 off the bench) of the players in the gameweeks outside Free Hits
+    """
+    players = problem["players"]
+    chip_names = {"WC": "wc", "FH": "fh", "BB": "bb", "TC": "tc"}
+    targets = {"squads": {}, "chips": {}, "picks": {}}
+    for j, w in enumerate(problem["gws"]):
+        week = plan.loc[plan["week"] == w]
+        if week.empty:
+            continue
+        chip = next((c for c in week["chip"].fillna("") if c != ""), "")
+        if chip != "":
+            targets["chips"][j] = chip_names[chip]
+        if chip == "FH":
+            if j - 1 in targets["squads"]:
+                targets["squads"][j] = targets["squads"][j - 1]
+            continue
+        squad = week.loc[week["squad"] == 1]
+        targets["squads"][j] = np.isin(players, squad["id"])
+        targets["picks"][j] = {
+            name: np.isin(players, squad.loc[squad[column] == 1, "id"])
+            for name, column in [("lineup", "lineup"), ("captain", "captain"), ("vicecap", "vicecaptain")]
+        }
+        bench = np.full(len(players), -1)
+        for slot in range(len(problem["order"])):
+            bench[np.isin(players, squad.loc[squad["bench"] == slot, "id"])] = slot
+        targets["picks"][j]["bench"] = bench
+    return targets
+
+
+def solve_heuristic_plan(problem, data, options):
+    """
+    Returns a solution of the model of ``problem`` around the plan of ``get_heuristic_plan``
+
+    The columns of the plan are fixed and HiGHS fills in the rest, i.e. FTs, money and the Free Hit picks, and the lineups
+    when lineup rules apply, which presolve mostly reduces away. When the plan breaks a constraint the heuristic does not
+    follow, HiGHS repairs it at the root node of the full model.
+    """
+    model = problem["model"]
+    start = get_heuristic_plan(problem, data, options, options.get("heuristic_beam_width", 5))
+    if start is None:
+        raise ValueError("The heuristic solver needs a full current squad to start from")
+    x, cols = start
+    col_lower = model.col_lower.copy()
+    col_upper = model.col_upper.copy()
+    model.fix(cols, x[cols])
+    solver_instance = model.to_highs(problem["weights"])
+    set_highs_options(solver_instance, options)
+    solver_instance.run()
+    if solver_instance.getInfo().primal_solution_status != highspy.SolutionStatus.kSolutionStatusFeasible:
+        # the root node of the full model usually repairs the plan, the full solve is the last resort
+        print("Heuristic plan breaks a constraint of the model, repairing it at the root node of the full model")
+        model.col_lower[:] = col_lower
+        model.col_upper[:] = col_upper
+        model.update_highs(solver_instance, problem["weights"])
+        model.set_start(solver_instance, x, cols)
+        _, max_nodes = solver_instance.getOptionValue("mip_max_nodes")
+        solver_instance.setOptionValue("mip_max_nodes", 1)
+        solver_instance.run()
+        solver_instance.setOptionValue("mip_max_nodes", max_nodes)
+        if solver_instance.getInfo().primal_solution_status != highspy.SolutionStatus.kSolutionStatusFeasible:
+            print("Root node found no plan, solving the full model")
+            solver_instance.run()
+    if problem["lazy_opposing_play"] is not None:
+        solve_lazy_opposing_play(problem, solver_instance)
+    return np.array(solver_instance.getSolution().col_value)
+
+
+def track_incumbents(solver_instance):
+    """Returns a list that HiGHS fills with the running time and objective of each improving solution it finds"""
+    incumbents = []
+    solver_instance.cbMipImprovingSolution.subscribe(lambda e: incumbents.append((e.data_out.running_time, e.data_out.objective_function_value)))
+    return incumbents
+
+
+def run_racer(race, config, index, results):
+    """Solves the model of ``race`` with HiGHS under the options of ``config`` and puts its result on the ``results`` queue"""
+    try:
+        model = race["model"]
+        solver_instance = model.to_highs(race["weights"])
+        if race["start"] is not None:
+            model.set_start(solver_instance, *race["start"])
+        set_highs_options(solver_instance, race["options"])
+        solver_instance.setOptionValue("threads", race["threads"])
+        for name, value in config.items():
+            solver_instance.setOptionValue(name, value)
+        solver_instance.run()
+        info = solver_instance.getInfo()
+        feasible = info.primal_solution_status == highspy.SolutionStatus.kSolutionStatusFeasible
+        result = {
+            "optimal": solver_instance.getModelStatus() == highspy.HighsModelStatus.kOptimal,
+            "objective": info.objective_function_value if feasible else None,
+            "gap": info.mip_gap if feasible else None,
+            "time": solver_instance.getRunTime(),
+            "x": np.array(solver_instance.getSolution().col_value) if feasible else None,
+        }
+    except Exception as e:
+        print(f"Racer {index} failed: {e}")
+        result = {"optimal": False, "objective": None, "gap": None, "time": None, "x": None}
+    results.put((index, result))
+
+
+def print_race_results(configs, finished, winner):
+    """Prints the result of each raced configuration, ``finished`` holding the results of those that finished"""
+    print("\nRace results")
+    for k, config in enumerate(configs):
+        name = ", ".join(f"{key}={value}" for key, value in config.items()) or "default options"
+        result = finished.get(k)
+        if result is None:
+            status = "stopped"
+        elif result["objective"] is None:
+            status = "no solution"
+        else:
+            kind = "optimal" if result["optimal"] else "best"
+            status = f"{kind} {result['objective']:.4f}, gap {result['gap']:.2%} after {result['time']:.2f} seconds"
+        print(f"  {k}: {name} - {status}{' (winner)' if k == winner else ''}")
+
+
+def race_highs(model, weights, options, start=None):
+    """
+    Solves ``model`` with each HiGHS configuration of ``race_configs`` in its own process and returns the winning solution
+
+    The first configuration to prove optimality within ``gap`` wins and the others are stopped, otherwise the best incumbent
+    at the time limit wins. Configurations are HiGHS options set on top of the usual ones, and share the cores of the
+    machine, so only as many configurations as there are cores are raced. The result of each configuration is printed, to
+    help tune the defaults.
+
+    Parameters
+    ----------
+    start: tuple, optional
+        Arguments of ``MatrixModel.set_start`` that every configuration starts from
+    """
+    if multiprocessing.current_process().daemon:
+        raise RuntimeError("A race starts its own processes, which a daemonic process such as a multiprocessing.Pool worker cannot do")
+    configs = options.get("race_configs") or RACE_CONFIGS
+    num_cores = os.cpu_count() or 1
+    if len(configs) > num_cores:
+        print(f"Racing the first {num_cores} of {len(configs)} configurations, one per core")
+        configs = configs[:num_cores]
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    race = {"model": model, "weights": weights, "options": options, "start": start, "threads": num_cores // len(configs)}
+    racers = [context.Process(target=run_racer, args=(race, config, k, results)) for k, config in enumerate(configs)]
+    deadline = time.time() + options.get("secs", 20 * 60) + RACE_STARTUP_SECS
+    finished = {}
+    winner = None
+    try:
+        for racer in racers:
+            racer.start()
+        while len(finished) < len(racers):
+            try:
+                k, result = results.get(timeout=max(deadline - time.time(), 1))
+            except queue.Empty:
+                break
+            finished[k] = result
+            if result["objective"] is not None and (winner is None or result["objective"] > finished[winner]["objective"]):
+                winner = k
+            if result["optimal"]:
+                winner = k
+                break
+    finally:
+        # racers that failed to start have no process to stop
+        for racer in racers:
+            if racer.pid is not None:
+                racer.terminate()
+                racer.join()
+
+    print_race_results(configs, finished, winner)
+    if winner is None:
+        raise ValueError("No configuration of the race found a solution")
+    return finished[winner]["x"]
+
+
+def get_starting_plan(problem, data, options):
+    """Starting plan of ``heuristic_start``, following the ``previous_plan`` of ``data`` when there is one, or None"""
+    previous_plan = data.get("previous_plan")
+    if not options.get("heuristic_start", False) and previous_plan is None:
+        return None
+    targets = None if previous_plan is None else get_plan_targets(problem, previous_plan)
+    start = get_heuristic_plan(problem, data, options, targets=targets)
+    if start is None:
+        print("Starting plan needs a full current squad, solving without it")
+    return start
+
+
+def run_matrix_highs(problem, solver_instance, incumbents, options, start=None):
+    """Runs HiGHS on ``solver_instance`` from ``start``, then adds the fielded opposing pairs of lazy opposing play"""
+    if start is not None:
+        problem["model"].set_start(solver_instance, *start)
+    set_highs_options(solver_instance, options)
+    incumbents.clear()
+    solver_instance.run()
+    if len(incumbents) > 0:
+        print(f"First incumbent after {incumbents[0][0]:.2f} seconds, objective {incumbents[0][1]:.4f}")
+    if problem["lazy_opposing_play"] is not None:
+        solve_lazy_opposing_play(problem, solver_instance)
+
+
+def solve_matrix_gurobi(model, weights, file_name, options):
+    """Solves ``model`` with Gurobi through the MPS file ``file_name``.mps and returns its solution vector"""
+    mps_file_name = f"{file_name}.mps"
+    sol_file_name = f"{file_name}.sol"
+    tmp_folder = Path() / "tmp"
+    tmp_folder.mkdir(exist_ok=True, parents=True)
+    model.to_highs(weights, names=True).writeModel(mps_file_name)
+    print(f"Exported problem with name: {Path(file_name).name}")
+    run_gurobi(mps_file_name, sol_file_name, options)
+
+    col_index = {name: i for i, name in enumerate(model.column_names())}
+    x = np.zeros(model.num_col)
+    for name, value in read_gurobi_solution(sol_file_name).items():
+        if name in col_index:
+            x[col_index[name]] = value
+
+    if options.get("delete_tmp", True):
+        time.sleep(0.1)
+        for name in [mps_file_name, sol_file_name]:
+            try:
+                os.unlink(name)
+            except Exception:
+                pass
+    return x
+
+
+def solve_matrix_modes(data, options):
+    """
+    Solves the multi-period FPL problem with the matrix model builder, in the mode that ``options`` ask for
+
+    Chip decomposition, pool expansion and rolling horizon need HiGHS and a single iteration, and heuristic starts, warm
+    starts and races need HiGHS, otherwise they are dropped and the full model is solved.
+    """
+    modes = [
+        ("chip_decomposition", solve_chip_decomposition, "Chip decomposition"),
+        ("pool_expansion", solve_pool_expansion, "Pool expansion"),
+        ("rolling_horizon", solve_rolling_horizon, "Rolling horizon"),
+    ]
+    highs = options.get("solver", "highs") == "highs"
+    for name, solve, label in modes:
+        if not options.get(name, False):
+            continue
+        if highs and options.get("num_iterations", 1) == 1:
+            return solve(data, options)
+        print(f"{label} needs HiGHS and a single iteration, solving the full model")
+    if options.get("solver", "highs") == "gurobi" and (
+        options.get("heuristic_start") or data.get("previous_plan") is not None or options.get("race")
+    ):
+        print("Heuristic starts, warm starts and races need HiGHS, solving without them")
+    return solve_matrix_model(data, options)
+
+
+def get_matrix_iterations(problem, options):
+    """Number of iterations and whether to race, without what the heuristic solver and lazy opposing play do not allow"""
+    num_iterations = options.get("num_iterations", 1)
+    if options.get("solver", "highs") == "heuristic" and num_iterations > 1:
+        print("The heuristic solver gives a single plan, ignoring num_iterations")
+        num_iterations = 1
+    race = options.get("race", False) and problem["lazy_opposing_play"] is None
+    if options.get("race", False) and not race:
+        print("Lazy opposing play needs a single HiGHS instance, solving without a race")
+    return num_iterations, race
+
+
+def get_warm_start(problem, solver_instance, saved_solutions):
+    """Updates ``solver_instance`` with the new cut rows, and returns the best earlier incumbent that is still feasible as a start"""
+    problem["model"].update_highs(solver_instance, problem["weights"])
+    warm_start = get_best_feasible_solution(solver_instance, saved_solutions)
+    return None if warm_start is None else (warm_start,)
+
+
+def solve_matrix_model(data, options):
+    """
+    Solves the multi-period FPL problem built by ``build_matrix_model`` and returns the same output as ``solve_multi_period_fpl``
+    """
+
+    problem = build_matrix_model(data, options)
+    model = problem["model"]
+    problem_name = problem["problem_name"]
+    problem_id = get_random_id(5)
+
+    num_iterations, race = get_matrix_iterations(problem, options)
+    solutions = []
+    solver_instance = None
+    saved_solutions = []
+
+    for iteration in range(num_iterations):
+        mps_file_name = f"tmp/{problem_name}_{problem_id}_{iteration}.mps"
+        solver = options.get("solver", "highs")
+        iteration_start = time.time()
+
+        if solver.lower() == "highs":
+            export_mps = options.get("export_mps", False)
+            if solver_instance is None:
+                solver_instance = model.to_highs(problem["weights"], names=export_mps)
+                incumbents = track_incumbents(solver_instance)
+                print(f"Built problem with name: {problem_name}_{problem_id}_{iteration}")
+                start = get_starting_plan(problem, data, options)
+            else:
+                start = get_warm_start(problem, solver_instance, saved_solutions)
+                print(f"Updated problem with name: {problem_name}_{problem_id}_{iteration}")
+            if export_mps:
+                tmp_folder = Path() / "tmp"
+                tmp_folder.mkdir(exist_ok=True, parents=True)
+                solver_instance.writeModel(mps_file_name)
+                print(f"Exported problem with name: {problem_name}_{problem_id}_{iteration}")
+            if race:
+                x = race_highs(model, problem["weights"], options, start)
+                saved_solutions.append(x)
+            else:
+                run_matrix_highs(problem, solver_instance, incumbents, options, start)
+                saved_solutions += [np.array(v.col_value) for v in solver_instance.getSavedMipSolutions()]
+                x = np.array(solver_instance.getSolution().col_value)
+
+        elif solver == "heuristic":
+            x = solve_heuristic_plan(problem, data, options)
+
+        elif solver == "gurobi":
+            x = solve_matrix_gurobi(model, problem["weights"], f"tmp/{problem_name}_{problem_id}_{iteration}", options)
+
+        x = round_solution(model, x)
+        solutions.append(generate_solution(problem, x, iteration, options))
+        print(f"Iteration {iteration} took {time.time() - iteration_start:.2f} seconds")
+
+        if num_iterations == 1:
+            return solutions
+
+        add_iteration_cut(problem, x, iteration, options)
+
+    return solutions
+
+
+def get_seed_pool(problem, data, options):
+    """
+    Players that pool expansion starts from, as a mask over ``problem["players"]``
+
+    The pool holds the current squad, the players named in ``locked``, ``keep``, ``locked_next_gw`` and ``booked_transfers``,
+    the best ``pool_expansion_size`` players of each position by expected points over the horizon, and the players that no
+    cheaper player of their position outscores. Positions with ``pick_prices`` are kept whole.
+    """
+    players = np.array(problem["players"])
+    merged_data = problem["merged_data"]
+    player_pos = merged_data["Pos"].to_numpy()
+    total_points = problem["points"].sum(axis=1)
+    size = options.get("pool_expansion_size", 10)
+
+    named = data["initial_squad"] + options.get("locked", []) + options.get("keep", [])
+    named += [x[0] if isinstance(x, list) else x for x in options.get("locked_next_gw", [])]
+    named += [bt.get(key) for bt in options.get("booked_transfers", []) for key in ["transfer_in", "transfer_out"]]
+    pool = np.isin(players, named)
+    kept_positions = [pos for pos, values in options.get("pick_prices", {}).items() if values not in [None, ""]]
+    pool |= np.isin(player_pos, kept_positions)
+    for pos in np.unique(player_pos):
+        position_players = np.flatnonzero(player_pos == pos)
+        pool[position_players[np.argsort(-total_points[position_players], kind="stable")[:size]]] = True
+        # price frontier: visited from the cheapest, a player joins when they outscore every cheaper player
+        best = -np.inf
+        for i in position_players[np.lexsort((-total_points[position_players], problem["buy_price"][position_players]))]:
+            if total_points[i] > best:
+                pool[i] = True
+                best = total_points[i]
+    return pool
+
+
+def get_pool_columns(model):
+    """
+    Squad columns of each player that pool expansion fixes to 0 outside the pool
+
+    These are the squad columns after the current gameweek and the Free Hit squad columns of the gameweeks where the Free
+    Hit can be played. The other Free Hit squad columns are already kept at 0 by ``use_fh``.
+    """
+    squad_cols = model.variables["squad"][:, 1:]
+    if "squad_fh" not in model.variables:
+        return squad_cols, np.empty((len(squad_cols), 0), dtype=int), np.empty(0, dtype=int)
+    use_fh = model.variables["use_fh"]
+    fh_weeks = model.col_upper[use_fh] > 0
+    return squad_cols, model.variables["squad_fh"][:, fh_weeks], use_fh[fh_weeks]
+
+
+def get_pool_prices(problem, solver_instance, pool):
+    """
+    Solves the LP relaxation of the model on ``pool``, adding players until it is also the LP optimum of the full pool
+
+    A player outside the pool whose squad columns have a positive reduced cost in the LP of the pool can improve the LP,
+    so they join the pool and the LP is solved again. Once no such player is left, the duals of the pool's LP are also
+    optimal for the full pool. By reduced cost fixing, a solution that moves columns off their LP bounds is then worth at
+    most the LP bound plus the reduced costs of those columns. A player outside the pool needs a squad column and a
+    ``transfer_in`` column, or a Free Hit squad column and its ``use_fh``, so the price of the player is the best of
+    these sums.
+
+    Returns
+    -------
+    tuple
+        The LP bound, and the price of each player outside the pool (``-inf`` for players in the pool). ``pool`` is grown
+        in place.
+    """
+    model = problem["model"]
+    squad_cols, fh_cols, use_fh = get_pool_columns(model)
+    player_cols = np.concatenate([squad_cols, fh_cols], axis=1)
+    base_upper = model.col_upper.copy()
+    integrality = model.integrality
+    model.integrality = np.zeros(model.num_col, dtype=bool)
+    while True:
+        model.col_upper[:] = base_upper
+        model.set_bounds(player_cols[~pool], ub=0)
+        model.update_highs(solver_instance, problem["weights"])
+        solver_instance.run()
+        if solver_instance.getModelStatus() != highspy.HighsModelStatus.kOptimal:
+            # without LP duals nothing can be priced out, so every player stays
+            prices = np.where(pool, -np.inf, np.inf)
+            break
+        col_dual = np.array(solver_instance.getSolution().col_dual)
+        reduced_costs = np.where(player_cols >= 0, col_dual[player_cols], -np.inf)
+        entering = ~pool & (reduced_costs.max(axis=1, initial=-np.inf) > BOUND_TOLERANCE)
+        if not entering.any():
+            transfer_in = model.variables["transfer_in"]
+            buy_price = np.minimum(np.where(transfer_in >= 0, col_dual[transfer_in], -np.inf), 0).max(axis=1)
+            squad_price = np.where(squad_cols >= 0, col_dual[squad_cols], -np.inf).max(axis=1) + buy_price
+            fh_price = (col_dual[fh_cols] + np.minimum(col_dual[use_fh], 0)).max(axis=1, initial=-np.inf)
+            prices = np.where(pool, -np.inf, np.maximum(squad_price, fh_price))
+            break
+        pool |= entering
+    bound = solver_instance.getInfo().objective_function_value
+    model.col_upper[:] = base_upper
+    model.integrality = integrality
+    return bound, prices
+
+
+def solve_pool_expansion(data, options):
+    """
+    Solves the multi-period FPL problem on a small player pool that grows until it provably holds the best plan
+
+    Players outside the pool are kept out of the model by fixing their squad variables to 0, which HiGHS presolve removes,
+    so each solve scales with the pool. The LP relaxation of the pool is grown first until it is optimal for the full
+    pool (``get_pool_prices``), and the MIP is then solved on the pool. A player outside the pool can only be in a better
+    plan if the LP bound plus their price is above the pool's objective. Such players join the pool and it is solved
+    again, and once none are left, the plan of the pool is optimal for every player.
+
+    Returns the same output as ``solve_multi_period_fpl`` with a single iteration.
+    """
+    problem = build_matrix_model(data, options)
+    model = problem["model"]
+    lazy = problem["lazy_opposing_play"]
+    players = problem["players"]
+    player_cols = np.concatenate(get_pool_columns(model)[:2], axis=1)
+    base_upper = model.col_upper.copy()
+    pool = get_seed_pool(problem, data, options)
+
+    solver_instance = model.to_highs(problem["weights"])
+    set_highs_options(solver_instance, options)
+    start = time.time()
+    x = None
+    rounds = 0
+    while True:
+        rounds += 1
+        if not pool.all():
+            bound, prices = get_pool_prices(problem, solver_instance, pool)
+        model.col_upper[:] = base_upper
+        model.set_bounds(player_cols[~pool], ub=0)
+        model.update_highs(solver_instance, problem["weights"])
+        if x is not None:
+            model.set_start(solver_instance, x)
+        solver_instance.run()
+        if lazy is not None:
+            solve_lazy_opposing_play(problem, solver_instance)
+        if solver_instance.getInfo().primal_solution_status != highspy.SolutionStatus.kSolutionStatusFeasible:
+            if pool.all():
+                print(f"Pool expansion round {rounds}: no plan with all {len(players)} players")
+                return []
+            print(f"Pool expansion round {rounds}: no plan with {pool.sum()} of {len(players)} players, solving the full pool")
+            pool[:] = True
+            continue
+        x = np.array(solver_instance.getSolution().col_value)
+        incumbent = solver_instance.getInfo().objective_function_value
+        if pool.all():
+            print(f"Pool expansion round {rounds}: all {len(players)} players, objective {incumbent:.4f}")
+            break
+        entering = bound + prices > incumbent + BOUND_TOLERANCE
+        print(
+            f"Pool expansion round {rounds}: {pool.sum()} of {len(players)} players, objective {incumbent:.4f}, LP bound {bound:.4f}, "
+            f"{entering.sum()} players priced in"
+        )
+        if not entering.any():
+            break
+        pool |= entering
+
+    x = round_solution(model, x)
+    print(f"Pool expansion took {time.time() - start:.2f} seconds over {rounds} rounds, no player outside the pool of {pool.sum()} improves on it")
+    if solver_instance.getModelStatus() != highspy.HighsModelStatus.kOptimal:
+        print("The last pool was not solved to optimality, the plan is not proven optimal")
+    return [generate_solution(problem, x, 0, options)]
+
+
+def get_rolling_horizon(data, options):
+    """
+    Horizon left after dropping the trailing gameweeks whose decay weight is below ``rolling_min_weight``
+
+    Gameweeks named in chip, booked transfer, FT state and per-gameweek player options are always kept.
+    """
+    horizon = options.get("horizon", 3)
+    min_weight = options.get("rolling_min_weight", 0)
+    if not min_weight or options.get("objective", "decay") == "regular":
+        return horizon
+    next_gw = data["next_gw"]
+    decay_base = options.get("decay_base", 0.84)
+    named = [w for chip in ["wc", "bb", "fh", "tc"] for w in options.get(f"use_{chip}", []) + options.get("forced_chip_gws", {}).get(chip, [])]
+    named += options.get("no_chip_gws", []) + options.get("no_transfer_gws", [])
+    named += [bt["gw"] for bt in options.get("booked_transfers", []) if bt.get("gw") is not None]
+    named += [gw for key in ["force_ft_state_lb", "force_ft_state_ub"] for gw, _ in options.get(key) or []]
+    named += [x[1] for key in ["locked_next_gw", "banned_next_gw"] for x in options.get(key) or [] if isinstance(x, list)]
+    kept = max([k + 1 for k in range(horizon) if decay_base**k >= min_weight] + [w - next_gw + 1 for w in named] + [1])
+    if kept < horizon:
+        print(f"Dropped GW{next_gw + kept}-GW{next_gw + horizon - 1}, their decay weight is below {min_weight}")
+    return min(kept, horizon)
+
+
+def get_column_weeks(problem):
+    """Gameweek of each column of the model built by ``build_matrix_model``, or -1 for columns of no gameweek"""
+    model = problem["model"]
+    week_axes = [problem["gws"], problem["all_gw"], problem["gws"][:-1]]
+    weeks = np.full(model.num_col, -1)
+    for name, cols in model.variables.items():
+        labels = model.labels[name]
+        if name == "cp_v":
+            # opposing pairs are labelled (player, player, gameweek)
+            column_weeks = np.array([w for _, _, w in labels[0]])
+        else:
+            axis = next((k for k, values in enumerate(labels) if values in week_axes), None)
+            if axis is None:
+                continue
+            column_weeks = np.array(labels[axis]).reshape([-1 if k == axis else 1 for k in range(cols.ndim)])
+        keep = cols >= 0
+        weeks[cols[keep]] = np.broadcast_to(column_weeks, cols.shape)[keep]
+    return weeks
+
+
+def solve_rolling_windows(problem, solver_instance, starts, window):
+    """
+    Solves the windows of ``solve_rolling_horizon`` that start at the gameweek indices ``starts``
+
+    The integer decisions of each window are fixed up to the start of the next. Returns the solution of the last window
+    that was solved, or None when the first is infeasible.
+    """
+    model = problem["model"]
+    gws = problem["gws"]
+    column_weeks = get_column_weeks(problem)
+    integral = model.integrality.copy()
+    x = None
+    for k, first in enumerate(starts):
+        last = gws[min(first + window, len(gws)) - 1]
+        model.integrality[:] = integral & (column_weeks <= last)
+        model.update_highs(solver_instance, problem["weights"])
+        if x is not None:
+            # integer decisions of the previous window are a partial start, HiGHS completes the rest
+            window_cols = np.flatnonzero(model.integrality & (np.abs(x - np.round(x)) < BINARY_THRESHOLD))
+            model.set_start(solver_instance, x, window_cols)
+        solver_instance.run()
+        if problem["lazy_opposing_play"] is not None:
+            solve_lazy_opposing_play(problem, solver_instance)
+        if solver_instance.getInfo().primal_solution_status != highspy.SolutionStatus.kSolutionStatusFeasible:
+            print(f"Rolling horizon window GW{gws[first]}-GW{last} is infeasible")
+            break
+        x = np.array(solver_instance.getSolution().col_value)
+        fixed_until = last if k == len(starts) - 1 else gws[starts[k + 1] - 1]
+        fixed = np.flatnonzero(integral & (column_weeks >= gws[first]) & (column_weeks <= fixed_until))
+        model.fix(fixed, np.round(x[fixed]))
+        print(f"Rolling horizon window GW{gws[first]}-GW{last} solved, fixed GW{gws[first]}-GW{fixed_until}")
+    model.integrality[:] = integral
+    return x
+
+
+def get_root_bound(data, options, time_limit):
+    """Upper bound of the model built from ``options`` after its root node in HiGHS, inf when the root is not solved in ``time_limit``"""
+    problem = build_matrix_model(data, options)
+    solver_instance = problem["model"].to_highs(problem["weights"])
+    set_highs_options(solver_instance, options)
+    solver_instance.setOptionValue("time_limit", time_limit)
+    solver_instance.setOptionValue("mip_max_nodes", 1)
+    solver_instance.run()
+    return solver_instance.getInfo().mip_dual_bound
+
+
+def solve_rolling_horizon(data, options):
+    """
+    Solves the multi-period FPL problem window by window (relax-and-fix), then polishes the assembled plan on the full model
+
+    Each window keeps the integer decisions of ``rolling_window`` gameweeks, with the later gameweeks relaxed to continuous
+    and the earlier ones fixed. After a window is solved, the integer decisions of its first ``rolling_step`` gameweeks are
+    fixed and the window slides forward, started from the integer values of the previous window. The windows share ``secs``
+    evenly with the polish, which solves the full model from the assembled plan in the time left (only its root node with
+    ``rolling_polish`` set to false), and reports the gap of the plan to the bound of the full model.
+
+    Gameweeks dropped by ``rolling_min_weight`` are left out of the windows and the polish, so the gap is then taken to
+    the root node bound of the model over the full ``horizon`` instead, built and solved after the polish.
+
+    Returns
+    -------
+    list
+        The plan, in the format of ``solve_multi_period_fpl`` with a single iteration. The bound of the full model and the
+        relative gap of the plan to it are added as ``rolling_horizon_bound`` and ``rolling_horizon_gap``, unless no bound
+        was found within ``secs``
+    """
+    full_options = options
+    options = {**options, "horizon": get_rolling_horizon(data, options)}
+    problem = build_matrix_model(data, options)
+    model = problem["model"]
+    gws = problem["gws"]
+    window = max(options.get("rolling_window", 4), 1)
+    step = min(max(options.get("rolling_step", 1), 1), window)
+    polish = options.get("rolling_polish", True)
+    secs = options.get("secs", 20 * 60)
+
+    integral = model.integrality.copy()
+    base_lower = model.col_lower.copy()
+    base_upper = model.col_upper.copy()
+    starts = [*range(0, max(len(gws) - window, 0), step), max(len(gws) - window, 0)]
+
+    solver_instance = model.to_highs(problem["weights"])
+    set_highs_options(solver_instance, options)
+    solver_instance.setOptionValue("time_limit", secs / (len(starts) + 1))
+    start_time = time.time()
+    x = solve_rolling_windows(problem, solver_instance, starts, window)
+
+    # polish and gap report on the full model
+    model.col_lower[:] = base_lower
+    model.col_upper[:] = base_upper
+    model.update_highs(solver_instance, problem["weights"])
+    if x is not None:
+        model.set_start(solver_instance, np.where(integral, np.round(x), x))
+    solver_instance.setOptionValue("time_limit", max(secs - (time.time() - start_time), 1))
+    if not polish:
+        solver_instance.setOptionValue("mip_max_nodes", 1)
+    solver_instance.run()
+    if problem["lazy_opposing_play"] is not None:
+        solve_lazy_opposing_play(problem, solver_instance)
+    info = solver_instance.getInfo()
+    plan = info.objective_function_value
+    bound = info.mip_dual_bound
+    last_gw = gws[-1]
+    if options["horizon"] < full_options.get("horizon", 3):
+        # the bound of the truncated model does not cover the dropped gameweeks
+        bound = get_root_bound(data, full_options, max(secs - (time.time() - start_time), 1))
+        last_gw = gws[0] + full_options.get("horizon", 3) - 1
+    x = round_solution(model, np.array(solver_instance.getSolution().col_value))
+    solution = generate_solution(problem, x, 0, options)
+    if np.isfinite(bound):
+        gap = (bound - plan) / max(abs(bound), BOUND_TOLERANCE)
+        print(f"Rolling horizon plan {plan:.4f}, GW{gws[0]}-GW{last_gw} model bound {bound:.4f}, gap {gap:.2%}")
+        solution = {**solution, "rolling_horizon_bound": bound, "rolling_horizon_gap": gap}
+    else:
+        print(f"Rolling horizon plan {plan:.4f}, no bound of the GW{gws[0]}-GW{last_gw} model within the time limit")
+    print(f"Rolling horizon took {time.time() - start_time:.2f} seconds over {len(starts)} windows")
+    return [solution]
+
+
+def solve_chip_combinations(data, options, combinations):
+    """
+    Solves the problem for each chip combination, as ``solve_multi_period_fpl`` would with the combination merged into ``options``
+
+    The model is built once with the swept chips left free, and each combination is enforced by changing the bounds of
+    the chip variables (and of the per-gameweek TC rows). Each solve is started from the best earlier solution that is
+    still feasible, or otherwise from the squad and transfer plan of the best earlier combination.
+
+    With ``chip_sweep_top_k``, a bound is computed for every combination first, from the root node of HiGHS (or only the
+    LP relaxation with ``chip_sweep_bound`` ``lp``). Combinations are then solved from the highest bound down, until the
+    remaining bounds cannot beat the k-th best score. Combinations that the root node already solves are not solved again.
+
+    Parameters
+    ----------
+    data: dict
+        Pre-processed data for the problem definition
+    options: dict
+        User controlled values for the problem instance
+    combinations: list of dict
+        Chip gameweeks of each combination, e.g. ``{"use_bb": [1], "use_fh": [3]}``, chips without a key are not used unless
+        ``chip_limits`` allows them
+
+    Yields
+    ------
+    tuple
+        Each combination with its solutions, in the format of ``solve_multi_period_fpl`` with a single iteration. The
+        list is empty for infeasible and skipped combinations.
+    """
+    sweep = build_chip_sweep(data, options, combinations)
+    problem = sweep["problem"]
+    model = problem["model"]
+
+    # with top_k, combinations are solved in decreasing order of a cheap bound, and those whose bound cannot beat the
+    # k-th best score found so far are skipped
+    top_k = options.get("chip_sweep_top_k")
+    bounds, solved, saved_solutions = get_chip_sweep_bounds(sweep, combinations, options) if top_k else ({}, {}, [])
+    scores = []
+    best = None
+
+    order = sorted(bounds, key=lambda i: -bounds[i]) if top_k else range(len(combinations))
+    for i in order:
+        combination = combinations[i]
+        combination_start = time.time()
+        if top_k and len(scores) >= top_k and bounds[i] <= sorted(scores)[-top_k] + BOUND_TOLERANCE:
+            print(f"Skipped chip combination {combination}, bound {bounds[i]:.2f} cannot beat {sorted(scores)[-top_k]:.2f}")
+            yield combination, []
+            continue
+
+        x = solved[i] if i in solved else solve_chip_combination(sweep, combination, saved_solutions, best)
+        if x is None:
+            print(f"Chip combination {combination} is infeasible")
+            yield combination, []
+            continue
+
+        solution = generate_solution(problem, round_solution(model, x), 0, options)
+        if len(scores) == 0 or solution["score"] > max(scores):
+            best = x
+        scores.append(solution["score"])
+        print(f"Chip combination {combination} took {time.time() - combination_start:.2f} seconds")
+        yield combination, [solution]
+
+
+def build_chip_sweep(data, options, combinations):
+    """
+    Builds the model of ``solve_chip_combinations``, with the swept chips left free up to the most any combination plays
+
+    Returns
+    -------
+    dict
+        The problem, its HiGHS instance, the chip columns and per-gameweek TC rows that combinations are enforced on, the
+        base column bounds, the user chip limits and the squad and transfer plan columns
+    """
+    sweep_chips = [chip for chip in ["wc", "bb", "fh", "tc"] if any(f"use_{chip}" in c for c in combinations)]
+    chip_limits = dict(options.get("chip_limits", {}))
+    base_options = {**options, "chip_limits": dict(chip_limits)}
+    for chip in sweep_chips:
+        base_options[f"use_{chip}"] = []
+        base_options["chip_limits"][chip] = max([chip_limits.get(chip, 0)] + [len(c.get(f"use_{chip}", [])) for c in combinations])
+
+    problem = build_matrix_model(data, base_options)
+    model = problem["model"]
+    tc_rows = model.add_constraints("sweep_tc", [(model.variables["use_tc"].T, 1)], ">=", 0) if "tc" in sweep_chips else None
+    solver_instance = model.to_highs(problem["weights"])
+    set_highs_options(solver_instance, options)
+    solver_instance.setOptionValue("mip_improving_solution_save", True)
+    return {
+        "problem": problem,
+        "solver_instance": solver_instance,
+        "chip_cols": {chip: model.variables[f"use_{chip}"] for chip in sweep_chips},
+        "tc_rows": tc_rows,
+        "base_lower": model.col_lower.copy(),
+        "base_upper": model.col_upper.copy(),
+        "chip_limits": chip_limits,
+        "plan_cols": np.concatenate([model.variables[name].ravel() for name in ["squad", "transfer_in", "tr_out_reg", "tr_out_first"]]),
+    }
+
+
+def enforce_chip_combination(sweep, combination):
+    """Sets the bounds of the chip columns and TC rows of ``sweep`` to play the chips of ``combination``"""
+    problem = sweep["problem"]
+    model = problem["model"]
+    tc_rows = sweep["tc_rows"]
+    model.col_lower[:] = sweep["base_lower"]
+    model.col_upper[:] = sweep["base_upper"]
+    if tc_rows is not None:
+        model.set_row_bounds(tc_rows, lb=0)
+    for chip, cols in sweep["chip_cols"].items():
+        chip_gws = [problem["gw_index"][w] for w in combination.get(f"use_{chip}", [])]
+        if len(chip_gws) == 0 and sweep["chip_limits"].get(chip, 0) > 0:
+            continue
+        model.set_bounds(np.delete(cols, chip_gws, axis=-1), ub=0)
+        if chip == "tc":
+            model.set_row_bounds(tc_rows[chip_gws], lb=1)
+        else:
+            model.set_bounds(cols[chip_gws], lb=1)
+    model.update_highs(sweep["solver_instance"], problem["weights"])
+
+
+def get_chip_sweep_bounds(sweep, combinations, options):
+    """
+    Bound of each chip combination, from the root node of HiGHS or the LP relaxation with ``chip_sweep_bound`` ``lp``
+
+    Returns
+    -------
+    tuple
+        Bounds by combination index, the solutions of combinations the root node already solves, and the incumbents found
+    """
+    problem = sweep["problem"]
+    solver_instance = sweep["solver_instance"]
+    bounds = {}
+    solved = {}
+    saved_solutions = []
+    bound_start = time.time()
+    relaxation = options.get("chip_sweep_bound", "root") == "lp"
+    _, max_nodes = solver_instance.getOptionValue("mip_max_nodes")
+    solver_instance.setOptionValue("solve_relaxation", relaxation)
+    solver_instance.setOptionValue("mip_max_nodes", 1)
+    for i, combination in enumerate(combinations):
+        enforce_chip_combination(sweep, combination)
+        solver_instance.run()
+        status = solver_instance.getModelStatus()
+        if status == highspy.HighsModelStatus.kOptimal:
+            bounds[i] = solver_instance.getInfo().objective_function_value
+            if not relaxation and problem["lazy_opposing_play"] is None:
+                # already solved at the root node
+                solved[i] = np.array(solver_instance.getSolution().col_value)
+        elif status == highspy.HighsModelStatus.kInfeasible:
+            bounds[i] = -np.inf
+        else:
+            bounds[i] = solver_instance.getInfo().mip_dual_bound
+        if not relaxation:
+            saved_solutions += [np.array(v.col_value) for v in solver_instance.getSavedMipSolutions()]
+    solver_instance.setOptionValue("solve_relaxation", False)
+    solver_instance.setOptionValue("mip_max_nodes", max_nodes)
+    print(f"Bounds of {len(combinations)} chip combinations took {time.time() - bound_start:.2f} seconds, {len(solved)} of them solved")
+    return bounds, solved, saved_solutions
+
+
+def solve_chip_combination(sweep, combination, saved_solutions, best):
+    """
+    Solves one chip combination and returns its solution vector, or None when the combination is infeasible
+
+    The solve starts from the best incumbent in ``saved_solutions`` that is still feasible, or otherwise from the squad and
+    transfer plan of ``best``. The incumbents found are added to ``saved_solutions``.
+    """
+    problem = sweep["problem"]
+    model = problem["model"]
+    solver_instance = sweep["solver_instance"]
+    enforce_chip_combination(sweep, combination)
+    warm_start = get_best_feasible_solution(solver_instance, saved_solutions)
+    if warm_start is not None:
+        model.set_start(solver_instance, warm_start)
+    elif best is not None:
+        model.set_start(solver_instance, best, sweep["plan_cols"])
+    solver_instance.run()
+    if problem["lazy_opposing_play"] is not None:
+        solve_lazy_opposing_play(problem, solver_instance)
+    saved_solutions += [np.array(v.col_value) for v in solver_instance.getSavedMipSolutions()]
+    if solver_instance.getInfo().primal_solution_status != highspy.SolutionStatus.kSolutionStatusFeasible:
+        return None
+    return np.array(solver_instance.getSolution().col_value)
+
+
+def get_best_squad_value(problem, weeks, budget, options):
+    """
+    Weighted xP of the best squad the budget allows, kept over the gameweek positions in ``weeks``, with a lineup in each
+
+    A small model without transfers, bench order and captaincy, used to value FH (one gameweek) and WC (until the end of
+    the horizon).
+    """
+    type_data = problem["type_data"]
+    player_type = problem["merged_data"]["element_type"].to_numpy()
+    player_team = problem["merged_data"]["name"].to_numpy()
+    price = np.where(problem["price_modified"], problem["sell_price"], problem["buy_price"])
+
+    model = MatrixModel(name="best_squad")
+    squad = model.add_variables("squad", [problem["players"]])
+    lineup = model.add_variables("lineup", [problem["players"], weeks])
+    model.add_constraints("lineup_count", [(lineup.T, 1)], "==", LINEUP_SIZE)
+    model.add_constraints("lineup_squad_rel", per_row([(lineup, 1), (squad[:, None], -1)]), "<=", 0)
+    model.add_constraints("budget", [(squad[None, :], price)], "<=", budget)
+    for t in type_data.index:
+        type_players = player_type == t
+        model.add_constraints("valid_squad", [(squad[type_players][None, :], 1)], "==", type_data.loc[t, "squad_select"])
+        model.add_constraints("valid_formation_lb", [(lineup[type_players].T, 1)], ">=", type_data.loc[t, "squad_min_play"])
+        model.add_constraints("valid_formation_ub", [(lineup[type_players].T, 1)], "<=", type_data.loc[t, "squad_max_play"])
+    for t in np.unique(player_team):
+        model.add_constraints("team_limit", [(squad[player_team == t][None, :], 1)], "<=", MAX_PLAYERS_PER_TEAM)
+    model.add_objective(np.arange(len(weeks)), lineup, problem["points"][:, weeks])
+
+    solver_instance = model.to_highs(problem["weights"][weeks])
+    set_highs_options(solver_instance, options)
+    solver_instance.run()
+    return solver_instance.getInfo().objective_function_value
+
+
+def get_chip_gains(problem, data, options):
+    """
+    Estimates the weighted points each chip adds in each gameweek, on a coarse model of the current squad
+
+    The squad is valued through per-position value curves, i.e. the total xP of the best ``k`` players of each position,
+    maximized over the valid formations. BB adds the bench and TC the best player of the squad. FH and WC replace the
+    squad with the best one the budget allows (``get_best_squad_value``), for one gameweek or until the end of the horizon.
+
+    Returns
+    -------
+    dict
+        Gain of each chip for each gameweek position, e.g. ``{"bb": np.array([3.1, 4.2, 2.8])}``
+    """
+    type_data = problem["type_data"]
+    player_type = problem["merged_data"]["element_type"].to_numpy()
+    in_squad = np.isin(problem["players"], data["initial_squad"])
+    points = problem["points"]
+    weights = problem["weights"]
+    num_gws = len(problem["gws"])
+
+    # value curves: cumulative xP of the best k squad players of each position, one row per k
+    curves = {}
+    for t in type_data.index:
+        ranked = -np.sort(-points[in_squad & (player_type == t)], axis=0)
+        curves[t] = np.vstack([np.zeros(num_gws), np.cumsum(ranked, axis=0)])
+    play_ranges = [range(type_data.loc[t, "squad_min_play"], type_data.loc[t, "squad_max_play"] + 1) for t in type_data.index]
+    formations = [f for f in itertools.product(*play_ranges) if sum(f) == LINEUP_SIZE]
+    lineup_value = np.max([sum(curves[t][k] for t, k in zip(type_data.index, f, strict=True)) for f in formations], axis=0)
+
+    budget = data["itb"] + np.where(problem["price_modified"], problem["sell_price"], problem["buy_price"])[in_squad].sum()
+    free_chips = get_free_chips(options)
+    gains = {
+        "bb": weights * (points[in_squad].sum(axis=0) - lineup_value),
+        "tc": weights * points[in_squad].max(axis=0),
+        "fh": np.zeros(num_gws),
+        "wc": np.zeros(num_gws),
+    }
+    for j in range(num_gws):
+        if "fh" in free_chips:
+            gains["fh"][j] = get_best_squad_value(problem, [j], budget, options) - weights[j] * lineup_value[j]
+        if "wc" in free_chips:
+            rest = list(range(j, num_gws))
+            gains["wc"][j] = get_best_squad_value(problem, rest, budget, options) - np.dot(weights[rest], lineup_value[rest])
+    return gains
+
+
+def get_free_chips(options):
+    """Chips whose gameweeks are left to the solver, i.e. allowed by ``chip_limits``, ``allowed_chip_gws`` or ``forced_chip_gws``"""
+    return [
+        chip
+        for chip in ["wc", "bb", "fh", "tc"]
+        if len(options.get(f"use_{chip}", [])) == 0
+        and (
+            options.get("chip_limits", {}).get(chip, 0) > 0
+            or len(options.get("allowed_chip_gws", {}).get(chip, [])) > 0
+            or len(options.get("forced_chip_gws", {}).get(chip, [])) > 0
+        )
+    ]
+
+
+def get_chip_placements(problem, data, options, swept_chips):
+    """
+    The ``chip_decomposition_refine`` best placements of ``swept_chips``, the master of ``solve_chip_decomposition``
+
+    Placements allowed by the chip settings are ranked by their total gain from ``get_chip_gains``.
+    """
+    gws = problem["gws"]
+    gw_index = problem["gw_index"]
+    gains = get_chip_gains(problem, data, options)
+    free_chips = get_free_chips(options)
+    fixed_gws = {w for chip in ["wc", "bb", "fh", "tc"] for w in options.get(f"use_{chip}", [])}
+    forced_chip_gws = options.get("forced_chip_gws", {})
+    chip_gameweeks = {}
+    for chip in swept_chips:
+        if len(forced_chip_gws.get(chip, [])) > 0:
+            chip_gameweeks[f"use_{chip}"] = forced_chip_gws[chip]
+        else:
+            chip_gameweeks[f"use_{chip}"] = [None, *[w for w in gws if w not in fixed_gws]] if chip in free_chips else []
+
+    def placement_gain(combination):
+        return sum(gains[key.removeprefix("use_")][gw_index[w]] for key, (w,) in combination.items())
+
+    refine = options.get("chip_decomposition_refine", 3)
+    return sorted(get_chip_combinations(chip_gameweeks, options), key=placement_gain, reverse=True)[:refine]
+
+
+def check_chip_decomposition(problem, options, swept_chips, best_placement, best):
+    """
+    Adds the bound of the full model (chips left free) and the gap of the decomposition to it to the ``best`` solution
+
+    The bound comes from ``get_free_hit_relaxation_bound``, or with ``chip_decomposition_check`` from solving the full
+    model started from the chip gameweeks of ``best_placement``, whose solution replaces ``best`` when it scores more.
+    """
+    model = problem["model"]
+    gw_index = problem["gw_index"]
+    check_start = time.time()
+    if not options.get("chip_decomposition_check", False):
+        bound = max(get_free_hit_relaxation_bound(problem, options), best["score"])
+        gap = (bound - best["score"]) / max(abs(bound), BOUND_TOLERANCE)
+        print(f"Chip decomposition bound: {bound:.4f}, gap of the decomposition {gap:.2%}, took {time.time() - check_start:.2f} seconds")
+        return {**best, "decomposition_bound": bound, "decomposition_gap": gap}
+
+    # full model with the chips left free, started from the chip gameweeks of the best placement
+    solver_instance = model.to_highs(problem["weights"])
+    set_highs_options(solver_instance, options)
+    x = np.zeros(model.num_col)
+    start_cols = []
+    for chip in swept_chips:
+        cols = model.variables[f"use_{chip}"]
+        chip_gws = [gw_index[w] for w in best_placement[f"use_{chip}"]]
+        if chip != "tc":
+            x[cols[chip_gws]] = 1
+            start_cols.append(cols)
+        elif len(chip_gws) == 0:
+            # the TC player is left to HiGHS
+            start_cols.append(cols.ravel())
+    if start_cols:
+        model.set_start(solver_instance, x, np.concatenate(start_cols))
+    solver_instance.run()
+    if problem["lazy_opposing_play"] is not None:
+        solve_lazy_opposing_play(problem, solver_instance)
+
+    bound = max(solver_instance.getInfo().mip_dual_bound, best["score"])
+    gap = (bound - best["score"]) / max(abs(bound), BOUND_TOLERANCE)
+    full = None
+    full_score = "-"
+    if solver_instance.getInfo().primal_solution_status == highspy.SolutionStatus.kSolutionStatusFeasible:
+        full = generate_solution(problem, round_solution(model, np.array(solver_instance.getSolution().col_value)), 0, options)
+        full_score = f"{full['score']:.4f}"
+    print(
+        f"Chip decomposition check: the full model scores {full_score} with a bound of {bound:.4f}, gap of the decomposition {gap:.2%}, "
+        f"took {time.time() - check_start:.2f} seconds"
+    )
+    if full is not None and full["score"] > best["score"] + BOUND_TOLERANCE:
+        best = full
+    return {**best, "decomposition_bound": bound, "decomposition_gap": gap}
+
+
+def solve_chip_decomposition(data, options):
+    """
+    Places the chips on a coarse model first, and then solves the full model with those chip gameweeks fixed
+
+    The coarse (master) model estimates the gain of each chip in each gameweek with ``get_chip_gains``, and ranks the
+    chip placements allowed by the chip settings by their total gain. The best ``chip_decomposition_refine`` placements
+    are solved in full with ``solve_chip_combinations``, and the best result is returned. The master places each chip in
+    at most one gameweek, so ``chip_limits`` above 1 are rejected.
+
+    The gap of the decomposition is reported against a bound of the full model (chips left free). By default the bound
+    comes from a few LP relaxations (``get_free_hit_relaxation_bound``), which take a fraction of the full solves. With
+    ``chip_decomposition_check``, the full model is solved instead, started from the chip gameweeks of the best
+    placement, for a tighter bound, and the better of the two solutions is returned.
+
+    Parameters
+    ----------
+    data: dict
+        Pre-processed data for the problem definition
+    options: dict
+        User controlled values for the problem instance
+
+    Returns
+    -------
+    list
+        The best solution, in the format of ``solve_multi_period_fpl`` with a single iteration. The bound of the full
+        model and the relative gap of the decomposition to it are added as ``decomposition_bound`` and
+        ``decomposition_gap``
+    """
+    start = time.time()
+    chips = ["wc", "bb", "fh", "tc"]
+    if any(limit > 1 for limit in options.get("chip_limits", {}).values()):
+        raise ValueError("Chip decomposition places each chip in at most one gameweek, set chip_limits to 0 or 1")
+    problem = build_matrix_model(data, options)
+    swept_chips = [chip for chip in chips if len(options.get(f"use_{chip}", [])) == 0]
+    placements = get_chip_placements(problem, data, options, swept_chips)
+    print(f"Chip decomposition master took {time.time() - start:.2f} seconds, placements: {placements}")
+
+    # full solves with every swept chip listed, so that chips a placement does not use are fixed to zero
+    unused = {f"use_{chip}": [] for chip in swept_chips}
+    detailed_options = {**options, "chip_limits": {}, "chip_sweep_top_k": None, **unused}
+    results = [(c, r[0]) for c, r in solve_chip_combinations(data, detailed_options, [{**unused, **p} for p in placements]) if r]
+    if len(results) == 0:
+        print("Chip decomposition found no feasible placement, solving the full model")
+        return solve_matrix_model(data, options)
+    best_placement, best = max(results, key=lambda r: r[1]["score"])
+    print(f"Chip decomposition: best of {len(results)} placements is {best_placement} with {best['score']:.4f}")
+    print(f"Chip decomposition took {time.time() - start:.2f} seconds")
+
+    return [check_chip_decomposition(problem, options, swept_chips, best_placement, best)]
+
+
+def get_free_hit_relaxation_bound(problem, options):
+    """
+    Upper bound of the full model from its LP relaxation, solved once without FH and once for each gameweek FH can be in
+
+    A fractional use_fh lets the relaxation keep a share of the best possible squad in every gameweek, so FH is fixed in
+    each of these solves, while the other chips stay relaxed. The solves share one HiGHS instance and only change bounds,
+    so each one starts from the basis of the previous one. The model is left as it was found, including the cut added for
+    the relaxations, which is freed again at the end.
+    """
+    model = problem["model"]
+    use_fh = model.variables["use_fh"]
+    base_lower = model.col_lower.copy()
+    base_upper = model.col_upper.copy()
+    integrality = model.integrality
+    model.integrality = np.zeros(model.num_col, dtype=bool)
+    cover_rows = []
+    if "squad_fh" in model.variables:
+        # a player in a lineup or bench slot is in the regular or the Free Hit squad; the Free Hit rows alone let a
+        # fractional use_fh put any player in the lineup, which makes the relaxations useless with FH left free
+        variables = model.variables
+        slots = [(variables["lineup"].ravel(), 1), (variables["bench"].reshape(variables["lineup"].size, -1), 1)]
+        squads = [(variables["squad"][:, 1:].ravel(), -1), (variables["squad_fh"].ravel(), -1)]
+        cover_rows = model.add_constraints("slot_squad_cover", [*slots, *squads], "<=", 0)
+    solver_instance = model.to_highs(problem["weights"])
+    set_highs_options(solver_instance, options)
+
+    # no FH, and FH in each gameweek it can be placed in
+    free_weeks = [j for j in range(len(use_fh)) if base_lower[use_fh[j]] == 0 and base_upper[use_fh[j]] > 0]
+    bound = -np.inf
+    for fh_weeks in [[], *[[j] for j in free_weeks]]:
+        model.col_lower[:] = base_lower
+        model.col_upper[:] = base_upper
+        model.set_bounds(use_fh[[j for j in free_weeks if j not in fh_weeks]], ub=0)
+        model.set_bounds(use_fh[fh_weeks], lb=1)
+        model.update_highs(solver_instance, problem["weights"])
+        solver_instance.run()
+        if solver_instance.getModelStatus() == highspy.HighsModelStatus.kOptimal:
+            bound = max(bound, solver_instance.getInfo().objective_function_value)
+
+    model.col_lower[:] = base_lower
+    model.col_upper[:] = base_upper
+    model.integrality = integrality
+    model.set_row_bounds(cover_rows, ub=np.inf)
+    return bound
+
+
+def round_solution(model, x):
+    # same rounding as solution files: integers to whole numbers, money to 3 decimals (+ 0.0 drops negative zeros)
+    return np.where(model.integrality, np.round(x), np.round(x, 3)) + 0.0
+
+
+def solve_randomized_scenarios(data, options, count):
+    """
+    Solves ``count`` randomized versions of the problem, as ``solve_multi_period_fpl`` would with ``randomized`` on
+
+    Noise only changes the objective, so the model is built and passed to HiGHS once. Each scenario replaces the xP
+    coefficients, and is started from the solution of the previous one, which is still feasible.
+
+    Parameters
+    ----------
+    data: dict
+        Pre-processed data without noise, i.e. from ``prep_data`` with ``randomized`` off
+    options: dict
+        User controlled values for the problem instance. ``randomization_strength`` scales the noise, and with a
+        ``randomization_seed``, scenario ``i`` uses the seed ``randomization_seed + i``
+    count: int
+        Number of scenarios
+
+    Yields
+    ------
+    list
+        Solutions of each scenario, in the format of ``solve_multi_period_fpl`` with a single iteration, or an empty list
+        for a scenario without a solution, e.g. when it runs out of time before finding one
+    """
+    problem = build_matrix_model(data, options)
+    model = problem["model"]
+    gws = problem["gws"]
+    solver_instance = None
+    x = None
+
+    for scenario in range(count):
+        scenario_start = time.time()
+        merged_data = problem["merged_data"].copy()
+        seed = options.get("randomization_seed")
+        randomize_points(merged_data, gws, {**options, "randomization_seed": None if seed is None else seed + scenario})
+        points, _ = build_player_week_matrices(merged_data, gws)
+        model.set_objective_coefficients(
+            problem["xp_objective"], get_objective_coefficients(points, problem["vcap_weight"], problem["bench_weights"])
+        )
+        free_hit = problem["free_hit"]
+        if free_hit is not None:
+            fh_values, fh_picks = get_free_hit_values({**data, "merged_data": merged_data}, options, points, free_hit["budgets"], free_hit["weeks"])
+            model.set_objective_coefficients(free_hit["objective"], np.where(np.isfinite(fh_values), fh_values, 0))
+            free_hit = {**free_hit, "picks": fh_picks}
+
+        if solver_instance is None:
+            solver_instance = model.to_highs(problem["weights"])
+            set_highs_options(solver_instance, options)
+        else:
+            model.update_highs(solver_instance, problem["weights"])
+            if x is not None:
+                model.set_start(solver_instance, x)
+        solver_instance.run()
+        if problem["lazy_opposing_play"] is not None:
+            solve_lazy_opposing_play(problem, solver_instance)
+        if solver_instance.getInfo().primal_solution_status != highspy.SolutionStatus.kSolutionStatusFeasible:
+            # the next scenario starts from the last solution found instead
+            print(f"Scenario {scenario} found no solution in {time.time() - scenario_start:.2f} seconds, skipping it")
+            yield []
+            continue
+        x = np.array(solver_instance.getSolution().col_value)
+
+        print(f"Scenario {scenario} took {time.time() - scenario_start:.2f} seconds")
+        scenario_problem = {**problem, "merged_data": merged_data, "points": points, "free_hit": free_hit}
+        yield [generate_solution(scenario_problem, round_solution(model, x), 0, options)]
+
+
+def generate_solution(problem, x, iteration, options):
+    """Reads the solution vector ``x`` of the model into the ``picks`` DataFrame, summary text and statistics"""
+    model = problem["model"]
+    transfer_out_first = model.get_values(x, "tr_out_first")
+    values = {
+        "squad": model.get_values(x, "squad"),
+        "squad_fh": model.get_values(x, "squad_fh") if "squad_fh" in model.variables else np.zeros((len(problem["players"]), len(problem["gws"]))),
+        "lineup": model.get_values(x, "lineup"),
+        "captain": model.get_values(x, "captain"),
+        "vicecap": model.get_values(x, "vicecap"),
+        "bench": model.get_values(x, "bench"),
+        "use_tc": model.get_values(x, "use_tc"),
+        "transfer_in": model.get_values(x, "transfer_in"),
+        "transfer_out_first": transfer_out_first,
+        "transfer_out": model.get_values(x, "tr_out_reg") + transfer_out_first,
+        "itb": model.get_values(x, "itb"),
+        "ft": model.get_values(x, "ft"),
+        "pt": model.get_values(x, "pt"),
+        "use_wc": model.get_values(x, "use_wc"),
+        "use_bb": model.get_values(x, "use_bb"),
+        "use_fh": model.get_values(x, "use_fh"),
+        "gw_total": model.period_values(x, len(problem["gws"])),
+    }
+    if problem["free_hit"] is not None:
+        # the Free Hit squad and lineup are the precomputed ones of the budget level that was picked
+        for j, k in zip(*np.nonzero(model.get_values(x, "fh_level") > BINARY_THRESHOLD), strict=True):
+            pick = problem["free_hit"]["picks"][(j, k)]
+            values["squad_fh"][:, j] = pick["squad"]
+            for name in ["lineup", "captain", "vicecap"]:
+                values[name][:, j] = pick[name]
+            values["bench"][:, j] = pick["bench"]
+    gw_exponent = np.array(problem["gws"]) - problem["next_gw"]
+    return {
+        "iter": iteration,
+        "model": model,
+        **summarize_solution(problem, values, iteration, options),
+        "score": float(np.dot(problem["weights"], values["gw_total"])),
+        "decay_metrics": {i: float(np.dot(np.power(i, gw_exponent), values["gw_total"])) for i in options.get("report_decay_base", [])},
+    }
+
+
+def flip_terms(x, cols):
+    """
+    Terms and constant of ``sum(1 - v for selected) + sum(v for unselected)``, where each row of ``cols`` is one expression
+
+    Used for no-good cuts that force the next iteration to change at least one of the given decisions.
+    """
+    cols = cols.reshape(len(cols), -1)
+    value = np.where(cols >= 0, x[np.maximum(cols, 0)], 0).sum(axis=1)
+    selected = value > BINARY_THRESHOLD
+    keep = selected | (value < BINARY_THRESHOLD)
+    coefs = np.repeat(np.where(selected, -1.0, 1.0)[keep], cols.shape[1])
+    return (cols[keep].reshape(1, -1), coefs[None, :]), int(selected.sum())
+
+
+def add_iteration_cut(problem, x, iteration, options):
+    """Adds the cut separating the next solution from the current one, following ``iteration_criteria``"""
+    model = problem["model"]
+    gws = problem["gws"]
+    iteration_criteria = options.get("iteration_criteria", "this_gw_transfer_in")
+    iter_diff = options.get("iteration_difference", 1)
+    transfer_in = model.variables["transfer_in"]
+    transfer_out = problem["transfer_out"]
+
+    if iteration_criteria == "this_gw_transfer_in":
+        groups = [transfer_in[:, 0]]
+    elif iteration_criteria == "this_gw_transfer_out":
+        groups = [transfer_out[:, 0]]
+    elif iteration_criteria == "this_gw_transfer_in_out":
+        groups = [transfer_in[:, 0], transfer_out[:, 0]]
+    elif iteration_criteria == "chip_gws":
+        groups = [model.variables["use_wc"], model.variables["use_bb"], model.variables["use_fh"]]
+    elif iteration_criteria == "target_gws_transfer_in":
+        target_gws = [gws.index(w) for w in options.get("iteration_target", [problem["next_gw"]])]
+        groups = [transfer_in[:, target_gws].ravel()]
+    elif iteration_criteria == "this_gw_lineup":
+        lineup = model.variables["lineup"][:, 0]
+        selected_lineup = lineup[x[lineup] > BINARY_THRESHOLD]
+        model.add_constraints(f"cutoff_{iteration}", [(selected_lineup[None, :], 1)], "<=", len(selected_lineup) - iter_diff)
+        return
+    else:
+        return
+
+    terms = []
+    num_selected = 0
+    for cols in groups:
+        term, selected = flip_terms(x, cols)
+        terms.append(term)
+        num_selected += selected
+    model.add_constraints(f"cutoff_{iteration}", terms, ">=", 1 - num_selected)
@@ -1,3 +1,4 @@
+import itertools
 import os
 import subprocess
 import threading
@@ -25,6 +26,9 @@ SQUAD_SIZE = 15
 LINEUP_SIZE = 11
 MAX_GAMEWEEK = 38
 MAX_PLAYERS_PER_TEAM = 3
+MATRIX_OPTIONS = ["chip_decomposition", "pool_expansion", "rolling_horizon", "fh_precompute", "opposing_play_lazy", "heuristic_start", "race"]
+SASOPTPY_OPTIONS = ["model_presolve"]
+OPPOSING_POSITIONS = [("G", "M"), ("G", "F"), ("D", "M"), ("D", "F"), ("M", "G"), ("F", "G"), ("M", "D"), ("F", "D")]  # gk/def vs mid/fwd
 
 
 def generate_team_json(team_id, options):
@@ -184,15 +188,29 @@ def prep_data(my_data, options):
     num_players_after = len(merged_data)
     print(f"Filtered player pool from {num_players_before} to {num_players_after} players")
 
+    gws = list(range(gw, min(39, gw + horizon)))
     if options.get("randomized", False):
-        rng = np.random.default_rng(seed=options.get("randomization_seed"))
-        gws = list(range(gw, min(39, gw + horizon)))
-        for w in gws:
-            noise = merged_data[f"{w}_Pts"] * (92 - merged_data[f"{w}_xMins"]) / 134 * rng.standard_normal(size=len(merged_data))
-            merged_data[f"{w}_Pts"] = merged_data[f"{w}_Pts"] + noise * options.get("randomization_strength", 1)
+        randomize_points(merged_data, gws, options)
 
     type_data = pd.DataFrame(fpl_data["element_types"]).set_index(["id"])
 
+    if options.get("dominance_filter", False):
+        if options.get("num_iterations", 1) > 1:
+            print("Dominance filter only keeps the best plan, skipped for multiple iterations")
+        else:
+            # a squad holds at most this many players of one position from one team
+            team_limit = max(MAX_PLAYERS_PER_TEAM, max_players_from_team)
+            slots = {t: min(int(type_data.loc[t, "squad_select"]), team_limit) for t in type_data.index}
+            for t in [1, 2]:
+                slots[t] = min(slots[t], options.get("max_defenders_per_team", 3))
+            protected = initial_squad + options.get("locked", []) + options.get("keep", []) + locked_next_gw
+            protected += [bt.get(key) for bt in options.get("booked_transfers", []) for key in ["transfer_in", "transfer_out"]]
+            dominated = get_dominated_players(merged_data, gws, slots, set(protected), options)
+            merged_data = merged_data.drop(index=dominated)
+            print(f"Dropped {len(dominated)} players dominated by cheaper teammates, player pool has {len(merged_data)} players")
+
+    points_matrix, minutes_matrix = build_player_week_matrices(merged_data, gws)
+
     buy_price = (merged_data["now_cost"] / 10).to_dict()
     sell_price = {i["element"]: i["selling_price"] / 10 for i in my_data["picks"]}
     price_modified_players = []
@@ -244,9 +262,732 @@ def prep_data(my_data, options):
         "ft_base": ft_base,
         "fixtures": fixtures,
         "max_players_from_team": max_players_from_team,
+        "gws": gws,
+        "points_matrix": points_matrix,
+        "minutes_matrix": minutes_matrix,
     }
 
 
+def randomize_points(merged_data, gws, options):
+    """Adds random noise to the ``{w}_Pts`` columns of ``merged_data`` in place, smaller for players expected to play more minutes"""
+    rng = np.random.default_rng(seed=options.get("randomization_seed"))
+    for w in gws:
+        noise = merged_data[f"{w}_Pts"] * (92 - merged_data[f"{w}_xMins"]) / 134 * rng.standard_normal(size=len(merged_data))
+        merged_data[f"{w}_Pts"] = merged_data[f"{w}_Pts"] + noise * options.get("randomization_strength", 1)
+
+
+def get_dominated_players(merged_data, gws, slots, protected, options):
+    """
+    Returns the IDs of the players that can be left out of the pool without changing the best plan
+
+    A player is dominated by a teammate of the same position who is not more expensive, and who is expected to score at
+    least as many points and to play in every gameweek the player does. A squad holds at most ``slots[element_type]``
+    players of a position from one team, so a player with that many dominating teammates always has one left outside
+    the squad, who can take their place in every move of the plan without changing team counts. Players are visited
+    from the best to the worst and only kept players can dominate, so a replacement is never dropped itself.
+
+    Parameters
+    ----------
+    merged_data: pd.DataFrame
+        Player data with ``{w}_Pts`` and ``{w}_xMins`` columns for the gameweeks in ``gws``
+    gws: list
+        Gameweeks of the horizon
+    slots: dict
+        Largest number of players of each element type a squad can have from one team
+    protected: set
+        Players that are always kept, e.g. the current squad and locked players
+    options: dict
+        Banned players never dominate, positions with ``pick_prices`` (and goalkeepers with ``no_gk_rotation_after``)
+        are kept, and with ``no_opposing_play`` the dominating teammate has to play in exactly the same gameweeks
+    """
+    points, minutes = build_player_week_matrices(merged_data, gws)
+    playing = minutes > 0
+    banned = set(options.get("banned", [])) | {x[0] if isinstance(x, list) else x for x in options.get("banned_next_gw", [])}
+    kept_positions = {pos for pos, values in options.get("pick_prices", {}).items() if values not in [None, ""]}
+    if options.get("no_gk_rotation_after", None):
+        kept_positions.add("G")
+    same_weeks = options.get("no_opposing_play") in [True, "penalty"]
+
+    ids = merged_data.index.to_numpy()
+    price = merged_data["now_cost"].to_numpy()
+    teams = merged_data["name"].to_numpy()
+    types = merged_data["element_type"].to_numpy()
+    positions = merged_data["Pos"].to_numpy()
+    kept = {}
+    dominated = []
+    # a dominating player has at least the total points and at most the price, so it is visited first
+    for i in np.lexsort((ids, price, -points.sum(axis=1))):
+        group = kept.setdefault((teams[i], types[i]), [])
+        if ids[i] not in protected and positions[i] not in kept_positions:
+            dominating = [
+                j
+                for j in group
+                if price[j] <= price[i]
+                and np.all(points[j] >= points[i])
+                and np.all(playing[j] >= playing[i])
+                and (not same_weeks or np.array_equal(playing[j], playing[i]))
+            ]
+            if len(dominating) >= slots[types[i]]:
+                dominated.append(ids[i])
+                continue
+        if ids[i] not in banned:
+            group.append(i)
+    return dominated
+
+
+def get_unaffordable_players(data, merged_data, itb, protected):
+    """
+    Returns the IDs of the players of ``merged_data`` that no squad within the budget can hold
+
+    The squad is never worth more than ``itb`` and the sale value of the initial squad, so a player who does not fit in
+    it with the cheapest possible teammates of each position can never be bought. Players of the initial squad and the
+    ``protected`` ones are always kept.
+    """
+    type_data = data["type_data"]
+    initial_squad = data["initial_squad"]
+    buy_price = data["buy_price"]
+    sell_price = data["sell_price"]
+    budget = itb + sum(max(buy_price[p], sell_price.get(p, buy_price[p])) for p in initial_squad)
+    lowest_price = {p: min(buy_price[p], sell_price.get(p, buy_price[p])) for p in merged_data.index}
+    type_players = {t: merged_data.index[merged_data["element_type"] == t].to_list() for t in type_data.index}
+    squad_select = {t: int(type_data.loc[t, "squad_select"]) for t in type_data.index}
+    cheapest = {t: sorted(lowest_price[p] for p in type_players[t]) for t in type_data.index}
+    cheapest_squad = sum(sum(cheapest[t][: squad_select[t]]) for t in type_data.index)
+    # the cheapest squad with the most expensive of its players of each position taken out
+    cheapest_rest = {t: cheapest_squad - cheapest[t][squad_select[t] - 1] for t in type_data.index if len(cheapest[t]) >= squad_select[t]}
+    return [
+        p
+        for t in cheapest_rest
+        for p in type_players[t]
+        if p not in initial_squad and p not in protected and buy_price[p] + cheapest_rest[t] > budget + 1e-6
+    ]
+
+
+def build_player_week_matrices(merged_data, gws):
+    """Returns the players x gameweeks matrices of expected points and expected minutes, in the row order of ``merged_data``"""
+    points = merged_data[[f"{w}_Pts" for w in gws]].to_numpy(dtype=float)
+    minutes = merged_data[[f"{w}_xMins" for w in gws]].to_numpy(dtype=float)
+    return points, minutes
+
+
+def get_player_week_matrices(data, gws):
+    """
+    Returns the points and minutes matrices of ``data`` for the given gameweeks
+
+    The matrices prepared by ``prep_data`` are reused when they cover the same players and gameweeks, otherwise they are built
+    from ``merged_data``.
+    """
+    merged_data = data["merged_data"]
+    if data.get("gws") == gws and len(data.get("points_matrix", [])) == len(merged_data):
+        return data["points_matrix"], data["minutes_matrix"]
+    return build_player_week_matrices(merged_data, gws)
+
+
+def get_objective_coefficients(points, vcap_weight, bench_weights):
+    """
+    Returns the players x gameweeks x slots block of objective coefficients
+
+    Slots are lineup, captain, vice-captain, triple captain and then the bench order, so the expected points of a gameweek
+    are the sum of this block multiplied by the matching decision variables.
+    """
+    slot_weights = np.array([1, 1, vcap_weight, 1, *[bench_weights[o] for o in sorted(bench_weights)]])
+    return points[:, :, None] * slot_weights
+
+
+def linear_expression(variables, coefs):
+    """Builds ``sum(coef * var)`` as a single sasoptpy expression by setting each member once, skipping zero coefficients"""
+    expr = so.Expression()
+    for v, coef in zip(variables, coefs, strict=True):
+        # variables that were not created are passed as 0
+        if coef != 0 and isinstance(v, so.Variable):
+            expr.set_member(v.get_name(), v, float(coef))
+    return expr
+
+
+def get_player_groups(merged_data):
+    """
+    Groups player IDs by element type, team, position and (team, position) pair
+
+    Each group keeps the order of ``merged_data``, so sums over a group match the ones built by scanning all players.
+    """
+
+    def group(keys):
+        return {key: index.to_list() for key, index in merged_data.groupby(keys, sort=False).groups.items()}
+
+    return {"type": group("element_type"), "team": group("name"), "pos": group("Pos"), "team_pos": group(["name", "Pos"])}
+
+
+def get_chip_gws(options, gws):
+    """
+    Returns the gameweeks in which each chip can be played, given ``chip_limits`` and the chip options
+
+    Gameweeks named in ``use_*`` or ``forced_chip_gws`` are always kept, even when another option bans them, so that
+    the conflict still makes the model infeasible instead of being dropped silently.
+    """
+    chip_limits = options.get("chip_limits", {})
+    allowed_chip_gws = options.get("allowed_chip_gws", {})
+    forced_chip_gws = options.get("forced_chip_gws", {})
+    no_chip_gws = options.get("no_chip_gws", [])
+
+    chip_gws = {}
+    for chip in ["wc", "bb", "fh", "tc"]:
+        used = options.get(f"use_{chip}", [])
+        allowed = allowed_chip_gws.get(chip, [])
+        forced = forced_chip_gws.get(chip, [])
+        if len(used) > 0 or len(forced) > 0:
+            chip_gws[chip] = [w for w in gws if w in used or w in forced]
+        elif len(allowed) > 0:
+            chip_gws[chip] = [w for w in gws if w in allowed and (chip == "tc" or w not in no_chip_gws)]
+        elif chip_limits.get(chip, 0) > 0:
+            chip_gws[chip] = [w for w in gws if chip == "tc" or w not in no_chip_gws]
+        else:
+            chip_gws[chip] = []
+    return chip_gws
+
+
+def get_player_gws(entries, next_gw):
+    """Returns ``(player, gameweek)`` pairs of a per-gameweek player option, where a bare player ID stands for ``next_gw``"""
+    return [(x, next_gw) if isinstance(x, int) else tuple(x) for x in entries]
+
+
+def get_ft_state_values(ft_states, options):
+    """Returns the value of holding each number of FTs, where each FT rolled adds its ``ft_value_list`` entry or ``ft_value``"""
+    ft_value = options.get("ft_value", 1.5)
+    ft_value_list = options.get("ft_value_list", {})
+    return np.cumsum([ft_value_list.get(str(s), ft_value) for s in ft_states])
+
+
+def get_ft_moves(ft_states, gain):
+    """
+    Returns the moves between FT states in a gameweek, with the range of FTs each move uses
+
+    FTs used are the transfers made, plus one for a Wildcard or Free Hit. With ``s`` FTs and ``gain`` new ones, using ``u``
+    leads to ``min(5, max(1, s - u + gain))`` FTs in the next gameweek, so that a move from ``s`` to ``t`` is possible for
+    a range of ``u`` values. Moves that no ``u`` leads to are left out.
+    """
+    max_ft = max(ft_states)
+    moves = {}
+    for s, t in itertools.product(ft_states, ft_states):
+        if t == max_ft:
+            lb, ub = 0, s + gain - t
+        elif t == 1:
+            lb, ub = max(s + gain - t, 0), SQUAD_SIZE
+        else:
+            lb, ub = s + gain - t, s + gain - t
+        if t >= 1 and 0 <= lb <= ub:
+            moves[s, t] = (lb, ub)
+    return moves
+
+
+def fill_missing(variables, keys, created):
+    """Returns a dict over ``keys`` that holds the entries of ``variables`` listed in ``created`` and 0 for the others"""
+    created = set(created)
+    return {key: variables[key] if key in created else 0 for key in keys}
+
+
+def get_opposing_pairs(fixtures, gws, player_groups, group="all"):
+    """
+    Returns the ordered pairs of players whose teams face each other, for each gameweek
+
+    Opponents are read from a per-gameweek index keyed by team, and pairs are generated by joining the rosters of the two
+    teams of each fixture, so players of teams that do not meet are never compared.
+
+    Parameters
+    ----------
+    fixtures: list of dict
+        Fixtures with ``gw``, ``home`` and ``away`` keys
+    gws: list
+        Gameweeks to generate pairs for
+    player_groups: dict
+        Player groups from ``get_player_groups``
+    group: str
+        ``all`` pairs every player of the two teams, ``position`` only pairs goalkeepers and defenders with midfielders and forwards
+    """
+    opponents = {w: {} for w in gws}
+    for f in fixtures:
+        if f["gw"] in opponents:
+            # dicts as ordered sets, so that a double fixture against the same team yields its pairs once
+            opponents[f["gw"]].setdefault(f["home"], {})[f["away"]] = None
+            opponents[f["gw"]].setdefault(f["away"], {})[f["home"]] = None
+
+    team_players = player_groups["team"]
+    pos_players = player_groups["team_pos"]
+    pairs = {}
+    for w in gws:
+        pairs[w] = []
+        for team1, team1_opponents in opponents[w].items():
+            for team2 in team1_opponents:
+                if group == "position":
+                    rosters = [(pos_players.get((team1, pos1), []), pos_players.get((team2, pos2), [])) for pos1, pos2 in OPPOSING_POSITIONS]
+                else:
+                    rosters = [(team_players.get(team1, []), team_players.get(team2, []))]
+                pairs[w] += [(p1, p2) for roster1, roster2 in rosters for p1 in roster1 for p2 in roster2]
+    return pairs
+
+
+def set_highs_options(solver_instance, options):
+    solver_instance.setOptionValue("parallel", "on")
+    solver_instance.setOptionValue("random_seed", options.get("random_seed", 0))
+    solver_instance.setOptionValue("presolve", options.get("presolve", "on"))
+    solver_instance.setOptionValue("time_limit", options.get("secs", 20 * 60))
+    solver_instance.setOptionValue("mip_rel_gap", options.get("gap", 0))
+    solver_instance.setOptionValue("log_to_console", options.get("verbose", False))
+    # incumbents found along the way can warm start the next iteration
+    solver_instance.setOptionValue("mip_improving_solution_save", options.get("num_iterations", 1) > 1)
+
+
+def get_constraint_rows(constraints, col_index, fixed=None):
+    """
+    Returns sasoptpy constraints as rows (CSR start, index, value, lower, upper) over the columns in ``col_index``
+
+    Terms of the variables in ``fixed`` (values by variable id) are moved into the row bounds.
+    """
+    fixed = fixed or {}
+    start = [0]
+    index = []
+    value = []
+    row_lower = []
+    row_upper = []
+    for c in constraints:
+        rhs = 0
+        for key, term in c._linCoef.items():
+            if key == "CONST":
+                rhs -= term["val"]
+            elif id(term["ref"]) in fixed:
+                rhs -= term["val"] * fixed[id(term["ref"])]
+            else:
+                index.append(col_index[id(term["ref"])])
+                value.append(term["val"])
+        start.append(len(index))
+        row_lower.append(rhs if c._direction in ("G", "E") else -highspy.kHighsInf)
+        row_upper.append(rhs if c._direction in ("L", "E") else highspy.kHighsInf)
+    return (
+        np.array(start, dtype=np.int32),
+        np.array(index, dtype=np.int32),
+        np.array(value, dtype=float),
+        np.array(row_lower, dtype=float),
+        np.array(row_upper, dtype=float),
+    )
+
+
+def get_fixed_variables(model):
+    """Returns the values of the variables of ``model`` whose bounds leave a single value, by variable id"""
+    return {id(v): v._lb for v in model.get_variables() if v._lb is not None and v._lb == v._ub}
+
+
+def get_fixed_rows(constraints, fixed, tolerance=1e-6):
+    """
+    Returns the ids of the constraints whose variables are all in ``fixed`` (values by variable id) and hold for these values
+
+    Such rows have nothing left to decide and can be left out. Fixed rows that do not hold are not returned, so that they
+    still make the model infeasible.
+    """
+    rows = set()
+    for c in constraints:
+        activity = 0
+        for key, term in c._linCoef.items():
+            if key == "CONST":
+                activity += term["val"]
+            elif id(term["ref"]) in fixed:
+                activity += term["val"] * fixed[id(term["ref"])]
+            else:
+                break
+        else:
+            if (c._direction == "L" or activity >= -tolerance) and (c._direction == "G" or activity <= tolerance):
+                rows.add(id(c))
+    return rows
+
+
+def get_solver_columns(model, drop_fixed=False):
+    """Returns the variables of ``model`` that are passed to the solver, and the values of the fixed ones left out with ``drop_fixed``"""
+    fixed = get_fixed_variables(model) if drop_fixed else {}
+    return [v for v in model.get_variables() if id(v) not in fixed], fixed
+
+
+def sasoptpy_to_lp(model, drop_fixed=False):
+    """
+    Returns a linear sasoptpy model as a ``highspy.HighsLp``, without writing and parsing an MPS file
+
+    Columns follow the order of ``model.get_variables()``, which is also the column order of the exported MPS file. With
+    ``drop_fixed``, variables whose bounds leave a single value are left out and moved into the row bounds and objective
+    offset, and so are the rows that only hold such variables.
+    """
+    variables, fixed = get_solver_columns(model, drop_fixed)
+    constraints = model.get_constraints()
+    if drop_fixed:
+        fixed_rows = get_fixed_rows(constraints, fixed)
+        constraints = [c for c in constraints if id(c) not in fixed_rows]
+    col_index = {id(v): i for i, v in enumerate(variables)}
+    var_types = [v._type for v in variables]
+    start, index, value, row_lower, row_upper = get_constraint_rows(constraints, col_index, fixed)
+
+    col_cost = np.zeros(len(variables))
+    offset = 0
+    for key, term in model.get_objective()._linCoef.items():
+        if key == "CONST":
+            offset += term["val"]
+        elif id(term["ref"]) in fixed:
+            offset += term["val"] * fixed[id(term["ref"])]
+        else:
+            col_cost[col_index[id(term["ref"])]] += term["val"]
+
+    lp = highspy.HighsLp()
+    lp.model_name_ = model.get_name()
+    lp.num_col_ = len(variables)
+    lp.num_row_ = len(row_lower)
+    lp.col_cost_ = col_cost
+    lp.offset_ = offset
+    lp.col_lower_ = np.array([-highspy.kHighsInf if v._lb is None else v._lb for v in variables], dtype=float)
+    lp.col_upper_ = np.array([highspy.kHighsInf if v._ub is None else v._ub for v in variables], dtype=float)
+    lp.row_lower_ = row_lower
+    lp.row_upper_ = row_upper
+    lp.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+    lp.a_matrix_.num_col_ = len(variables)
+    lp.a_matrix_.num_row_ = len(row_lower)
+    lp.a_matrix_.start_ = start
+    lp.a_matrix_.index_ = index
+    lp.a_matrix_.value_ = value
+    lp.integrality_ = [highspy.HighsVarType.kContinuous if t == so.CONT else highspy.HighsVarType.kInteger for t in var_types]
+    lp.col_names_ = [v.get_name() for v in variables]
+    lp.row_names_ = [c.get_name() for c in constraints]
+    return lp
+
+
+def sasoptpy_to_highs(model, drop_fixed=False):
+    """Passes a linear sasoptpy model to a new ``highspy.Highs`` instance, see ``sasoptpy_to_lp``"""
+    solver_instance = highspy.Highs()
+    solver_instance.passModel(sasoptpy_to_lp(model, drop_fixed))
+    return solver_instance
+
+
+def add_sasoptpy_rows(solver_instance, model, constraints, drop_fixed=False):
+    """Appends sasoptpy constraints added after ``sasoptpy_to_highs`` to the same HiGHS instance, with the same ``drop_fixed``"""
+    variables, fixed = get_solver_columns(model, drop_fixed)
+    col_index = {id(v): i for i, v in enumerate(variables)}
+    start, index, value, row_lower, row_upper = get_constraint_rows(constraints, col_index, fixed)
+    solver_instance.addRows(len(row_lower), row_lower, row_upper, len(index), start[:-1], index, value)
+
+
+def set_sasoptpy_values(model, col_value, drop_fixed=False):
+    """Writes the column values of a solve back to the variables of ``model``, fixed variables left out with ``drop_fixed`` take their value"""
+    variables, fixed = get_solver_columns(model, drop_fixed)
+    # set_value only assigns _value after its container checks
+    for v in model.get_variables():
+        v._value = fixed.get(id(v), 0)
+    for v, value in zip(variables, col_value, strict=True):
+        v._value = value
+
+
+def write_sasoptpy_mps(model, file_name, drop_fixed=False):
+    """
+    Writes ``model`` to the MPS file ``file_name``, through HiGHS when ``drop_fixed`` leaves fixed variables out
+
+    The MPS file sasoptpy writes declares a fixed binary as binary again after its FX bound, which other solvers may read
+    as a free binary, so models with fixed variables are written by HiGHS instead.
+    """
+    if not drop_fixed:
+        model.export_mps(file_name)
+        return
+    solver_instance = highspy.Highs()
+    solver_instance.setOptionValue("output_flag", False)
+    solver_instance.passModel(sasoptpy_to_lp(model, drop_fixed))
+    solver_instance.writeModel(file_name)
+
+
+def get_best_feasible_solution(solver_instance, candidates, tolerance=1e-6):
+    """
+    Returns the candidate column values with the best objective that satisfy the current rows and bounds of the HiGHS
+    model, or None if none of them does
+
+    Used to warm start a re-solve after new rows are added: the last incumbent is typically cut off by them, but earlier
+    incumbents may still be feasible.
+    """
+    lp = solver_instance.getLp()
+    matrix = lp.a_matrix_
+    row_lower = np.array(lp.row_lower_)
+    row_upper = np.array(lp.row_upper_)
+    col_lower = np.array(lp.col_lower_)
+    col_upper = np.array(lp.col_upper_)
+    major = np.repeat(np.arange(len(matrix.start_) - 1), np.diff(matrix.start_))
+    minor = np.array(matrix.index_, dtype=np.int64)
+    rows, cols = (minor, major) if matrix.format_ == highspy.MatrixFormat.kColwise else (major, minor)
+    sign = -1 if lp.sense_ == highspy.ObjSense.kMaximize else 1
+    best, best_cost = None, np.inf
+    for x in candidates:
+        if np.any(x < col_lower - tolerance) or np.any(x > col_upper + tolerance):
+            continue
+        activity = np.bincount(rows, weights=np.array(matrix.value_) * x[cols], minlength=lp.num_row_)
+        if np.any(activity < row_lower - tolerance) or np.any(activity > row_upper + tolerance):
+            continue
+        cost = sign * np.dot(lp.col_cost_, x)
+        if cost < best_cost:
+            best, best_cost = x, cost
+    return best
+
+
+def run_gurobi(mps_file_name, sol_file_name, options):
+    use_cmd = options.get("use_cmd", False)
+    gap = options.get("gap", 0)
+    command = f"gurobi_cl MIPGap={gap} ResultFile={sol_file_name} {mps_file_name}"
+
+    if use_cmd:
+        os.system(command)
+        return
+
+    def print_output(process):
+        while True:
+            output = process.stdout.readline()
+            if "Solving report" in output:
+                time.sleep(2)
+                process.kill()
+            elif output == "" and process.poll() is not None:
+                break
+            elif output:
+                print(output.strip())
+
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    output_thread = threading.Thread(target=print_output, args=(process,))
+    output_thread.start()
+    output_thread.join()
+
+
+def read_gurobi_solution(sol_file_name):
+    values = {}
+    with open(sol_file_name) as f:
+        for line in f:
+            if line[0] == "#":
+                continue
+            if line == "":
+                break
+            words = line.split()
+            values[words[0]] = float(words[1])
+    return values
+
+
+def get_variable_values(variables, *axes):
+    """
+    Returns the values of a sasoptpy variable group as an array with one axis per index list
+
+    ``variables`` can also be a dict that holds 0 for the entries that were not created in the model.
+    """
+    shape = tuple(len(axis) for axis in axes)
+    keys = itertools.product(*axes) if len(axes) > 1 else axes[0]
+    values = (getattr(variables[key], "_value", variables[key]) for key in keys)
+    return np.fromiter(values, dtype=float, count=int(np.prod(shape))).reshape(shape)
+
+
+def price_column(mask, prices):
+    # zeros stay integers when nothing is traded, matching a column built from python values
+    return np.where(mask, prices, 0) if mask.any() else np.zeros(len(mask), dtype=int)
+
+
+def summarize_solution(solution_data, values, iteration, options):
+    """
+    Builds the ``picks`` DataFrame, summary text and statistics of a solution from the values of its variables
+
+    Parameters
+    ----------
+    solution_data: dict
+        Player and gameweek data of the model, with ``merged_data``, ``type_data``, ``players``, ``gws``, ``all_gw``,
+        ``next_gw``, ``points`` and ``minutes`` (player x gw arrays), and ``buy_price``, ``sell_price`` and ``price_modified``
+        (player arrays)
+    values: dict of np.ndarray
+        Values of the variable families, indexed by player and gameweek (and bench order for ``bench``). ``squad``,
+        ``itb`` and ``ft`` also cover the gameweek before the horizon, and ``gw_total`` holds the objective of each gameweek.
+    """
+    merged_data = solution_data["merged_data"]
+    type_data = solution_data["type_data"]
+    players = solution_data["players"]
+    gws = solution_data["gws"]
+    all_gw = solution_data["all_gw"]
+    next_gw = solution_data["next_gw"]
+    points = solution_data["points"]
+    minutes = solution_data["minutes"]
+
+    squad = values["squad"]
+    squad_fh = values["squad_fh"]
+    lineup = values["lineup"]
+    captain = values["captain"]
+    vicecap = values["vicecap"]
+    bench = values["bench"]
+    transfer_in = values["transfer_in"]
+    transfer_out_first = values["transfer_out_first"]
+    transfer_out = values["transfer_out"]
+    in_the_bank = values["itb"]
+    fts = values["ft"]
+    penalized_transfers = values["pt"]
+    use_wc = values["use_wc"]
+    use_bb = values["use_bb"]
+    use_fh = values["use_fh"]
+    use_tc = values["use_tc"]
+    num_transfers = transfer_out.sum(axis=0)
+    gw_total = values["gw_total"]
+
+    # DataFrame generation
+    gw_idx, player_idx = np.nonzero((squad[:, 1:] + squad_fh + transfer_out > BINARY_THRESHOLD).T)
+    sel = (player_idx, gw_idx)
+    lp = merged_data.iloc[player_idx]
+    fh_active = use_fh[gw_idx] > BINARY_THRESHOLD
+    is_squad = (~fh_active & (squad[:, 1:][sel] > BINARY_THRESHOLD)) | (fh_active & (squad_fh[sel] > BINARY_THRESHOLD))
+    is_lineup = (lineup[sel] > BINARY_THRESHOLD).astype(int)
+    is_captain = (captain[sel] > BINARY_THRESHOLD).astype(int)
+    is_tc = (use_tc[sel] > BINARY_THRESHOLD).astype(int)
+    is_transfer_in = transfer_in[sel] > BINARY_THRESHOLD
+    is_transfer_out = transfer_out[sel] > BINARY_THRESHOLD
+    on_bench = bench[sel] > BINARY_THRESHOLD
+    bench_value = np.where(on_bench.any(axis=1), on_bench.shape[1] - 1 - np.argmax(on_bench[:, ::-1], axis=1), -1)
+    sold_first = solution_data["price_modified"][player_idx] & (transfer_out_first[sel] > BINARY_THRESHOLD)
+    player_sell_price = np.where(sold_first, solution_data["sell_price"][player_idx], solution_data["buy_price"][player_idx])
+    multiplier = is_lineup + is_captain + is_tc
+    chip_text = np.select(
+        [use_wc[gw_idx] > BINARY_THRESHOLD, fh_active, use_bb[gw_idx] > BINARY_THRESHOLD, is_tc == 1],
+        ["WC", "FH", "BB", "TC"],
+        "",
+    )
+
+    picks_df = pd.DataFrame(
+        {
+            "id": lp.index.to_numpy(),
+            "week": np.array(gws)[gw_idx],
+            "name": lp["web_name"].to_numpy(),
+            "pos": type_data.loc[lp["element_type"], "singular_name_short"].to_numpy(),
+            "type": lp["element_type"].to_numpy(),
+            "team": lp["name"].to_numpy(),
+            "buy_price": price_column(is_transfer_in, solution_data["buy_price"][player_idx]),
+            "sell_price": price_column(is_transfer_out, player_sell_price),
+            "xP": [round(v, 2) for v in points[sel]],
+            "xMin": minutes[sel],
+            "squad": is_squad.astype(int),
+            "lineup": is_lineup,
+            "bench": bench_value,
+            "captain": is_captain,
+            "vicecaptain": (vicecap[sel] > BINARY_THRESHOLD).astype(int),
+            "transfer_in": is_transfer_in.astype(int),
+            "transfer_out": is_transfer_out.astype(int),
+            "multiplier": multiplier,
+            "xp_cont": points[sel] * multiplier,
+            "chip": chip_text,
+            "iter": iteration,
+            "ft": fts[1:][gw_idx],
+            "transfer_count": num_transfers[gw_idx],
+        }
+    ).sort_values(by=["week", "lineup", "type", "xP"], ascending=[True, False, True, True])
+    total_xp = float(((lineup + captain) * points).sum())
+
+    picks_df.sort_values(by=["week", "squad", "lineup", "bench", "type"], ascending=[True, False, False, True, True], inplace=True)
+
+    # Writing summary
+    summary_of_actions = ""
+    move_summary = {"chip": [], "buy": [], "sell": []}
+
+    # collect statistics
+    statistics = {int(all_gw[0]): {"itb": float(in_the_bank[0]), "ft": float(fts[0])}}
+    web_names = merged_data["web_name"].to_numpy()
+
+    def get_display(row):
+        return f"{row['name']} ({row['xP']}{', C' if row['captain'] == 1 else ''}{', V' if row['vicecaptain'] == 1 else ''})"
+
+    for j, w in enumerate(gws):
+        summary_of_actions += f"** GW {w}:\n"
+        chip_decision = (
+            ("WC" if use_wc[j] > BINARY_THRESHOLD else "")
+            + ("FH" if use_fh[j] > BINARY_THRESHOLD else "")
+            + ("BB" if use_bb[j] > BINARY_THRESHOLD else "")
+            + ("TC" if use_tc[:, j].sum() > BINARY_THRESHOLD else "")
+        )
+        if chip_decision != "":
+            summary_of_actions += "CHIP " + chip_decision + "\n"
+            move_summary["chip"].append(chip_decision + str(w))
+        summary_of_actions += (
+            f"ITB={round(in_the_bank[j], 1)}->{round(in_the_bank[j + 1], 1)}, "
+            f"FT={round(fts[j + 1])}, "
+            f"PT={round(penalized_transfers[j])}, "
+            f"NT={round(num_transfers[j])}\n"
+        )
+        for i in np.flatnonzero(transfer_in[:, j] > BINARY_THRESHOLD):
+            summary_of_actions += f"Buy {players[i]} - {web_names[i]}\n"
+            if w == next_gw:
+                move_summary["buy"].append(web_names[i])
+
+        for i in np.flatnonzero(transfer_out[:, j] > BINARY_THRESHOLD):
+            summary_of_actions += f"Sell {players[i]} - {web_names[i]}\n"
+            if w == next_gw:
+                move_summary["sell"].append(web_names[i])
+
+        lineup_players = picks_df[(picks_df["week"] == w) & (picks_df["lineup"] == 1)]
+        bench_players = picks_df[(picks_df["week"] == w) & (picks_df["bench"] >= 0)]
+
+        summary_of_actions += "\nLineup: \n"
+        for typ in [1, 2, 3, 4]:
+            type_players = lineup_players[lineup_players["type"] == typ]
+            entries = type_players.apply(get_display, axis=1)
+            summary_of_actions += "\t" + ", ".join(entries.tolist()) + "\n"
+        summary_of_actions += "Bench: \n\t" + ", ".join(bench_players.apply(get_display, axis=1)) + "\n"
+        summary_of_actions += "Lineup xPts: " + str(round(lineup_players["xp_cont"].sum(), 2)) + "\n"
+        if w != max(gws):
+            summary_of_actions += "\n\n"
+
+        statistics[int(w)] = {
+            "itb": float(in_the_bank[j + 1]),
+            "ft": float(fts[j + 1]),
+            "pt": float(penalized_transfers[j]),
+            "nt": float(num_transfers[j]),
+            "xP": lineup_players["xp_cont"].sum(),
+            "obj": round(float(gw_total[j]), 2),
+            "chip": chip_decision if chip_decision != "" else None,
+        }
+
+    def format_decisions(items):
+        return ", ".join(items) if items else "-"
+
+    buy_decisions = format_decisions(move_summary["buy"])
+    sell_decisions = format_decisions(move_summary["sell"])
+    chip_decisions = format_decisions(move_summary["chip"])
+
+    if options.get("hide_transfers"):
+        buy_decisions = sell_decisions = "-"
+
+    return {
+        "picks": picks_df,
+        "total_xp": total_xp,
+        "summary": summary_of_actions,
+        "statistics": statistics,
+        "buy": buy_decisions,
+        "sell": sell_decisions,
+        "chip": chip_decisions,
+    }
+
+
+def get_model_builder(data, options):
+    """
+    Returns the builder of the model for ``options``, ``sasoptpy`` or ``matrix``
+
+    With ``model_builder`` set to ``auto``, the matrix builder is picked when an option only it implements is set, i.e.
+    ``MATRIX_OPTIONS``, a ``previous_plan`` warm start or the heuristic solver, and sasoptpy otherwise. Options that
+    only the builder that was not picked implements raise a ValueError.
+    """
+    builder = options.get("model_builder", "auto")
+    if builder not in ["auto", "sasoptpy", "matrix"]:
+        raise ValueError(f"Unknown model_builder {builder}, use auto, sasoptpy or matrix")
+    matrix_options = [name for name in MATRIX_OPTIONS if options.get(name, False)]
+    if data.get("previous_plan") is not None:
+        matrix_options.append("previous_plan")
+    if options.get("solver", "highs") == "heuristic":
+        matrix_options.append("solver heuristic")
+    sasoptpy_options = [name for name in SASOPTPY_OPTIONS if options.get(name, False)]
+    if matrix_options and sasoptpy_options:
+        raise ValueError(f"{', '.join(sasoptpy_options)} cannot be combined with {', '.join(matrix_options)}, they need different model builders")
+    if builder == "auto":
+        builder = "matrix" if matrix_options else "sasoptpy"
+        reason = f" for {', '.join(matrix_options)}" if matrix_options else ""
+        print(f"Using the {builder} model builder{reason}")
+    elif builder == "sasoptpy" and matrix_options:
+        raise ValueError(f"{', '.join(matrix_options)} need the matrix model builder, set model_builder to matrix or auto")
+    elif builder == "matrix" and sasoptpy_options:
+        raise ValueError(f"{', '.join(sasoptpy_options)} needs the sasoptpy model builder, set model_builder to sasoptpy or auto")
+    return builder
+
+
 def solve_multi_period_fpl(data, options):
     """
     Solves multi-objective FPL problem with transfers
@@ -276,6 +1017,11 @@ def solve_multi_period_fpl(data, options):
     except Exception:
         pass
 
+    if get_model_builder(data, options) == "matrix":
+        from dev.matrix_solver import solve_matrix_modes  # noqa: PLC0415 (matrix_solver imports from this module)
+
+        return solve_matrix_modes(data, options)
+
     # Arguments
     problem_id = get_random_id(5)
     horizon = options.get("horizon", 3)
@@ -284,10 +1030,12 @@ def solve_multi_period_fpl(data, options):
     bench_weights = options.get("bench_weights", {0: 0.03, 1: 0.21, 2: 0.06, 3: 0.002})
     bench_weights = {int(key): value for (key, value) in bench_weights.items()}
     # wc_limit = options.get('wc_limit', 0)
-    ft_value = options.get("ft_value", 1.5)
     ft_value_list = options.get("ft_value_list", {})
     # ft_gw_value = {}
     ft_use_penalty = options.get("ft_use_penalty", None)
+    ft_formulation = options.get("ft_formulation", "big_m")
+    compact_lineup = options.get("lineup_formulation", "full") == "compact"
+    model_presolve = options.get("model_presolve", False)
     itb_value = options.get("itb_value", 0.08)
     initial_ft = max(0, data.get("ft", 1))
     ft_base = data.get("ft_base", 1)
@@ -316,6 +1064,15 @@ def solve_multi_period_fpl(data, options):
     else:
         threshold_gw = next_gw
 
+    unaffordable = []
+    if model_presolve:
+        # players who never fit in the budget are left out of the pool, unless a rule asks for them
+        protected = set(initial_squad) | set(options.get("locked", None) or [])
+        protected |= {p for p, _ in get_player_gws(options.get("locked_next_gw", None) or [], next_gw)}
+        protected |= {bt.get("transfer_in") for bt in booked_transfers}
+        unaffordable = get_unaffordable_players(data, merged_data, itb, protected)
+        merged_data = merged_data.drop(index=unaffordable)
+
     # Sets
     players = merged_data.index.to_list()
     el_types = type_data.index.to_list()
@@ -330,43 +1087,90 @@ def solve_multi_period_fpl(data, options):
     price_modified_players = data["price_modified_players"]
     ft_states = [0, 1, 2, 3, 4, 5]
 
+    # Chips are only created in the gameweeks they can be played in, and first sales where the player can be sold
+    chip_gws = get_chip_gws(options, gws)
+    wc_gws, bb_gws, fh_gws, tc_gws = (chip_gws[chip] for chip in ["wc", "bb", "fh", "tc"])
+    locked_players = options.get("locked", None) or []
+    no_sale_gws = set(options.get("use_fh", [])) | set(options.get("no_transfer_gws", None) or [])
+    first_sale_players = [p for p in price_modified_players if p not in locked_players]
+    first_sale_keys = [(p, w) for p in first_sale_players for w in gws if w not in no_sale_gws]
+    player_gws = list(itertools.product(players, gws))
+    type_gws = list(itertools.product(el_types, gws))
+    team_gws = list(itertools.product(teams, gws))
+    skipped_rows = 0
+    presolve_bounds = 0
+
+    def set_rule_bounds(variables, lb=None, ub=None):
+        # with model_presolve, rules on single variables set their bounds instead of adding rows
+        nonlocal presolve_bounds
+        for v in variables:
+            if isinstance(v, so.Variable):
+                v.set_bounds(lb=lb, ub=ub)
+                presolve_bounds += 1
+
+    def in_weeks(keys, weeks, rows_per_key=1):
+        # keeps the keys of a constraint family whose gameweek (last entry) is in weeks, and counts the rows left out
+        nonlocal skipped_rows
+        kept = [key for key in keys if (key[-1] if isinstance(key, tuple) else key) in weeks]
+        skipped_rows += (len(keys) - len(kept)) * rows_per_key
+        return kept
+
     # Model
     model = so.Model(name=problem_name)
 
     # Variables
     squad = model.add_variables(players, all_gw, name="squad", vartype=so.binary)
-    squad_fh = model.add_variables(players, gws, name="squad_fh", vartype=so.binary)
+    squad_fh_vars = model.add_variables(players, fh_gws, name="squad_fh", vartype=so.binary)
+    squad_fh = fill_missing(squad_fh_vars, player_gws, itertools.product(players, fh_gws))
     lineup = model.add_variables(players, gws, name="lineup", vartype=so.binary)
     captain = model.add_variables(players, gws, name="captain", vartype=so.binary)
-    vicecap = model.add_variables(players, gws, name="vicecap", vartype=so.binary)
-    bench = model.add_variables(players, gws, order, name="bench", vartype=so.binary)
+    if compact_lineup:
+        # vicecap and bench only pick among integral lineup and squad entries, so they can stay continuous, and bench slot 0
+        # is only created for goalkeepers and the other slots only for outfield players
+        keepers = set(merged_data.index[merged_data["element_type"] == 1])
+        bench_keys = [(p, w, o) for p in players for w in gws for o in order if (o == 0) == (p in keepers)]
+        vicecap = model.add_variables(players, gws, name="vicecap", vartype=so.continuous, lb=0, ub=1)
+        bench_vars = model.add_variables(bench_keys, name="bench", vartype=so.continuous, lb=0, ub=1)
+        bench = fill_missing(bench_vars, itertools.product(players, gws, order), bench_keys)
+    else:
+        vicecap = model.add_variables(players, gws, name="vicecap", vartype=so.binary)
+        bench = model.add_variables(players, gws, order, name="bench", vartype=so.binary)
     transfer_in = model.add_variables(players, gws, name="transfer_in", vartype=so.binary)
-    transfer_out_first = model.add_variables(price_modified_players, gws, name="tr_out_first", vartype=so.binary)
+    transfer_out_first_vars = model.add_variables(first_sale_keys, name="tr_out_first", vartype=so.binary)
+    transfer_out_first = fill_missing(transfer_out_first_vars, itertools.product(price_modified_players, gws), first_sale_keys)
     transfer_out_regular = model.add_variables(players, gws, name="tr_out_reg", vartype=so.binary)
     transfer_out = {
         (p, w): transfer_out_regular[p, w] + (transfer_out_first[p, w] if p in price_modified_players else 0) for p in players for w in gws
     }
     in_the_bank = model.add_variables(all_gw, name="itb", vartype=so.continuous, lb=0)
     fts = model.add_variables(all_gw, name="ft", vartype=so.integer, lb=0, ub=5)
-    ft_above_ub = model.add_variables(gws, name="ft_above", vartype=so.binary)
-    ft_below_lb = model.add_variables(gws, name="ft_below", vartype=so.binary)
+    if ft_formulation != "state":
+        ft_above_ub = model.add_variables(gws, name="ft_above", vartype=so.binary)
+        ft_below_lb = model.add_variables(gws, name="ft_below", vartype=so.binary)
     fts_state = model.add_variables(gws, ft_states, name="ft_state", vartype=so.binary)
     penalized_transfers = model.add_variables(gws, name="pt", vartype=so.integer, lb=0)
     aux = model.add_variables(gws, name="aux", vartype=so.binary)
     transfer_count = model.add_variables(gws, name="trc", vartype=so.integer, lb=0, ub=SQUAD_SIZE)
 
-    use_wc = model.add_variables(gws, name="use_wc", vartype=so.binary)
-    use_bb = model.add_variables(gws, name="use_bb", vartype=so.binary)
-    use_fh = model.add_variables(gws, name="use_fh", vartype=so.binary)
-    use_tc = model.add_variables(players, gws, name="use_tc", vartype=so.binary)
+    use_wc = fill_missing(model.add_variables(wc_gws, name="use_wc", vartype=so.binary), gws, wc_gws)
+    use_bb = fill_missing(model.add_variables(bb_gws, name="use_bb", vartype=so.binary), gws, bb_gws)
+    use_fh = fill_missing(model.add_variables(fh_gws, name="use_fh", vartype=so.binary), gws, fh_gws)
+    if compact_lineup:
+        # TC is picked per gameweek and follows the captain
+        use_tc_vars = model.add_variables(players, tc_gws, name="use_tc", vartype=so.continuous, lb=0, ub=1)
+        tc_chip = model.add_variables(tc_gws, name="tc_chip", vartype=so.binary)
+    else:
+        use_tc_vars = model.add_variables(players, tc_gws, name="use_tc", vartype=so.binary)
+    use_tc = fill_missing(use_tc_vars, player_gws, itertools.product(players, tc_gws))
 
     # Dictionaries
-    lineup_type_count = {(t, w): so.expr_sum(lineup[p, w] for p in players if merged_data.loc[p, "element_type"] == t) for t in el_types for w in gws}
-    squad_type_count = {(t, w): so.expr_sum(squad[p, w] for p in players if merged_data.loc[p, "element_type"] == t) for t in el_types for w in gws}
-    squad_fh_type_count = {
-        (t, w): so.expr_sum(squad_fh[p, w] for p in players if merged_data.loc[p, "element_type"] == t) for t in el_types for w in gws
-    }
-    player_type = merged_data["element_type"].to_dict()
+    player_groups = get_player_groups(merged_data)
+    type_players = {t: player_groups["type"].get(t, []) for t in el_types}
+    team_players = {t: player_groups["team"].get(t, []) for t in teams}
+    team_def_players = {t: player_groups["team_pos"].get((t, "G"), []) + player_groups["team_pos"].get((t, "D"), []) for t in teams}
+    lineup_type_count = {(t, w): so.expr_sum(lineup[p, w] for p in type_players[t]) for t in el_types for w in gws}
+    squad_type_count = {(t, w): so.expr_sum(squad[p, w] for p in type_players[t]) for t in el_types for w in gws}
+    squad_fh_type_count = {(t, w): so.expr_sum(squad_fh[p, w] for p in type_players[t]) for t in el_types for w in fh_gws}
     # player_price = (merged_data['now_cost'] / 10).to_dict()
     sell_price = data["sell_price"]
     buy_price = data["buy_price"]
@@ -379,47 +1183,65 @@ def solve_multi_period_fpl(data, options):
     }
     fh_sell_price = {p: sell_price[p] if p in price_modified_players else buy_price[p] for p in players}
     bought_amount = {w: so.expr_sum(buy_price[p] * transfer_in[p, w] for p in players) for w in gws}
-    points_player_week = {(p, w): merged_data.loc[p, f"{w}_Pts"] for p in players for w in gws}
-    minutes_player_week = {(p, w): merged_data.loc[p, f"{w}_xMins"] for p in players for w in gws}
-    player_team = {p: merged_data.loc[p, "name"] for p in players}
+    points_matrix, minutes_matrix = get_player_week_matrices({**data, "merged_data": merged_data}, gws)
+    minutes_player_week = {(p, w): minutes_matrix[i, j] for i, p in enumerate(players) for j, w in enumerate(gws)}
+    points_player_week = {(p, w): points_matrix[i, j] for i, p in enumerate(players) for j, w in enumerate(gws)}
     squad_count = {w: so.expr_sum(squad[p, w] for p in players) for w in gws}
-    squad_fh_count = {w: so.expr_sum(squad_fh[p, w] for p in players) for w in gws}
+    squad_fh_count = {w: so.expr_sum(squad_fh[p, w] for p in players) for w in fh_gws}
     num_transfers = {w: so.expr_sum(transfer_out[p, w] for p in players) for w in gws}
     transfer_diff = {w: num_transfers[w] - fts[w] - SQUAD_SIZE * use_wc[w] for w in gws}
     use_tc_gw = {w: so.expr_sum(use_tc[p, w] for p in players) for w in gws}
 
     # Initial conditions
-    model.add_constraints((squad[p, next_gw - 1] == 1 for p in initial_squad), name="initial_squad_players")
-    model.add_constraints((squad[p, next_gw - 1] == 0 for p in players if p not in initial_squad), name="initial_squad_others")
-    model.add_constraint(in_the_bank[next_gw - 1] == itb, name="initial_itb")
+    if model_presolve:
+        set_rule_bounds([squad[p, next_gw - 1] for p in initial_squad], lb=1)
+        set_rule_bounds([squad[p, next_gw - 1] for p in players if p not in initial_squad], ub=0)
+        set_rule_bounds([in_the_bank[next_gw - 1]], lb=itb, ub=itb)
+    else:
+        model.add_constraints((squad[p, next_gw - 1] == 1 for p in initial_squad), name="initial_squad_players")
+        model.add_constraints((squad[p, next_gw - 1] == 0 for p in players if p not in initial_squad), name="initial_squad_others")
+        model.add_constraint(in_the_bank[next_gw - 1] == itb, name="initial_itb")
     model.add_constraint(fts[next_gw] == initial_ft * (1 - use_wc[next_gw]) + ft_base * use_wc[next_gw], name="initial_ft")
     model.add_constraints((fts[w] >= 1 for w in gws if w > next_gw), name="future_ft_limit")
 
     # Constraints
     model.add_constraints((squad_count[w] == SQUAD_SIZE for w in gws), name="squad_count")
-    model.add_constraints((squad_fh_count[w] == SQUAD_SIZE * use_fh[w] for w in gws), name="squad_fh_count")
+    model.add_constraints((squad_fh_count[w] == SQUAD_SIZE * use_fh[w] for w in in_weeks(gws, fh_gws)), name="squad_fh_count")
     model.add_constraints(
         (so.expr_sum(lineup[p, w] for p in players) == LINEUP_SIZE + (SQUAD_SIZE - LINEUP_SIZE) * use_bb[w] for w in gws), name="lineup_count"
     )
-    model.add_constraints((so.expr_sum(bench[p, w, 0] for p in players if player_type[p] == 1) == 1 - use_bb[w] for w in gws), name="bench_gk")
+    model.add_constraints((so.expr_sum(bench[p, w, 0] for p in type_players[1]) == 1 - use_bb[w] for w in gws), name="bench_gk")
     model.add_constraints((so.expr_sum(bench[p, w, o] for p in players) == 1 - use_bb[w] for w in gws for o in [1, 2, 3]), name="bench_count")
     model.add_constraints((so.expr_sum(captain[p, w] for p in players) == 1 for w in gws), name="captain_count")
     model.add_constraints((so.expr_sum(vicecap[p, w] for p in players) == 1 for w in gws), name="vicecap_count")
-    model.add_constraints((lineup[p, w] <= squad[p, w] + use_fh[w] for p in players for w in gws), name="lineup_squad_rel")
-    model.add_constraints((bench[p, w, o] <= squad[p, w] + use_fh[w] for p in players for w in gws for o in order), name="bench_squad_rel")
-    model.add_constraints((lineup[p, w] <= squad_fh[p, w] + 1 - use_fh[w] for p in players for w in gws), name="lineup_squad_fh_rel")
-    model.add_constraints((bench[p, w, o] <= squad_fh[p, w] + 1 - use_fh[w] for p in players for w in gws for o in order), name="bench_squad_fh_rel")
-    model.add_constraints((captain[p, w] <= lineup[p, w] for p in players for w in gws), name="captain_lineup_rel")
-    model.add_constraints((vicecap[p, w] <= lineup[p, w] for p in players for w in gws), name="vicecap_lineup_rel")
-    model.add_constraints((captain[p, w] + vicecap[p, w] <= 1 for p in players for w in gws), name="cap_vc_rel")
-    model.add_constraints((lineup[p, w] + so.expr_sum(bench[p, w, o] for o in order) <= 1 for p in players for w in gws), name="lineup_bench_rel")
+    if compact_lineup:
+        # a squad player fills at most one lineup or bench slot, and captain and vicecap share a lineup spot
+        player_slots = {(p, w): lineup[p, w] + so.expr_sum(bench[p, w, o] for o in order) for p in players for w in gws}
+        model.add_constraints((player_slots[p, w] <= squad[p, w] + use_fh[w] for p in players for w in gws), name="lineup_squad_rel")
+        model.add_constraints(
+            (player_slots[p, w] <= squad_fh[p, w] + 1 - use_fh[w] for p, w in in_weeks(player_gws, fh_gws)), name="lineup_squad_fh_rel"
+        )
+        model.add_constraints((captain[p, w] + vicecap[p, w] <= lineup[p, w] for p in players for w in gws), name="captain_vicecap_rel")
+    else:
+        model.add_constraints((lineup[p, w] <= squad[p, w] + use_fh[w] for p in players for w in gws), name="lineup_squad_rel")
+        model.add_constraints((bench[p, w, o] <= squad[p, w] + use_fh[w] for p in players for w in gws for o in order), name="bench_squad_rel")
+        model.add_constraints((lineup[p, w] <= squad_fh[p, w] + 1 - use_fh[w] for p, w in in_weeks(player_gws, fh_gws)), name="lineup_squad_fh_rel")
+        model.add_constraints(
+            (bench[p, w, o] <= squad_fh[p, w] + 1 - use_fh[w] for p, w in in_weeks(player_gws, fh_gws, len(order)) for o in order),
+            name="bench_squad_fh_rel",
+        )
+        model.add_constraints((captain[p, w] <= lineup[p, w] for p in players for w in gws), name="captain_lineup_rel")
+        model.add_constraints((vicecap[p, w] <= lineup[p, w] for p in players for w in gws), name="vicecap_lineup_rel")
+        model.add_constraints((captain[p, w] + vicecap[p, w] <= 1 for p in players for w in gws), name="cap_vc_rel")
+        model.add_constraints((lineup[p, w] + so.expr_sum(bench[p, w, o] for o in order) <= 1 for p in players for w in gws), name="lineup_bench_rel")
     model.add_constraints((lineup_type_count[t, w] >= type_data.loc[t, "squad_min_play"] for t in el_types for w in gws), name="valid_formation_lb")
     model.add_constraints(
         (lineup_type_count[t, w] <= type_data.loc[t, "squad_max_play"] + use_bb[w] for t in el_types for w in gws), name="valid_formation_ub"
     )
     model.add_constraints((squad_type_count[t, w] == type_data.loc[t, "squad_select"] for t in el_types for w in gws), name="valid_squad")
     model.add_constraints(
-        (squad_fh_type_count[t, w] == type_data.loc[t, "squad_select"] * use_fh[w] for t in el_types for w in gws), name="valid_squad_fh"
+        (squad_fh_type_count[t, w] == type_data.loc[t, "squad_select"] * use_fh[w] for t, w in in_weeks(type_gws, fh_gws)),
+        name="valid_squad_fh",
     )
 
     # special case where user's current squad has too many players from the same team
@@ -430,18 +1252,18 @@ def solve_multi_period_fpl(data, options):
         model.add_constraints((transfer_count[w] >= 1 - SQUAD_SIZE * no_transfer[w] for w in gws), name="no_transfer_2")
 
         model.add_constraints(
-            (so.expr_sum(squad[p, w] for p in players if player_team[p] == t) <= MAX_PLAYERS_PER_TEAM + no_transfer[w] for t in teams for w in gws),
+            (so.expr_sum(squad[p, w] for p in team_players[t]) <= MAX_PLAYERS_PER_TEAM + no_transfer[w] for t in teams for w in gws),
             name="team_limit",
         )
 
     else:  # normal case where user has a valid squad
         model.add_constraints(
-            (so.expr_sum(squad[p, w] for p in players if player_team[p] == t) <= MAX_PLAYERS_PER_TEAM for t in teams for w in all_gw),
+            (so.expr_sum(squad[p, w] for p in team_players[t]) <= MAX_PLAYERS_PER_TEAM for t in teams for w in all_gw),
             name="team_limit",
         )
 
     model.add_constraints(
-        (so.expr_sum(squad_fh[p, w] for p in players if player_team[p] == t) <= MAX_PLAYERS_PER_TEAM * use_fh[w] for t in teams for w in gws),
+        (so.expr_sum(squad_fh[p, w] for p in team_players[t]) <= MAX_PLAYERS_PER_TEAM * use_fh[w] for t, w in in_weeks(team_gws, fh_gws)),
         name="team_limit_fh",
     )
     ## Transfer constraints
@@ -460,12 +1282,12 @@ def solve_multi_period_fpl(data, options):
         (
             so.expr_sum(fh_sell_price[p] * squad[p, w - 1] for p in players) + in_the_bank[w - 1]
             >= so.expr_sum(fh_sell_price[p] * squad_fh[p, w] for p in players)
-            for w in gws
+            for w in in_weeks(gws, fh_gws)
         ),
         name="fh_budget",
     )
-    model.add_constraints((transfer_in[p, w] <= 1 - use_fh[w] for p in players for w in gws), name="no_tr_in_fh")
-    model.add_constraints((transfer_out[p, w] <= 1 - use_fh[w] for p in players for w in gws), name="no_tr_out_fh")
+    model.add_constraints((transfer_in[p, w] <= 1 - use_fh[w] for p, w in in_weeks(player_gws, fh_gws)), name="no_tr_in_fh")
+    model.add_constraints((transfer_out[p, w] <= 1 - use_fh[w] for p, w in in_weeks(player_gws, fh_gws)), name="no_tr_out_fh")
 
     ## Free transfer constraints
     # 2024-2025 variation: min 1 / max 5 / roll over WC & FH
@@ -473,32 +1295,58 @@ def solve_multi_period_fpl(data, options):
 
     # 2056-26 afcon variation: always have 5 ft in gw16 no matter what
     afcon_gw = 15
-    raw_gw_ft = {w: fts[w] - transfer_count[w] + (5 if w == afcon_gw else 1) - use_wc[w] - use_fh[w] for w in gws}
-    m = 20  # big m for bounding constraints, picked 20 because nobody will ever get to 20 ft in a solve
+    ft_gain = {w: 5 if w == afcon_gw else 1 for w in gws}
+
+    if ft_formulation == "state":
+        # FT STATE MOVES
+        # the FT state of the next gameweek is reached by a move from this one, and each move fixes the range of FTs used
+        ft_used = {w: transfer_count[w] + use_wc[w] + use_fh[w] for w in gws}
+        ft_moves = {(w, s, t): used for w in gws[:-1] for (s, t), used in get_ft_moves(ft_states, ft_gain[w]).items()}
+        ft_move = model.add_variables(list(ft_moves), name="ft_move", vartype=so.continuous, lb=0)
+        model.add_constraints(
+            (so.expr_sum(ft_move[w, s, t] for t in ft_states if (w, s, t) in ft_moves) == fts_state[w, s] for w in gws[:-1] for s in ft_states),
+            name="ft_move_from",
+        )
+        model.add_constraints(
+            (so.expr_sum(ft_move[w, s, t] for s in ft_states if (w, s, t) in ft_moves) == fts_state[w + 1, t] for w in gws[:-1] for t in ft_states),
+            name="ft_move_to",
+        )
+        model.add_constraints(
+            (ft_used[w] >= so.expr_sum(lb * ft_move[v, s, t] for (v, s, t), (lb, _) in ft_moves.items() if v == w) for w in gws[:-1]),
+            name="ft_used_lb",
+        )
+        model.add_constraints(
+            (ft_used[w] <= so.expr_sum(ub * ft_move[v, s, t] for (v, s, t), (_, ub) in ft_moves.items() if v == w) for w in gws[:-1]),
+            name="ft_used_ub",
+        )
+
+    else:
+        raw_gw_ft = {w: fts[w] - transfer_count[w] + ft_gain[w] - use_wc[w] - use_fh[w] for w in gws}
+        m = 20  # big m for bounding constraints, picked 20 because nobody will ever get to 20 ft in a solve
 
-    # FT_BELOW_LB AND FT_ABOVE_UB LOGIC
+        # FT_BELOW_LB AND FT_ABOVE_UB LOGIC
 
-    # ft_above_ub[w] == 1  <=>  raw_gw_ft[w] > 5
-    model.add_constraints((raw_gw_ft[w] >= 6 - m * (1 - ft_above_ub[w]) for w in gws), name="ft_above_ub_lb")
-    model.add_constraints((raw_gw_ft[w] <= 5 + m * ft_above_ub[w] for w in gws), name="ft_above_ub_ub")
+        # ft_above_ub[w] == 1  <=>  raw_gw_ft[w] > 5
+        model.add_constraints((raw_gw_ft[w] >= 6 - m * (1 - ft_above_ub[w]) for w in gws), name="ft_above_ub_lb")
+        model.add_constraints((raw_gw_ft[w] <= 5 + m * ft_above_ub[w] for w in gws), name="ft_above_ub_ub")
 
-    # ft_below_lb[w] == 1  <=>  raw_gw_ft[w] < 0
-    model.add_constraints((raw_gw_ft[w] <= -1 + m * (1 - ft_below_lb[w]) for w in gws), name="ft_below_lb_ub")
-    model.add_constraints((raw_gw_ft[w] >= 0 - m * ft_below_lb[w] for w in gws), name="ft_below_lb_lb")
+        # ft_below_lb[w] == 1  <=>  raw_gw_ft[w] < 1, i.e. all FTs and more were used
+        model.add_constraints((raw_gw_ft[w] <= 0 + m * (1 - ft_below_lb[w]) for w in gws), name="ft_below_lb_ub")
+        model.add_constraints((raw_gw_ft[w] >= 1 - m * ft_below_lb[w] for w in gws), name="ft_below_lb_lb")
 
-    # FREE TRANSFER LOGIC
+        # FREE TRANSFER LOGIC
 
-    # raw_gw_ft[w] > 5 => fts[w+1] = 5
-    model.add_constraints((fts[w + 1] <= 5 + m * (1 - ft_above_ub[w]) for w in gws if w + 1 in gws), name="ft_cap_upper_ub")
-    model.add_constraints((fts[w + 1] >= 5 - m * (1 - ft_above_ub[w]) for w in gws if w + 1 in gws), name="ft_cap_upper_lb")
+        # raw_gw_ft[w] > 5 => fts[w+1] = 5
+        model.add_constraints((fts[w + 1] <= 5 + m * (1 - ft_above_ub[w]) for w in gws if w + 1 in gws), name="ft_cap_upper_ub")
+        model.add_constraints((fts[w + 1] >= 5 - m * (1 - ft_above_ub[w]) for w in gws if w + 1 in gws), name="ft_cap_upper_lb")
 
-    # raw_gw_ft[w] < 0 => fts[w+1] = 1
-    model.add_constraints((fts[w + 1] <= 1 + m * (1 - ft_below_lb[w]) for w in gws if w + 1 in gws), name="ft_cap_lower_ub")
-    model.add_constraints((fts[w + 1] >= 1 - m * (1 - ft_below_lb[w]) for w in gws if w + 1 in gws), name="ft_cap_lower_lb")
+        # raw_gw_ft[w] < 1 => fts[w+1] = 1
+        model.add_constraints((fts[w + 1] <= 1 + m * (1 - ft_below_lb[w]) for w in gws if w + 1 in gws), name="ft_cap_lower_ub")
+        model.add_constraints((fts[w + 1] >= 1 - m * (1 - ft_below_lb[w]) for w in gws if w + 1 in gws), name="ft_cap_lower_lb")
 
-    # 0 <= raw_gw_ft <= 5 => fts[w+1] = raw_gw_ft[w]
-    model.add_constraints((fts[w + 1] - raw_gw_ft[w] <= m * (ft_above_ub[w] + ft_below_lb[w]) for w in gws if w + 1 in gws), name="ft_inrange_ub")
-    model.add_constraints((raw_gw_ft[w] - fts[w + 1] <= m * (ft_above_ub[w] + ft_below_lb[w]) for w in gws if w + 1 in gws), name="ft_inrange_lb")
+        # 1 <= raw_gw_ft <= 5 => fts[w+1] = raw_gw_ft[w]
+        model.add_constraints((fts[w + 1] - raw_gw_ft[w] <= m * (ft_above_ub[w] + ft_below_lb[w]) for w in gws if w + 1 in gws), name="ft_inrange_ub")
+        model.add_constraints((raw_gw_ft[w] - fts[w + 1] <= m * (ft_above_ub[w] + ft_below_lb[w]) for w in gws if w + 1 in gws), name="ft_inrange_lb")
 
     model.add_constraints((fts[w] == so.expr_sum(fts_state[w, s] * s for s in ft_states) for w in gws), name="ftsc1")
     model.add_constraints((so.expr_sum(fts_state[w, s] for s in ft_states) == 1 for w in gws), name="ftsc2")
@@ -508,10 +1356,14 @@ def solve_multi_period_fpl(data, options):
     model.add_constraints((penalized_transfers[w] >= transfer_diff[w] for w in gws), name="pen_transfer_rel")
 
     ## Chip constraints
-    model.add_constraints((use_wc[w] + use_fh[w] + use_bb[w] + use_tc_gw[w] <= 1 for w in gws), name="single_chip")
-    model.add_constraints((aux[w] <= 1 - use_wc[w - 1] for w in gws if w > next_gw), name="ft_after_wc")
-    model.add_constraints((aux[w] <= 1 - use_fh[w - 1] for w in gws if w > next_gw), name="ft_after_fh")
-    model.add_constraints((use_tc[p, w] <= captain[p, w] for p in players for w in gws), name="tc_cap_rel")
+    # a single possible chip in a gameweek cannot clash with another one
+    multi_chip_gws = [w for w in gws if sum(w in weeks for weeks in chip_gws.values()) > 1]
+    model.add_constraints((use_wc[w] + use_fh[w] + use_bb[w] + use_tc_gw[w] <= 1 for w in in_weeks(gws, multi_chip_gws)), name="single_chip")
+    model.add_constraints((aux[w] <= 1 - use_wc[w - 1] for w in in_weeks(gws[1:], [w + 1 for w in wc_gws])), name="ft_after_wc")
+    model.add_constraints((aux[w] <= 1 - use_fh[w - 1] for w in in_weeks(gws[1:], [w + 1 for w in fh_gws])), name="ft_after_fh")
+    model.add_constraints((use_tc[p, w] <= captain[p, w] for p, w in in_weeks(player_gws, tc_gws)), name="tc_cap_rel")
+    if compact_lineup:
+        model.add_constraints((use_tc_gw[w] == tc_chip[w] for w in tc_gws), name="tc_chip_rel")
 
     wc = options.get("use_wc", [])
     if len(wc) > 0:
@@ -535,19 +1387,19 @@ def solve_multi_period_fpl(data, options):
 
     if len(allowed_chip_gws.get("wc", [])) > 0:
         gws_banned = [w for w in gws if w not in allowed_chip_gws["wc"]]
-        model.add_constraints((use_wc[w] == 0 for w in gws_banned), name="banned_wc_gws")
+        model.add_constraints((use_wc[w] == 0 for w in gws_banned if w in wc_gws), name="banned_wc_gws")
         chip_limits["wc"] = 1
     if len(allowed_chip_gws.get("fh", [])) > 0:
         gws_banned = [w for w in gws if w not in allowed_chip_gws["fh"]]
-        model.add_constraints((use_fh[w] == 0 for w in gws_banned), name="banned_fh_gws")
+        model.add_constraints((use_fh[w] == 0 for w in gws_banned if w in fh_gws), name="banned_fh_gws")
         chip_limits["fh"] = 1
     if len(allowed_chip_gws.get("bb", [])) > 0:
         gws_banned = [w for w in gws if w not in allowed_chip_gws["bb"]]
-        model.add_constraints((use_bb[w] == 0 for w in gws_banned), name="banned_bb_gws")
+        model.add_constraints((use_bb[w] == 0 for w in gws_banned if w in bb_gws), name="banned_bb_gws")
         chip_limits["bb"] = 1
     if len(allowed_chip_gws.get("tc", [])) > 0:
         gws_banned = [w for w in gws if w not in allowed_chip_gws["tc"]]
-        model.add_constraints((use_tc_gw[w] == 0 for w in gws_banned), name="banned_tc_gws")
+        model.add_constraints((use_tc_gw[w] == 0 for w in gws_banned if w in tc_gws), name="banned_tc_gws")
         chip_limits["tc"] = 1
 
     if len(forced_chip_gws.get("wc", [])) > 0:
@@ -563,26 +1415,27 @@ def solve_multi_period_fpl(data, options):
         model.add_constraint(so.expr_sum(use_tc_gw[w] for w in forced_chip_gws["tc"]) == 1, name="force_tc_gw")
         chip_limits["tc"] = 1
 
-    model.add_constraint(so.expr_sum(use_wc[w] for w in gws) <= chip_limits.get("wc", 0), name="use_wc_limit")
-    model.add_constraint(so.expr_sum(use_bb[w] for w in gws) <= chip_limits.get("bb", 0), name="use_bb_limit")
-    model.add_constraint(so.expr_sum(use_fh[w] for w in gws) <= chip_limits.get("fh", 0), name="use_fh_limit")
-    model.add_constraint(so.expr_sum(use_tc_gw[w] for w in gws) <= chip_limits.get("tc", 0), name="use_tc_limit")
-    model.add_constraints((squad_fh[p, w] <= use_fh[w] for p in players for w in gws), name="fh_squad_logic")
+    for chip, chip_vars in [("wc", use_wc), ("bb", use_bb), ("fh", use_fh), ("tc", use_tc_gw)]:
+        if len(chip_gws[chip]) > 0:
+            model.add_constraint(so.expr_sum(chip_vars[w] for w in chip_gws[chip]) <= chip_limits.get(chip, 0), name=f"use_{chip}_limit")
+        else:
+            skipped_rows += 1
+    model.add_constraints((squad_fh[p, w] <= use_fh[w] for p, w in in_weeks(player_gws, fh_gws)), name="fh_squad_logic")
 
     ## Multiple-sell fix
-    model.add_constraints(
-        (transfer_out_first[p, w] + transfer_out_regular[p, w] <= 1 for p in price_modified_players for w in gws), name="multi_sell_1"
-    )
+    model.add_constraints((transfer_out_first[p, w] + transfer_out_regular[p, w] <= 1 for p, w in first_sale_keys), name="multi_sell_1")
     model.add_constraints(
         (
             horizon * so.expr_sum(transfer_out_first[p, w] for w in gws if w <= wbar)
             >= so.expr_sum(transfer_out_regular[p, w] for w in gws if w >= wbar)
-            for p in price_modified_players
+            for p in first_sale_players
             for wbar in gws
         ),
         name="multi_sell_2",
     )
-    model.add_constraints((so.expr_sum(transfer_out_first[p, w] for w in gws) <= 1 for p in price_modified_players), name="multi_sell_3")
+    model.add_constraints((so.expr_sum(transfer_out_first[p, w] for w in gws) <= 1 for p in first_sale_players), name="multi_sell_3")
+    num_unsold = len(price_modified_players) - len(first_sale_players)
+    skipped_rows += len(price_modified_players) * len(gws) - len(first_sale_keys) + num_unsold * (len(gws) + 1)
 
     ## Transfer in/out fix
     model.add_constraints((transfer_in[p, w] + transfer_out[p, w] <= 1 for p in players for w in gws), name="tr_in_out_limit")
@@ -591,7 +1444,7 @@ def solve_multi_period_fpl(data, options):
     ft_penalty = dict.fromkeys(gws, 0)
     model.add_constraints((transfer_count[w] >= num_transfers[w] - SQUAD_SIZE * use_wc[w] for w in gws), name="trc_lb")
     model.add_constraints((transfer_count[w] <= num_transfers[w] for w in gws), name="trc_ub1")
-    model.add_constraints((transfer_count[w] <= SQUAD_SIZE * (1 - use_wc[w]) for w in gws), name="trc_ub2")
+    model.add_constraints((transfer_count[w] <= SQUAD_SIZE * (1 - use_wc[w]) for w in in_weeks(gws, wc_gws)), name="trc_ub2")
     if ft_use_penalty is not None:
         ft_penalty = {w: ft_use_penalty * transfer_count[w] for w in gws}
 
@@ -599,24 +1452,38 @@ def solve_multi_period_fpl(data, options):
     if options.get("banned", None):
         print("OC - Banned")
         banned_players = options["banned"]
-        model.add_constraints((so.expr_sum(squad[p, w] for w in gws) == 0 for p in banned_players if p in players), name="ban_player")
-        model.add_constraints((so.expr_sum(squad_fh[p, w] for w in gws) == 0 for p in banned_players if p in players), name="ban_player_fh")
+        if model_presolve:
+            set_rule_bounds([v for p in banned_players if p in players for w in gws for v in [squad[p, w], squad_fh[p, w]]], ub=0)
+        else:
+            model.add_constraints((so.expr_sum(squad[p, w] for w in gws) == 0 for p in banned_players if p in players), name="ban_player")
+            model.add_constraints(
+                (so.expr_sum(squad_fh[p, w] for w in fh_gws) == 0 for p in banned_players if p in players and len(fh_gws) > 0),
+                name="ban_player_fh",
+            )
 
     if options.get("banned_next_gw", None):
         print("OC - Banned Next GW")
-        banned_in_gw = [(x, gws[0]) if isinstance(x, int) else tuple(x) for x in options["banned_next_gw"]]
-        model.add_constraints((squad[p0, p1] == 0 for (p0, p1) in banned_in_gw if p0 in players), name="ban_player_specified_gw")
-        model.add_constraints((squad_fh[p0, p1] == 0 for (p0, p1) in banned_in_gw if p0 in players), name="ban_player_specified_gw_fh")
+        banned_in_gw = get_player_gws(options["banned_next_gw"], next_gw)
+        if model_presolve:
+            set_rule_bounds([squad[p0, p1] for (p0, p1) in banned_in_gw if p0 in players], ub=0)
+            set_rule_bounds([squad_fh[p0, p1] for (p0, p1) in banned_in_gw if p0 in players and p1 in fh_gws], ub=0)
+        else:
+            model.add_constraints((squad[p0, p1] == 0 for (p0, p1) in banned_in_gw if p0 in players), name="ban_player_specified_gw")
+            model.add_constraints(
+                (squad_fh[p0, p1] == 0 for (p0, p1) in banned_in_gw if p0 in players and p1 in fh_gws), name="ban_player_specified_gw_fh"
+            )
 
     if options.get("locked", None):
         print("OC - Locked")
-        locked_players = options["locked"]
         model.add_constraints((squad[p, w] + squad_fh[p, w] == 1 for p in locked_players for w in gws), name="lock_player")
 
     if options.get("locked_next_gw", None):
         print("OC - Locked Next GW")
-        locked_in_gw = [(x, gws[0]) if isinstance(x, int) else tuple(x) for x in options["locked_next_gw"]]
-        model.add_constraints((squad[p0, p1] == 1 for (p0, p1) in locked_in_gw), name="lock_player_specified_gw")
+        locked_in_gw = get_player_gws(options["locked_next_gw"], next_gw)
+        if model_presolve:
+            set_rule_bounds([squad[p0, p1] for (p0, p1) in locked_in_gw], lb=1)
+        else:
+            model.add_constraints((squad[p0, p1] == 1 for (p0, p1) in locked_in_gw), name="lock_player_specified_gw")
 
     if options.get("no_future_transfer", None):
         print("OC - No Future Tr")
@@ -658,41 +1525,30 @@ def solve_multi_period_fpl(data, options):
 
     if options.get("no_transfer_gws", None):
         print("OC - No TR GWs")
-        if len(options["no_transfer_gws"]) > 0:
+        if model_presolve:
+            set_rule_bounds([transfer_in[p, w] for p in players for w in options["no_transfer_gws"] if w in gws], ub=0)
+        elif len(options["no_transfer_gws"]) > 0:
             model.add_constraint(so.expr_sum(transfer_in[p, w] for p in players for w in options["no_transfer_gws"]) == 0, name="banned_gws_for_tr")
 
     if options.get("no_transfer_by_position", None):
         print("OC - No TR by position")
         if len(options["no_transfer_by_position"]) > 0:
             # ignore w=1 as you must transfer in a full squad
-            model.add_constraints(
-                (
-                    transfer_in[p, w] <= use_wc[w]
-                    for p in players
-                    for w in gws
-                    if w > 1
-                    if merged_data.loc[p, "Pos"] in options["no_transfer_by_position"]
-                ),
-                name="no_tr_by_pos",
-            )
+            position_gws = [(p, w) for pos in options["no_transfer_by_position"] for p in player_groups["pos"].get(pos, []) for w in gws if w > 1]
+            if model_presolve:
+                # without a possible WC in the gameweek, the row only bounds the transfer
+                set_rule_bounds([transfer_in[p, w] for p, w in position_gws if w not in wc_gws], ub=0)
+                position_gws = [(p, w) for p, w in position_gws if w in wc_gws]
+            model.add_constraints((transfer_in[p, w] <= use_wc[w] for p, w in position_gws), name="no_tr_by_pos")
 
     max_defs_per_team = options.get("max_defenders_per_team", 3)
     if max_defs_per_team < MAX_PLAYERS_PER_TEAM:  # only add constraints if necessary
         model.add_constraints(
-            (
-                so.expr_sum(squad[p, w] for p in players if player_team[p] == t and merged_data.loc[p, "Pos"] in {"G", "D"}) <= max_defs_per_team
-                for t in teams
-                for w in gws
-            ),
+            (so.expr_sum(squad[p, w] for p in team_def_players[t]) <= max_defs_per_team for t in teams for w in gws),
             name="defenders_per_team_limit",
         )
         model.add_constraints(
-            (
-                so.expr_sum(squad_fh[p, w] for p in players if player_team[p] == t and merged_data.loc[p, "Pos"] in {"G", "D"})
-                <= max_defs_per_team * use_fh[w]
-                for t in teams
-                for w in gws
-            ),
+            (so.expr_sum(squad_fh[p, w] for p in team_def_players[t]) <= max_defs_per_team * use_fh[w] for t, w in in_weeks(team_gws, fh_gws)),
             name="defenders_per_team_limit_fh",
         )
 
@@ -707,76 +1563,43 @@ def solve_multi_period_fpl(data, options):
         player_out = booked_transfer.get("transfer_out", None)
 
         if player_in is not None:
-            model.add_constraint(transfer_in[player_in, transfer_gw] == 1, name=f"booked_transfer_in_{transfer_gw}_{player_in}")
+            if model_presolve:
+                set_rule_bounds([transfer_in[player_in, transfer_gw]], lb=1)
+            else:
+                model.add_constraint(transfer_in[player_in, transfer_gw] == 1, name=f"booked_transfer_in_{transfer_gw}_{player_in}")
         if player_out is not None:
-            model.add_constraint(transfer_out[player_out, transfer_gw] == 1, name=f"booked_transfer_out_{transfer_gw}_{player_out}")
+            # a sale that can be a first sale is split over two variables and stays a row
+            if model_presolve and (player_out, transfer_gw) not in first_sale_keys:
+                set_rule_bounds([transfer_out_regular[player_out, transfer_gw]], lb=1)
+            else:
+                model.add_constraint(transfer_out[player_out, transfer_gw] == 1, name=f"booked_transfer_out_{transfer_gw}_{player_out}")
 
     cp_penalty = {}
     if options.get("no_opposing_play") is True:
         print("OC - No Opposing Play")
-        gw_opp_teams = {
-            w: [(f["home"], f["away"]) for f in fixtures if f["gw"] == w] + [(f["away"], f["home"]) for f in fixtures if f["gw"] == w] for w in gws
-        }
-        for gw in gws:
-            [i for i in fixtures if i["gw"] == gw]
-            if options.get("opposing_play_group", "all") == "all":
-                opposing_players = [(p1, p2) for p1 in players for p2 in players if (player_team[p1], player_team[p2]) in gw_opp_teams[gw]]
-                model.add_constraints((lineup[p1, gw] + lineup[p2, gw] <= 1 for (p1, p2) in opposing_players), name=f"no_opp_{gw}")
-            elif options.get("opposing_play_group") == "position":
-                opposing_positions = [
-                    (1, 3),
-                    (1, 4),
-                    (2, 3),
-                    (2, 4),
-                    (3, 1),
-                    (4, 1),
-                    (3, 2),
-                    (4, 2),
-                ]  # gk vs mid, gk vs fwd, def vs mid, def vs fwd
-                opposing_players = [
-                    (p1, p2)
-                    for p1 in players
-                    for p2 in players
-                    if (player_team[p1], player_team[p2]) in gw_opp_teams[gw] and (player_type[p1], player_type[p2]) in opposing_positions
-                ]
-                model.add_constraints((lineup[p1, gw] + lineup[p2, gw] <= 1 for (p1, p2) in opposing_players), name=f"no_opp_{gw}")
+        opposing_play_group = options.get("opposing_play_group", "all")
+        if opposing_play_group in ["all", "position"]:
+            opposing_pairs = get_opposing_pairs(fixtures, gws, player_groups, opposing_play_group)
+            for gw in gws:
+                model.add_constraints((lineup[p1, gw] + lineup[p2, gw] <= 1 for (p1, p2) in opposing_pairs[gw]), name=f"no_opp_{gw}")
     elif options.get("no_opposing_play") == "penalty":
         print("OC - Penalty Opposing Play")
-        gw_opp_teams = {
-            w: [(f["home"], f["away"]) for f in fixtures if f["gw"] == w] + [(f["away"], f["home"]) for f in fixtures if f["gw"] == w] for w in gws
+        opposing_play_group = "all" if options.get("opposing_play_group") == "all" else "position"
+        opposing_pairs = get_opposing_pairs(fixtures, gws, player_groups, opposing_play_group)
+        playing_pairs = {
+            w: [(p1, p2) for (p1, p2) in opposing_pairs[w] if minutes_player_week[p1, w] > 0 and minutes_player_week[p2, w] > 0] for w in gws
         }
-        if options.get("opposing_play_group") == "all":
-            cp_list = [
-                (p1, p2, w)
-                for p1 in players
-                for p2 in players
-                for w in gws
-                if (player_team[p1], player_team[p2]) in gw_opp_teams[w] and minutes_player_week[p1, w] > 0 and minutes_player_week[p2, w] > 0
-            ]
-        elif options.get("opposing_play_group", "position") == "position":
-            opposing_positions = [(1, 3), (1, 4), (2, 3), (2, 4), (3, 1), (4, 1), (3, 2), (4, 2)]
-            cp_list = [
-                (p1, p2, w)
-                for p1 in players
-                for p2 in players
-                for w in gws
-                if (player_team[p1], player_team[p2]) in gw_opp_teams[w]
-                and minutes_player_week[p1, w] > 0
-                and minutes_player_week[p2, w] > 0
-                and (player_type[p1], player_type[p2]) in opposing_positions
-            ]
+        cp_list = [(p1, p2, w) for w in gws for (p1, p2) in playing_pairs[w]]
         cp_pen_var = model.add_variables(cp_list, name="cp_v", vartype=so.binary)
         opposing_play_penalty = options.get("opposing_play_penalty", 0.5)
-        cp_penalty = {w: opposing_play_penalty * so.expr_sum(cp_pen_var[p1, p2, w1] for (p1, p2, w1) in cp_list if w1 == w) for w in gws}
+        cp_penalty = {w: opposing_play_penalty * so.expr_sum(cp_pen_var[p1, p2, w] for (p1, p2) in playing_pairs[w]) for w in gws}
         model.add_constraints((lineup[p1, w] + lineup[p2, w] <= 1 + cp_pen_var[p1, p2, w] for (p1, p2, w) in cp_list), name="cp1")
         model.add_constraints((cp_pen_var[p1, p2, w] <= lineup[p1, w] for (p1, p2, w) in cp_list), name="cp2")
         model.add_constraints((cp_pen_var[p1, p2, w] <= lineup[p2, w] for (p1, p2, w) in cp_list), name="cp3")
 
     if options.get("double_defense_pick") is True:
         print("OC - Double Defense Pick")
-        team_players = {t: [p for p in players if player_team[p] == t] for t in teams}
-        gk_df_players = {t: [p for p in team_players[t] if player_type[p] in [1, 2]] for t in teams}
-        weekly_sum = {(t, w): so.expr_sum(lineup[p, w] for p in gk_df_players[t]) for t in teams for w in gws}
+        weekly_sum = {(t, w): so.expr_sum(lineup[p, w] for p in team_def_players[t]) for t in teams for w in gws}
         def_aux = model.add_variables(teams, gws, vartype=so.binary, name="daux")
         model.add_constraints((weekly_sum[t, w] <= 3 * def_aux[t, w] for t in teams for w in gws), name="dauxc1")
         model.add_constraints((weekly_sum[t, w] >= 2 - 3 * (1 - def_aux[t, w]) for t in teams for w in gws), name="dauxc2")
@@ -799,24 +1622,24 @@ def solve_multi_period_fpl(data, options):
             value_dict = {i: price_points.count(i) for i in set(price_points)}
             con_iter = 0
             for key, count in value_dict.items():
-                target_players = [
-                    p for p in players if merged_data.loc[p, "Pos"] == pos and buy_price[p] >= key - buffer and buy_price[p] <= key + buffer
-                ]
+                target_players = [p for p in player_groups["pos"].get(pos, []) if buy_price[p] >= key - buffer and buy_price[p] <= key + buffer]
                 model.add_constraints((so.expr_sum(squad[p, w] for p in target_players) >= count for w in gws), name=f"price_point_{pos}_{con_iter}")
                 con_iter += 1
 
     if options.get("no_gk_rotation_after", None):
         print("OC - No GK rotation")
         target_gw = int(options["no_gk_rotation_after"])
-        players_gk = [p for p in players if player_type[p] == 1]
+        players_gk = type_players[1]
         model.add_constraints(
             (lineup[p, w] >= lineup[p, target_gw] - use_fh[w] for p in players_gk for w in gws if w > target_gw), name="fixed_lineup_gk"
         )
 
     if len(options.get("no_chip_gws", [])) > 0:
         print("OC - No Chip GWs")
-        no_chip_gws = options["no_chip_gws"]
-        model.add_constraint(so.expr_sum(use_bb[w] + use_wc[w] + use_fh[w] for w in no_chip_gws) == 0, name="no_chip_gws")
+        # chips are not created in these gameweeks, unless another option plays them there
+        no_chip_gws = [w for w in options["no_chip_gws"] if w in wc_gws or w in bb_gws or w in fh_gws]
+        if len(no_chip_gws) > 0:
+            model.add_constraint(so.expr_sum(use_bb[w] + use_wc[w] + use_fh[w] for w in no_chip_gws) == 0, name="no_chip_gws")
 
     if options.get("only_booked_transfers") is True:
         print("OC - Only Booked Transfers")
@@ -831,8 +1654,17 @@ def solve_multi_period_fpl(data, options):
 
         in_players = {(p): 1 if p in forced_in else 0 for p in players}
         out_players = {(p): 1 if p in forced_out else 0 for p in players}
-        model.add_constraints((transfer_in[p, next_gw] == in_players[p] for p in players), name="fix_tgw_tr_in")
-        model.add_constraints((transfer_out[p, next_gw] == out_players[p] for p in players), name="fix_tgw_tr_out")
+        if model_presolve:
+            set_rule_bounds([transfer_in[p, next_gw] for p in players if p in forced_in], lb=1)
+            set_rule_bounds([transfer_in[p, next_gw] for p in players if p not in forced_in], ub=0)
+            set_rule_bounds([transfer_out_regular[p, next_gw] for p in players if p not in forced_out], ub=0)
+            set_rule_bounds([transfer_out_first[p, next_gw] for p in price_modified_players if p not in forced_out], ub=0)
+            forced_sales = [p for p in forced_out if (p, next_gw) in first_sale_keys]
+            set_rule_bounds([transfer_out_regular[p, next_gw] for p in forced_out if p not in forced_sales], lb=1)
+            model.add_constraints((transfer_out[p, next_gw] == 1 for p in forced_sales), name="fix_tgw_tr_out")
+        else:
+            model.add_constraints((transfer_in[p, next_gw] == in_players[p] for p in players), name="fix_tgw_tr_in")
+            model.add_constraints((transfer_out[p, next_gw] == out_players[p] for p in players), name="fix_tgw_tr_out")
 
     # if options.get('have_2ft_in_gws', None) is not None:
     #     for gw in options['have_2ft_in_gws']:
@@ -852,10 +1684,15 @@ def solve_multi_period_fpl(data, options):
         print("OC - No TRS except WC")
         model.add_constraints((num_transfers[w] <= SQUAD_SIZE * use_wc[w] for w in gws), name="wc_trs_only")
 
+    no_points = []
+    if model_presolve:
+        # TC on a player without points adds nothing, unless TC has to be played that week
+        forced_tc_gws = set(options.get("use_tc", [])) | set(forced_chip_gws.get("tc", []))
+        no_points = [(p, w) for p in players for w in tc_gws if points_player_week[p, w] <= 0 and w not in forced_tc_gws]
+        set_rule_bounds([use_tc[p, w] for p, w in no_points], ub=0)
+
     # FT gain
-    ft_state_value = {}
-    for s in ft_states:
-        ft_state_value[s] = ft_state_value.get(s - 1, 0) + ft_value_list.get(str(s), ft_value)
+    ft_state_value = dict(zip(ft_states, get_ft_state_values(ft_states, options), strict=True))
     # print(f"Using FT state values of {ft_state_value}")
     print(f"Using FT values of {ft_value_list}")
     gw_ft_value = {w: so.expr_sum(ft_state_value[s] * fts_state[w, s] for s in ft_states) for w in gws}
@@ -864,19 +1701,13 @@ def solve_multi_period_fpl(data, options):
     # Objectives
     hit_cost = options.get("hit_cost", 4)
     vcap_weight = options.get("vcap_weight", 0.1)
+    objective_coefficients = get_objective_coefficients(points_matrix, vcap_weight, bench_weights)
     gw_xp = {
-        w: so.expr_sum(
-            points_player_week[p, w]
-            * (
-                lineup[p, w]
-                + captain[p, w]
-                + vcap_weight * vicecap[p, w]
-                + use_tc[p, w]
-                + so.expr_sum(bench_weights[o] * bench[p, w, o] for o in order)
-            )
-            for p in players
+        w: linear_expression(
+            [v for p in players for v in (lineup[p, w], captain[p, w], vicecap[p, w], use_tc[p, w], *(bench[p, w, o] for o in order))],
+            objective_coefficients[:, j].ravel(),
         )
-        for w in gws
+        for j, w in enumerate(gws)
     }
 
     gw_total = {
@@ -891,256 +1722,143 @@ def solve_multi_period_fpl(data, options):
         decay_objective = so.expr_sum(gw_total[w] * pow(decay_base, w - next_gw) for w in gws)
         model.set_objective(-decay_objective, sense="N", name="total_decay_xp")
 
+    num_chip_vars = len(players) * (len(fh_gws) + len(tc_gws)) + len(wc_gws) + len(bb_gws) + len(fh_gws) + len(first_sale_keys)
+    skipped_vars = (2 * len(players) + 3) * len(gws) + len(price_modified_players) * len(gws) - num_chip_vars
+    print(
+        f"Skipped {skipped_vars:,} chip and first sale variables and {skipped_rows:,} constraints that cannot be active, "
+        f"model has {len(model.get_variables()):,} variables and {len(model.get_constraints()):,} constraints"
+    )
+
+    if model_presolve:
+        # variables the bounds fix, and rows left with only such variables, are not passed to the solver
+        fixed = get_fixed_variables(model)
+        fixed_rows = get_fixed_rows(model.get_constraints(), fixed)
+        print(
+            f"OC - Presolve: {len(unaffordable)} players out of budget left out of the pool, {presolve_bounds:,} variables bounded "
+            f"by rules instead of rows, TC fixed off for {len(no_points)} player-weeks without points, {len(fixed):,} fixed "
+            f"columns and {len(fixed_rows):,} rows with only fixed columns removed from the model passed to the solver"
+        )
+
     report_decay_base = options.get("report_decay_base", [])
     decay_metrics = {i: so.expr_sum(gw_total[w] * pow(i, w - next_gw) for w in gws) for i in report_decay_base}
 
+    solution_data = {
+        "merged_data": merged_data,
+        "type_data": type_data,
+        "players": players,
+        "gws": gws,
+        "all_gw": all_gw,
+        "next_gw": next_gw,
+        "points": points_matrix,
+        "minutes": minutes_matrix,
+        "buy_price": np.array([buy_price[p] for p in players], dtype=float),
+        "sell_price": np.array([sell_price.get(p, buy_price[p]) for p in players], dtype=float),
+        "price_modified": np.isin(players, price_modified_players),
+    }
+    # tr_out_first rows in the order of players
+    price_modified_order = [p for p in players if p in set(price_modified_players)]
+
     num_iterations = options.get("num_iterations", 1)
     iteration_criteria = options.get("iteration_criteria", "this_gw_transfer_in")
     solutions = []
 
+    solver_instance = None
+    saved_solutions = []
+    cutoff = None
+
     for iteration in range(num_iterations):
         mps_file_name = f"tmp/{problem_name}_{problem_id}_{iteration}.mps"
         sol_file_name = f"tmp/{problem_name}_{problem_id}_{iteration}_sol.txt"
         opt_file_name = f"tmp/{problem_name}_{problem_id}_{iteration}.opt"
+        iteration_start = time.time()
 
-        tmp_folder = Path() / "tmp"
-        tmp_folder.mkdir(exist_ok=True, parents=True)
-        model.export_mps(mps_file_name)
-        print(f"Exported problem with name: {problem_name}_{problem_id}_{iteration}")
+        # use_cmd = options.get("use_cmd", False)
+        solver = options.get("solver", "highs")
+
+        # HiGHS receives the model in memory, the MPS file is only needed for gurobi or when requested for debugging
+        if solver.lower() != "highs" or options.get("export_mps", False):
+            tmp_folder = Path() / "tmp"
+            tmp_folder.mkdir(exist_ok=True, parents=True)
+            write_sasoptpy_mps(model, mps_file_name, model_presolve)
+            print(f"Exported problem with name: {problem_name}_{problem_id}_{iteration}")
 
         if options.get("export_debug", False):
             with open("debug.sas", "w") as file:
                 file.write(model.to_optmodel())
 
-        # use_cmd = options.get("use_cmd", False)
-        solver = options.get("solver", "highs")
-
         if solver.lower() == "highs":
             # Use highspy Python interface instead of command line
-            secs = options.get("secs", 20 * 60)
-            presolve = options.get("presolve", "on")
-            gap = options.get("gap", 0)
-            random_seed = options.get("random_seed", 0)
-            verbose = options.get("verbose", False)
-
-            solver_instance = highspy.Highs()
-            solver_instance.readModel(str(mps_file_name))
-            solver_instance.setOptionValue("parallel", "on")
-            solver_instance.setOptionValue("random_seed", random_seed)
-            solver_instance.setOptionValue("presolve", presolve)
-            solver_instance.setOptionValue("time_limit", secs)
-            solver_instance.setOptionValue("mip_rel_gap", gap)
-            solver_instance.setOptionValue("log_to_console", verbose)
+            if solver_instance is None:
+                solver_instance = sasoptpy_to_highs(model, model_presolve)
+                print(f"Built problem with name: {problem_name}_{problem_id}_{iteration}")
+                set_highs_options(solver_instance, options)
+            else:
+                # keep the instance and only add the new cut, started from the best earlier incumbent it allows
+                if cutoff is not None:
+                    add_sasoptpy_rows(solver_instance, model, [cutoff], model_presolve)
+                warm_start = get_best_feasible_solution(solver_instance, saved_solutions)
+                if warm_start is not None:
+                    start_solution = highspy.HighsSolution()
+                    start_solution.col_value = warm_start
+                    start_solution.value_valid = True
+                    solver_instance.setSolution(start_solution)
+                print(f"Updated problem with name: {problem_name}_{problem_id}_{iteration}")
 
             solver_instance.run()
-            solution = solver_instance.getSolution()
-            values = list(solution.col_value)
-            for idx, v in enumerate(model.get_variables()):
-                v.set_value(values[idx])
+            saved_solutions += [np.array(v.col_value) for v in solver_instance.getSavedMipSolutions()]
+            set_sasoptpy_values(model, solver_instance.getSolution().col_value, model_presolve)
 
         elif solver == "gurobi":
-            use_cmd = options.get("use_cmd", False)
-            gap = options.get("gap", 0)
             sol_file_name = sol_file_name.replace("_sol", "").replace("txt", "sol")
-            command = f"gurobi_cl MIPGap={gap} ResultFile={sol_file_name} {mps_file_name}"
-
-            if use_cmd:
-                os.system(command)
-            else:
-
-                def print_output(process):
-                    while True:
-                        output = process.stdout.readline()
-                        if "Solving report" in output:
-                            time.sleep(2)
-                            process.kill()
-                        elif output == "" and process.poll() is not None:
-                            break
-                        elif output:
-                            print(output.strip())
-
-                process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-                output_thread = threading.Thread(target=print_output, args=(process,))
-                output_thread.start()
-                output_thread.join()
-
-            # Parsing
-            with open(sol_file_name) as f:
-                for v in model.get_variables():
-                    v.set_value(0)
-                for line in f:
-                    if line[0] == "#":
-                        continue
-                    if line == "":
-                        break
-                    words = line.split()
-                    v = model.get_variable(words[0])
-                    try:
-                        if v.get_type() == so.INT:
-                            v.set_value(round(float(words[1])))
-                        elif v.get_type() == so.BIN:
-                            v.set_value(round(float(words[1])))
-                        elif v.get_type() == so.CONT:
-                            v.set_value(round(float(words[1]), 3))
-                    except Exception:
-                        print("Error", words[0], line)
-
-        # DataFrame generation
-        picks = []
-        for w in gws:
-            for p in players:
-                if squad[p, w].get_value() + squad_fh[p, w].get_value() + transfer_out[p, w].get_value() > BINARY_THRESHOLD:
-                    lp = merged_data.loc[p]
-                    is_captain = 1 if captain[p, w].get_value() > BINARY_THRESHOLD else 0
-                    is_squad = (
-                        1
-                        if (use_fh[w].get_value() < BINARY_THRESHOLD and squad[p, w].get_value() > BINARY_THRESHOLD)
-                        or (use_fh[w].get_value() > BINARY_THRESHOLD and squad_fh[p, w].get_value() > BINARY_THRESHOLD)
-                        else 0
-                    )
-                    is_lineup = 1 if lineup[p, w].get_value() > BINARY_THRESHOLD else 0
-                    is_vice = 1 if vicecap[p, w].get_value() > BINARY_THRESHOLD else 0
-                    is_tc = 1 if use_tc[p, w].get_value() > BINARY_THRESHOLD else 0
-                    is_transfer_in = 1 if transfer_in[p, w].get_value() > BINARY_THRESHOLD else 0
-                    is_transfer_out = 1 if transfer_out[p, w].get_value() > BINARY_THRESHOLD else 0
-                    bench_value = -1
-                    for o in order:
-                        if bench[p, w, o].get_value() > BINARY_THRESHOLD:
-                            bench_value = o
-                    position = type_data.loc[lp["element_type"], "singular_name_short"]
-                    player_buy_price = 0 if not is_transfer_in else buy_price[p]
-                    player_sell_price = (
-                        0
-                        if not is_transfer_out
-                        else (
-                            sell_price[p] if p in price_modified_players and transfer_out_first[p, w].get_value() > BINARY_THRESHOLD else buy_price[p]
-                        )
-                    )
-                    multiplier = 1 * (is_lineup == 1) + 1 * (is_captain == 1) + 1 * (is_tc == 1)
-                    xp_cont = points_player_week[p, w] * multiplier
-
-                    # chip
-                    if use_wc[w].get_value() > BINARY_THRESHOLD:
-                        chip_text = "WC"
-                    elif use_fh[w].get_value() > BINARY_THRESHOLD:
-                        chip_text = "FH"
-                    elif use_bb[w].get_value() > BINARY_THRESHOLD:
-                        chip_text = "BB"
-                    elif use_tc[p, w].get_value() > BINARY_THRESHOLD:
-                        chip_text = "TC"
-                    else:
-                        chip_text = ""
-
-                    picks.append(
-                        {
-                            "id": p,
-                            "week": w,
-                            "name": lp["web_name"],
-                            "pos": position,
-                            "type": lp["element_type"],
-                            "team": lp["name"],
-                            "buy_price": player_buy_price,
-                            "sell_price": player_sell_price,
-                            "xP": round(points_player_week[p, w], 2),
-                            "xMin": minutes_player_week[p, w],
-                            "squad": is_squad,
-                            "lineup": is_lineup,
-                            "bench": bench_value,
-                            "captain": is_captain,
-                            "vicecaptain": is_vice,
-                            "transfer_in": is_transfer_in,
-                            "transfer_out": is_transfer_out,
-                            "multiplier": multiplier,
-                            "xp_cont": xp_cont,
-                            "chip": chip_text,
-                            "iter": iteration,
-                            "ft": fts[w].get_value(),
-                            "transfer_count": num_transfers[w].get_value(),
-                        }
-                    )
-
-        picks_df = pd.DataFrame(picks).sort_values(by=["week", "lineup", "type", "xP"], ascending=[True, False, True, True])
-        total_xp = so.expr_sum((lineup[p, w] + captain[p, w]) * points_player_week[p, w] for p in players for w in gws).get_value()
-
-        picks_df.sort_values(by=["week", "squad", "lineup", "bench", "type"], ascending=[True, False, False, True, True], inplace=True)
-
-        # Writing summary
-        summary_of_actions = ""
-        move_summary = {"chip": [], "buy": [], "sell": []}
-
-        # collect statistics
-        statistics = {}
-
-        for w in all_gw:
-            if w == all_gw[0]:
-                statistics[int(w)] = {"itb": in_the_bank[w].get_value(), "ft": fts[w].get_value()}
-                continue
-            summary_of_actions += f"** GW {w}:\n"
-            chip_decision = (
-                ("WC" if use_wc[w].get_value() > BINARY_THRESHOLD else "")
-                + ("FH" if use_fh[w].get_value() > BINARY_THRESHOLD else "")
-                + ("BB" if use_bb[w].get_value() > BINARY_THRESHOLD else "")
-                + ("TC" if use_tc_gw[w].get_value() > BINARY_THRESHOLD else "")
-            )
-            if chip_decision != "":
-                summary_of_actions += "CHIP " + chip_decision + "\n"
-                move_summary["chip"].append(chip_decision + str(w))
-            summary_of_actions += (
-                f"ITB={round(in_the_bank[w - 1].get_value(), 1)}->{round(in_the_bank[w].get_value(), 1)}, "
-                f"FT={round(fts[w].get_value())}, "
-                f"PT={round(penalized_transfers[w].get_value())}, "
-                f"NT={round(num_transfers[w].get_value())}\n"
-            )
-            for p in players:
-                if transfer_in[p, w].get_value() > BINARY_THRESHOLD:
-                    summary_of_actions += f"Buy {p} - {merged_data['web_name'][p]}\n"
-                    if w == next_gw:
-                        move_summary["buy"].append(merged_data["web_name"][p])
-
-            for p in players:
-                if transfer_out[p, w].get_value() > BINARY_THRESHOLD:
-                    summary_of_actions += f"Sell {p} - {merged_data['web_name'][p]}\n"
-                    if w == next_gw:
-                        move_summary["sell"].append(merged_data["web_name"][p])
-
-            picks_df[picks_df["week"] == w]
-            lineup_players = picks_df[(picks_df["week"] == w) & (picks_df["lineup"] == 1)]
-            bench_players = picks_df[(picks_df["week"] == w) & (picks_df["bench"] >= 0)]
-
-            # captain_name = picks_df[(picks_df['week'] == w) & (picks_df['captain'] == 1)].iloc[0]['name']
-            # vicecap_name = picks_df[(picks_df['week'] == w) & (picks_df['vicecaptain'] == 1)].iloc[0]['name']
-
-            summary_of_actions += "\nLineup: \n"
-
-            def get_display(row):
-                return f"{row['name']} ({row['xP']}{', C' if row['captain'] == 1 else ''}{', V' if row['vicecaptain'] == 1 else ''})"
-
-            for typ in [1, 2, 3, 4]:
-                type_players = lineup_players[lineup_players["type"] == typ]
-                entries = type_players.apply(get_display, axis=1)
-                summary_of_actions += "\t" + ", ".join(entries.tolist()) + "\n"
-            summary_of_actions += "Bench: \n\t" + ", ".join(bench_players.apply(get_display, axis=1)) + "\n"
-            summary_of_actions += "Lineup xPts: " + str(round(lineup_players["xp_cont"].sum(), 2)) + "\n"
-            if w != max(gws):
-                summary_of_actions += "\n\n"
-
-            statistics[int(w)] = {
-                "itb": in_the_bank[w].get_value(),
-                "ft": fts[w].get_value(),
-                "pt": penalized_transfers[w].get_value(),
-                "nt": num_transfers[w].get_value(),
-                "xP": lineup_players["xp_cont"].sum(),
-                "obj": round(gw_total[w].get_value(), 2),
-                "chip": chip_decision if chip_decision != "" else None,
-            }
+            run_gurobi(mps_file_name, sol_file_name, options)
+
+            # Parsing, variables left out of the MPS file by model_presolve keep their fixed value
+            fixed = get_fixed_variables(model) if model_presolve else {}
+            for v in model.get_variables():
+                v.set_value(fixed.get(id(v), 0))
+            for name, value in read_gurobi_solution(sol_file_name).items():
+                v = model.get_variable(name)
+                try:
+                    if v.get_type() == so.INT:
+                        v.set_value(round(value))
+                    elif v.get_type() == so.BIN:
+                        v.set_value(round(value))
+                    elif v.get_type() == so.CONT:
+                        v.set_value(round(value, 3))
+                except Exception:
+                    print("Error", name, value)
+
+        # read the solution once into arrays
+        values = {
+            "squad": get_variable_values(squad, players, all_gw),
+            "squad_fh": get_variable_values(squad_fh, players, gws),
+            "lineup": get_variable_values(lineup, players, gws),
+            "captain": get_variable_values(captain, players, gws),
+            "vicecap": get_variable_values(vicecap, players, gws),
+            "bench": get_variable_values(bench, players, gws, order),
+            "use_tc": get_variable_values(use_tc, players, gws),
+            "transfer_in": get_variable_values(transfer_in, players, gws),
+            "transfer_out_first": np.zeros((len(players), len(gws))),
+            "itb": get_variable_values(in_the_bank, all_gw),
+            "ft": get_variable_values(fts, all_gw),
+            "pt": get_variable_values(penalized_transfers, gws),
+            "use_wc": get_variable_values(use_wc, gws),
+            "use_bb": get_variable_values(use_bb, gws),
+            "use_fh": get_variable_values(use_fh, gws),
+            "gw_total": np.array([gw_total[w].get_value() for w in gws]),
+        }
+        values["transfer_out_first"][solution_data["price_modified"]] = get_variable_values(transfer_out_first, price_modified_order, gws)
+        values["transfer_out"] = get_variable_values(transfer_out_regular, players, gws) + values["transfer_out_first"]
+        solution = summarize_solution(solution_data, values, iteration, options)
 
         if options.get("delete_tmp", True):
             time.sleep(0.1)
             try:
-                try:
-                    os.unlink(mps_file_name)
-                except Exception:
-                    pass
+                if not options.get("export_mps", False):
+                    try:
+                        os.unlink(mps_file_name)
+                    except Exception:
+                        pass
                 try:
                     os.unlink(sol_file_name)
                 except Exception:
@@ -1152,28 +1870,14 @@ def solve_multi_period_fpl(data, options):
             except Exception:
                 print("Could not delete temporary files")
 
-        def format_decisions(items):
-            return ", ".join(items) if items else "-"
-
-        buy_decisions = format_decisions(move_summary["buy"])
-        sell_decisions = format_decisions(move_summary["sell"])
-        chip_decisions = format_decisions(move_summary["chip"])
-
-        if options.get("hide_transfers"):
-            buy_decisions = sell_decisions = "-"
+        print(f"Iteration {iteration} took {time.time() - iteration_start:.2f} seconds")
 
         # Add current solution to a list, and add a new cut
         solutions.append(
             {
                 "iter": iteration,
                 "model": model,
-                "picks": picks_df,
-                "total_xp": total_xp,
-                "summary": summary_of_actions,
-                "statistics": statistics,
-                "buy": buy_decisions,
-                "sell": sell_decisions,
-                "chip": chip_decisions,
+                **solution,
                 "score": -model.get_objective_value(),
                 "decay_metrics": {key: value.get_value() for key, value in decay_metrics.items()},
             }
@@ -1183,18 +1887,19 @@ def solve_multi_period_fpl(data, options):
             return solutions
 
         iter_diff = options.get("iteration_difference", 1)
+        cutoff = None
 
         if iteration_criteria == "this_gw_transfer_in":
             actions = so.expr_sum(
                 1 - transfer_in[p, next_gw] for p in players if transfer_in[p, next_gw].get_value() > BINARY_THRESHOLD
             ) + so.expr_sum(transfer_in[p, next_gw] for p in players if transfer_in[p, next_gw].get_value() < BINARY_THRESHOLD)
-            model.add_constraint(actions >= 1, name=f"cutoff_{iteration}")
+            cutoff = model.add_constraint(actions >= 1, name=f"cutoff_{iteration}")
 
         elif iteration_criteria == "this_gw_transfer_out":
             actions = so.expr_sum(
                 1 - transfer_out[p, next_gw] for p in players if transfer_out[p, next_gw].get_value() > BINARY_THRESHOLD
             ) + so.expr_sum(transfer_out[p, next_gw] for p in players if transfer_out[p, next_gw].get_value() < BINARY_THRESHOLD)
-            model.add_constraint(actions >= 1, name=f"cutoff_{iteration}")
+            cutoff = model.add_constraint(actions >= 1, name=f"cutoff_{iteration}")
 
         elif iteration_criteria == "this_gw_transfer_in_out":
             actions = (
@@ -1203,18 +1908,18 @@ def solve_multi_period_fpl(data, options):
                 + so.expr_sum(1 - transfer_out[p, next_gw] for p in players if transfer_out[p, next_gw].get_value() > BINARY_THRESHOLD)
                 + so.expr_sum(transfer_out[p, next_gw] for p in players if transfer_out[p, next_gw].get_value() < BINARY_THRESHOLD)
             )
-            model.add_constraint(actions >= 1, name=f"cutoff_{iteration}")
+            cutoff = model.add_constraint(actions >= 1, name=f"cutoff_{iteration}")
 
         elif iteration_criteria == "chip_gws":
             actions = (
-                so.expr_sum(1 - use_wc[w] for w in gws if use_wc[w].get_value() > BINARY_THRESHOLD)
-                + so.expr_sum(use_wc[w] for w in gws if use_wc[w].get_value() < BINARY_THRESHOLD)
-                + so.expr_sum(1 - use_bb[w] for w in gws if use_bb[w].get_value() > BINARY_THRESHOLD)
-                + so.expr_sum(use_bb[w] for w in gws if use_bb[w].get_value() < BINARY_THRESHOLD)
-                + so.expr_sum(1 - use_fh[w] for w in gws if use_fh[w].get_value() > BINARY_THRESHOLD)
-                + so.expr_sum(use_fh[w] for w in gws if use_fh[w].get_value() < BINARY_THRESHOLD)
+                so.expr_sum(1 - use_wc[w] for w in wc_gws if use_wc[w].get_value() > BINARY_THRESHOLD)
+                + so.expr_sum(use_wc[w] for w in wc_gws if use_wc[w].get_value() < BINARY_THRESHOLD)
+                + so.expr_sum(1 - use_bb[w] for w in bb_gws if use_bb[w].get_value() > BINARY_THRESHOLD)
+                + so.expr_sum(use_bb[w] for w in bb_gws if use_bb[w].get_value() < BINARY_THRESHOLD)
+                + so.expr_sum(1 - use_fh[w] for w in fh_gws if use_fh[w].get_value() > BINARY_THRESHOLD)
+                + so.expr_sum(use_fh[w] for w in fh_gws if use_fh[w].get_value() < BINARY_THRESHOLD)
             )
-            model.add_constraint(actions >= 1, name=f"cutoff_{iteration}")
+            cutoff = model.add_constraint(actions >= 1, name=f"cutoff_{iteration}")
 
         elif iteration_criteria == "target_gws_transfer_in":
             target_gws = options.get("iteration_target", [next_gw])
@@ -1224,11 +1929,11 @@ def solve_multi_period_fpl(data, options):
             actions = so.expr_sum(1 - transfer_in[p, w] for [p, w] in transferred_players) + so.expr_sum(
                 transfer_in[p, w] for [p, w] in remaining_players
             )
-            model.add_constraint(actions >= 1, name=f"cutoff_{iteration}")
+            cutoff = model.add_constraint(actions >= 1, name=f"cutoff_{iteration}")
 
         elif iteration_criteria == "this_gw_lineup":
             selected_lineup = [p for p in players if lineup[p, next_gw].get_value() > BINARY_THRESHOLD]
-            model.add_constraint(
+            cutoff = model.add_constraint(
                 so.expr_sum(lineup[p, next_gw] for p in selected_lineup) <= len(selected_lineup) - iter_diff, name=f"cutoff_{iteration}"
             )
 
@@ -0,0 +1,41 @@
+import time
+
+import pandas as pd
+from solve import get_options, get_team_data
+
+from dev.solver import prep_data, solve_multi_period_fpl
+
+
+def run_heuristic_benchmark(variants):
+    """
+    Solves each variant of the settings with the heuristic solver and with HiGHS, and prints the gap of the heuristic
+
+    Each variant is a dict of runtime options on top of the settings files, e.g. a horizon or a chip combination.
+    """
+    rows = []
+    for variant in variants:
+        options = get_options({"verbose": False, "num_iterations": 1, **variant})
+        data = prep_data(get_team_data(options), options)
+        row = {"variant": str(variant)}
+        for solver in ["heuristic", "highs"]:
+            start = time.time()
+            response = solve_multi_period_fpl(data, {**options, "solver": solver})
+            row[f"{solver}_score"] = response[0]["score"]
+            row[f"{solver}_secs"] = time.time() - start
+        row["gap_%"] = 100 * (row["highs_score"] - row["heuristic_score"]) / abs(row["highs_score"])
+        rows.append(row)
+
+    df = pd.DataFrame(rows)
+    print(df.round(3))
+    print(f"Average gap of the heuristic: {df['gap_%'].mean():.2f}%")
+    return df
+
+
+if __name__ == "__main__":
+    # edit the variants you want to compare in here, each one is solved with your settings and these options on top
+    variants = [
+        {"horizon": 3},
+        {"horizon": 5},
+        {"horizon": 8},
+    ]
+    run_heuristic_benchmark(variants)
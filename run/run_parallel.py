@@ -2,14 +2,16 @@ import os
 from concurrent.futures import ProcessPoolExecutor
 
 import pandas as pd
-from solve import solve_regular
+from solve import solve_chip_sweep, solve_regular
 
-from utils import get_dict_combinations
+from utils import count_chip_combinations, get_chip_combinations, load_settings
 
 
-def run_parallel_solves(chip_combinations, max_workers=None):
+def run_parallel_solves(chip_combinations, max_workers=None, reuse_model=None):
     if not max_workers:
         max_workers = os.cpu_count() - 2
+    if reuse_model is None:
+        reuse_model = load_settings().get("chip_sweep_reuse_model", False)
 
     # these are added just to reduce the output, you can remove them or put any settings you want here
     options = {
@@ -18,15 +20,23 @@ def run_parallel_solves(chip_combinations, max_workers=None):
         "print_decay_metrics": False,
         "print_transfer_chip_summary": False,
         "print_squads": False,
+        "save_plan": False,
     }
 
-    args = []
-    for combination in chip_combinations:
-        args.append({**options, **combination})
+    if reuse_model:
+        chip_combinations = list(chip_combinations)
+        # each process builds the model once and sweeps its share of the combinations
+        chunks = [chip_combinations[i::max_workers] for i in range(min(max_workers, len(chip_combinations)))]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = [table for tables in executor.map(solve_chip_sweep, [options] * len(chunks), chunks) for table in tables]
+    else:
+        args = []
+        for combination in chip_combinations:
+            args.append({**options, **combination})
 
-    # Use ProcessPoolExecutor to run commands in parallel
-    with ProcessPoolExecutor(max_workers=max_workers) as executor:
-        results = list(executor.map(solve_regular, args))
+        # Use ProcessPoolExecutor to run commands in parallel
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(solve_regular, args))
 
     df = pd.concat(results).sort_values(by="score", ascending=False).reset_index(drop=True)
     df = df.drop("iter", axis=1)
@@ -41,6 +51,7 @@ if __name__ == "__main__":
     # in this example it means it will run solves for 11 chips combinations:
     # no chips, bb1, bb2, fh2, fh3, fh4, bb1fh2, bb1fh3, bb1fh4, bb2fh3, bb2fh4
     # note that this is the 3 bb options multiplied by the 4 fh options, minus the invalid combination bb2fh2
+    # combinations breaking no_chip_gws or allowed_chip_gws in your settings are skipped as well
     chip_gameweeks = {
         "use_bb": [None, 1, 2],
         "use_wc": [],
@@ -48,5 +59,7 @@ if __name__ == "__main__":
         "use_tc": [],
     }
 
-    combinations = get_dict_combinations(chip_gameweeks)
+    settings = load_settings()
+    print(f"Running {count_chip_combinations(chip_gameweeks, settings)} chip combinations")
+    combinations = get_chip_combinations(chip_gameweeks, settings)
     run_parallel_solves(combinations)
@@ -5,9 +5,10 @@ import time
 from concurrent.futures import ProcessPoolExecutor
 
 from binary_file_generator import generate_binary_files
-from solve import solve_regular
+from solve import solve_regular, solve_simulations
 
 from paths import DATA_DIR
+from utils import load_settings
 
 
 def get_user_input():
@@ -60,23 +61,40 @@ def run_simulations_with_binaries(runs, processes, options):
         start = time.time()
 
         runtime_options = options.get("runtime_options", {})
-        all_jobs = [
-            {"run_no": str(i + 1), "randomized": True, "binary_file_name": binary.rstrip(".csv"), **runtime_options} for i in range(weighted_runs)
-        ]
-        with ProcessPoolExecutor(max_workers=processes) as executor:
-            list(executor.map(solve_regular, all_jobs))
+        if reuse_model(runtime_options):
+            run_reused_model_jobs(weighted_runs, processes, {"binary_file_name": binary.rstrip(".csv"), **runtime_options})
+        else:
+            all_jobs = [
+                {"run_no": str(i + 1), "randomized": True, "binary_file_name": binary.rstrip(".csv"), **runtime_options} for i in range(weighted_runs)
+            ]
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                list(executor.map(solve_regular, all_jobs))
         print(f"\nTotal time taken is {(time.time() - start) / 60:.2f} minutes")
 
 
 def run_simulations_standard(runs, processes, options):
     start = time.time()
     runtime_options = options.get("runtime_options", {})
-    all_jobs = [{"run_no": str(i + 1), "randomized": True, **runtime_options} for i in range(runs)]
-    with ProcessPoolExecutor(max_workers=processes) as executor:
-        list(executor.map(solve_regular, all_jobs))
+    if reuse_model(runtime_options):
+        run_reused_model_jobs(runs, processes, runtime_options)
+    else:
+        all_jobs = [{"run_no": str(i + 1), "randomized": True, **runtime_options} for i in range(runs)]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            list(executor.map(solve_regular, all_jobs))
     print(f"\nTotal time taken is {(time.time() - start) / 60:.2f} minutes")
 
 
+def reuse_model(runtime_options):
+    return runtime_options.get("simulation_reuse_model", load_settings().get("simulation_reuse_model", False))
+
+
+def run_reused_model_jobs(runs, processes, runtime_options):
+    """Splits the runs between the processes, each of them building the model once and solving its share of the scenarios"""
+    counts = [len(range(i, runs, processes)) for i in range(min(processes, runs))]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        list(executor.map(solve_simulations, [runtime_options] * len(counts), counts))
+
+
 def run_sensitivity(options=None):
     if options is None or "count" not in options:
         runs, processes, use_binaries = get_user_input()
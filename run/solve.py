@@ -7,11 +7,13 @@ import subprocess
 import sys
 import textwrap
 import time
+from pathlib import Path
 
 import pandas as pd
 import requests
 from tabulate import tabulate
 
+from dev.matrix_solver import solve_chip_combinations, solve_randomized_scenarios
 from dev.solver import generate_team_json, prep_data, solve_multi_period_fpl
 from dev.visualization import create_squad_timeline
 from paths import DATA_DIR
@@ -48,6 +50,68 @@ def solve_regular(runtime_options=None):
     #     print("Checking for updates...")
     #     is_latest_version()
 
+    options = get_options(runtime_options)
+    my_data = get_team_data(options)
+    data = prep_data(my_data, options)
+    if options.get("warm_start_plan"):
+        data["previous_plan"] = get_previous_plan(options, data["next_gw"])
+
+    response = solve_multi_period_fpl(data, options)
+    if options.get("save_plan", False) and not options.get("randomized", False):
+        save_plan(response, options)
+    return report_results(response, data, options)
+
+
+def can_reuse_model(options):
+    """Whether simulations and chip sweeps can reuse one model, which is built by the matrix model builder and solved by HiGHS"""
+    single_highs = options.get("solver", "highs") == "highs" and options.get("num_iterations", 1) == 1
+    return single_highs and options.get("model_builder", "auto") != "sasoptpy" and not options.get("model_presolve", False)
+
+
+def solve_simulations(runtime_options=None, count=1):
+    """
+    Runs ``count`` randomized solves, building the model once and changing only the objective between them
+
+    Each scenario gives the same output files as ``solve_regular`` with ``randomized`` on, and the result tables are returned as a list.
+    """
+    options = get_options(runtime_options)
+    if not can_reuse_model(options):
+        print("Model reuse needs HiGHS, a single iteration and the matrix model builder, solving each simulation separately")
+        return [solve_regular({**(runtime_options or {}), "randomized": True}) for _ in range(count)]
+
+    my_data = get_team_data(options)
+    # noise is added per scenario by the solver, so players are not dominated by their expected points alone
+    options["randomized"] = False
+    options["dominance_filter"] = False
+    data = prep_data(my_data, options)
+
+    return [report_results(response, data, options) for response in solve_randomized_scenarios(data, options, count) if len(response) > 0]
+
+
+def solve_chip_sweep(runtime_options=None, combinations=()):
+    """
+    Solves each chip combination on one model, changing only the bounds of the chip variables between them
+
+    Each combination gives the same output as ``solve_regular`` with the combination in ``runtime_options``, and the result
+    tables are returned as a list.
+    """
+    options = get_options(runtime_options)
+    if not can_reuse_model(options):
+        print("Model reuse needs HiGHS, a single iteration and the matrix model builder, solving each chip combination separately")
+        return [solve_regular({**(runtime_options or {}), **combination}) for combination in combinations]
+
+    my_data = get_team_data(options)
+    data = prep_data(my_data, options)
+
+    return [
+        report_results(response, data, {**options, **combination})
+        for combination, response in solve_chip_combinations(data, options, combinations)
+        if response
+    ]
+
+
+def get_options(runtime_options=None):
+    """Reads the settings files, configuration files and command line arguments, in increasing priority, followed by ``runtime_options``"""
     # Create a base parser first for the --config argument
     # remaining_args is all the command line args that aren't --config
     base_parser = argparse.ArgumentParser(add_help=False)
@@ -112,6 +176,10 @@ def solve_regular(runtime_options=None):
     if runtime_options is not None:
         options.update(runtime_options)
 
+    return options
+
+
+def get_team_data(options):
     if options.get("preseason"):
         my_data = {"picks": [], "chips": [], "transfers": {"limit": None, "cost": 4, "bank": 1000, "value": 0}}
     elif options.get("team_data", "json").lower() == "id":
@@ -154,9 +222,40 @@ def solve_regular(runtime_options=None):
             else:
                 player["selling_price"] = player["purchase_price"] + (new_price - player["purchase_price"]) // 2
 
-    data = prep_data(my_data, options)
+    return my_data
 
-    response = solve_multi_period_fpl(data, options)
+
+def save_plan(response, options):
+    """Saves the picks of the best solution under ``data/plans``, the plan store that ``warm_start_plan`` reads from"""
+    if len(response) == 0:
+        print("No solution to save as a plan")
+        return
+    best = max(response, key=lambda result: result["score"])
+    stamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    os.makedirs(DATA_DIR / "plans", exist_ok=True)
+    best["picks"].to_csv(DATA_DIR / "plans" / f"{options.get('solve_name', 'regular')}_{stamp}_{get_random_id(5)}.csv", index=False)
+
+
+def get_previous_plan(options, next_gw):
+    """Returns the picks of the newest saved plan that reaches ``next_gw``, as set by ``warm_start_plan``, or None without one"""
+    source = options["warm_start_plan"]
+    path = DATA_DIR / "plans" if source == "latest" else Path(source)
+    if path.is_dir():
+        pattern = f"{options.get('solve_name', 'regular')}_????-??-??_??-??-??_*.csv"
+        files = sorted(path.glob(pattern), key=os.path.getmtime, reverse=True)
+    else:
+        files = [path] if path.exists() else []
+    for file in files:
+        plan = pd.read_csv(file)
+        if plan["week"].min() <= next_gw <= plan["week"].max():
+            print(f"Warm start from the plan in {file.name}")
+            return plan
+    print(f"No saved plan reaches GW{next_gw}, solving without a warm start")
+    return None
+
+
+def report_results(response, data, options):
+    """Saves the picks of each solution under ``data/results``, prints the requested summaries and returns the result table"""
     run_id = get_random_id(5)
     options["run_id"] = run_id
 
@@ -0,0 +1,107 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+from dev.solver import solve_multi_period_fpl
+
+NEXT_GW = 10
+TEAMS = [f"T{i}" for i in range(20)]
+POSITIONS = {1: "G", 2: "D", 3: "M", 4: "F"}
+
+BASE_OPTIONS = {
+    "horizon": 3,
+    "decay_base": 0.9,
+    "ft_value": 1.5,
+    "ft_value_list": {"2": 2, "3": 1.6, "4": 1.3, "5": 1.1},
+    "bench_weights": {"0": 0.03, "1": 0.21, "2": 0.06, "3": 0.002},
+    "vcap_weight": 0.1,
+    "ft_use_penalty": 0.2,
+    "itb_value": 0.08,
+    "hit_cost": 4,
+    "use_wc": [],
+    "use_bb": [],
+    "use_fh": [],
+    "use_tc": [],
+    "chip_limits": {"bb": 0, "wc": 0, "fh": 0, "tc": 0},
+    "booked_transfers": [],
+    "secs": 120,
+    "gap": 0,
+    "verbose": False,
+    "num_iterations": 1,
+    "iteration_criteria": "this_gw_transfer_in_out",
+    "report_decay_base": [],
+    "xmin_lb": 0,
+}
+
+
+def make_data(num_players=100, horizon=3, seed=1):
+    """Returns a random instance with the fields of ``prep_data``, with a cheap starting squad and some sell price drops"""
+    rng = np.random.default_rng(seed)
+    type_data = pd.DataFrame(
+        {
+            "id": [1, 2, 3, 4],
+            "singular_name_short": ["GKP", "DEF", "MID", "FWD"],
+            "squad_select": [2, 5, 5, 3],
+            "squad_min_play": [1, 3, 2, 1],
+            "squad_max_play": [1, 5, 5, 3],
+        }
+    ).set_index("id")
+    types = [1] * (num_players * 12 // 100) + [2] * (num_players * 33 // 100) + [3] * (num_players * 35 // 100)
+    types += [4] * (num_players - len(types))
+    rows = []
+    for i, player_type in enumerate(types):
+        row = {"id": i + 1, "ID": i + 1, "element_type": player_type, "Pos": POSITIONS[player_type], "name": TEAMS[i % 20]}
+        row.update({"web_name": f"P{i + 1}", "now_cost": int(rng.integers(40, 130))})
+        for w in range(NEXT_GW, NEXT_GW + horizon):
+            minutes = float(rng.choice([0, 30, 60, 90], p=[0.1, 0.1, 0.3, 0.5]))
+            row[f"{w}_xMins"] = minutes
+            row[f"{w}_Pts"] = round(float(rng.uniform(0, 1) * row["now_cost"] / 15 * minutes / 90), 3)
+        rows.append(row)
+    merged_data = pd.DataFrame(rows).set_index("id")
+    merged_data["total_ev"] = merged_data[[c for c in merged_data.columns if c.endswith("_Pts")]].sum(axis=1)
+    merged_data = merged_data.sort_values("total_ev", ascending=False)
+
+    squad = []
+    team_count = {}
+    for player_type, count in [(1, 2), (2, 5), (3, 5), (4, 3)]:
+        for p, row in merged_data[merged_data["element_type"] == player_type].sort_values("now_cost").iterrows():
+            if sum(merged_data.loc[x, "element_type"] == player_type for x in squad) == count:
+                break
+            if team_count.get(row["name"], 0) < 3:
+                squad.append(p)
+                team_count[row["name"]] = team_count.get(row["name"], 0) + 1
+    buy_price = (merged_data["now_cost"] / 10).to_dict()
+    sell_price = {p: buy_price[p] for p in squad}
+    for p in squad[:3]:
+        sell_price[p] = round(buy_price[p] - 0.1, 1)
+    fixtures = []
+    for w in range(NEXT_GW, NEXT_GW + horizon):
+        order = rng.permutation(20)
+        fixtures += [{"gw": w, "home": TEAMS[order[2 * k]], "away": TEAMS[order[2 * k + 1]]} for k in range(10)]
+    return {
+        "merged_data": merged_data,
+        "team_data": pd.DataFrame({"id": range(1, 21), "name": TEAMS}),
+        "type_data": type_data,
+        "next_gw": NEXT_GW,
+        "initial_squad": squad,
+        "sell_price": sell_price,
+        "buy_price": buy_price,
+        "price_modified_players": squad[:3],
+        "itb": 1.5,
+        "ft": 1,
+        "ft_base": 1,
+        "fixtures": fixtures,
+        "max_players_from_team": 3,
+        "my_data": {"picks": [{"element": p} for p in squad]},
+    }
+
+
+def solve(data, **options):
+    """Solves a copy of ``data`` with ``options`` on top of ``BASE_OPTIONS`` and returns the solutions"""
+    return solve_multi_period_fpl(copy.deepcopy(data), {**copy.deepcopy(BASE_OPTIONS), **options})
+
+
+def solve_scores(data, **options):
+    """Returns the scores of the solutions of ``solve``"""
+    return [result["score"] for result in solve(data, **options)]
@@ -0,0 +1,36 @@
+from utils import count_chip_combinations, get_chip_combinations
+
+
+def test_combinations_without_rules():
+    """Test that every combination of distinct gameweeks is generated once."""
+    chip_gameweeks = {"use_bb": [None, 1, 2], "use_wc": [], "use_fh": [None, 2, 3, 4], "use_tc": []}
+    combinations = list(get_chip_combinations(chip_gameweeks))
+    assert len(combinations) == 11
+    assert combinations[0] == {}
+    assert {"use_bb": [2], "use_fh": [2]} not in combinations
+    assert {"use_bb": [1], "use_fh": [4]} in combinations
+    assert count_chip_combinations(chip_gameweeks) == 11
+
+
+def test_input_is_not_modified():
+    """Test that the candidate gameweeks are left as they were."""
+    chip_gameweeks = {"use_bb": [None, 1], "use_wc": []}
+    list(get_chip_combinations(chip_gameweeks))
+    assert chip_gameweeks == {"use_bb": [None, 1], "use_wc": []}
+
+
+def test_chip_rules_are_applied():
+    """Test that no_chip_gws, allowed_chip_gws and duplicate gameweeks are pruned."""
+    chip_gameweeks = {"use_bb": [None, 1, 1, 2], "use_fh": [None, 2, 3], "use_tc": [None, 2]}
+    options = {"no_chip_gws": [2], "allowed_chip_gws": {"fh": [3]}}
+    combinations = list(get_chip_combinations(chip_gameweeks, options))
+    assert combinations == [
+        {},
+        {"use_tc": [2]},
+        {"use_fh": [3]},
+        {"use_fh": [3], "use_tc": [2]},
+        {"use_bb": [1]},
+        {"use_bb": [1], "use_tc": [2]},
+        {"use_bb": [1], "use_fh": [3]},
+        {"use_bb": [1], "use_fh": [3], "use_tc": [2]},
+    ]
@@ -0,0 +1,53 @@
+import copy
+
+import numpy as np
+import pytest
+
+from dev.matrix_solver import build_matrix_model, get_free_hit_relaxation_bound
+from tests.synthetic import BASE_OPTIONS, make_data, solve
+
+CHIP_LIMITS = {"bb": 1, "wc": 0, "fh": 1, "tc": 1}
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_data()
+
+
+@pytest.fixture(scope="module")
+def full_score(data):
+    return solve(data, model_builder="matrix", chip_limits=CHIP_LIMITS)[0]["score"]
+
+
+def test_bound_covers_full_solve(data, full_score):
+    """Test that the default bound of the decomposition is not below the optimum of the full model."""
+    result = solve(data, chip_decomposition=True, chip_limits=CHIP_LIMITS)[0]
+    assert result["score"] <= full_score + 1e-4
+    assert result["decomposition_bound"] >= full_score - 1e-4
+    assert result["decomposition_gap"] == pytest.approx((result["decomposition_bound"] - result["score"]) / result["decomposition_bound"])
+
+
+def test_check_matches_full_solve(data, full_score):
+    """Test that the check returns the optimum of the full model with no gap left."""
+    result = solve(data, chip_decomposition=True, chip_decomposition_check=True, chip_limits=CHIP_LIMITS)[0]
+    assert result["score"] == pytest.approx(full_score, abs=1e-4)
+    assert result["decomposition_bound"] == pytest.approx(full_score, abs=1e-3)
+
+
+def test_rejects_several_uses_of_a_chip(data):
+    """Test that chip limits above one, which the master cannot place, are rejected."""
+    with pytest.raises(ValueError, match="at most one gameweek"):
+        solve(data, chip_decomposition=True, chip_limits={**CHIP_LIMITS, "bb": 2})
+
+
+def test_relaxation_bound_leaves_model_unchanged(data):
+    """Test that the cut of the relaxation bound is freed again, so that later solves of the model are not changed."""
+    problem = build_matrix_model(copy.deepcopy(data), {**BASE_OPTIONS, "chip_limits": CHIP_LIMITS})
+    model = problem["model"]
+    row_lower = np.concatenate(model.row_lower)
+    row_upper = np.concatenate(model.row_upper)
+    get_free_hit_relaxation_bound(problem, BASE_OPTIONS)
+    new_rows = model.constraints["slot_squad_cover"]
+    assert np.array_equal(np.concatenate(model.row_lower)[: len(row_lower)], row_lower)
+    assert np.array_equal(np.concatenate(model.row_upper)[: len(row_upper)], row_upper)
+    assert np.all(np.concatenate(model.row_upper)[new_rows] == np.inf)
@@ -0,0 +1,43 @@
+import pytest
+
+from dev.solver import get_chip_gws
+from tests.synthetic import NEXT_GW, make_data, solve_scores
+
+GWS = [NEXT_GW, NEXT_GW + 1, NEXT_GW + 2]
+FREE_CHIPS = {"bb": 1, "wc": 0, "fh": 1, "tc": 1}
+
+CASES = {
+    "no_chip_gws": {"chip_limits": FREE_CHIPS, "no_chip_gws": [NEXT_GW + 1]},
+    "allowed_chip_gws": {"chip_limits": FREE_CHIPS, "allowed_chip_gws": {"bb": [NEXT_GW + 2], "tc": [NEXT_GW]}},
+    "forced_chip_gws": {"chip_limits": FREE_CHIPS, "forced_chip_gws": {"fh": [NEXT_GW + 1]}},
+    "use_and_free": {"use_bb": [NEXT_GW], "chip_limits": {"bb": 0, "wc": 0, "fh": 0, "tc": 1}},
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_data()
+
+
+def test_unused_chips_have_no_gameweeks():
+    """Test that chips without limits or use options get no gameweeks."""
+    assert get_chip_gws({}, GWS) == {"wc": [], "bb": [], "fh": [], "tc": []}
+
+
+def test_no_chip_gws_and_allowed_gameweeks():
+    """Test that no_chip_gws removes gameweeks of every chip but TC, and that allowed_chip_gws limits them further."""
+    options = {"chip_limits": FREE_CHIPS, "no_chip_gws": [NEXT_GW + 1], "allowed_chip_gws": {"bb": [NEXT_GW + 1, NEXT_GW + 2]}}
+    assert get_chip_gws(options, GWS) == {"wc": [], "bb": [NEXT_GW + 2], "fh": [NEXT_GW, NEXT_GW + 2], "tc": GWS}
+
+
+def test_used_and_forced_gameweeks_are_kept():
+    """Test that gameweeks of use_* and forced_chip_gws are kept even when no_chip_gws bans them, outside the horizon dropped."""
+    options = {"use_bb": [NEXT_GW + 1, NEXT_GW + 5], "forced_chip_gws": {"fh": [NEXT_GW + 1]}, "no_chip_gws": [NEXT_GW + 1]}
+    assert get_chip_gws(options, GWS) == {"wc": [], "bb": [NEXT_GW + 1], "fh": [NEXT_GW + 1], "tc": []}
+
+
+@pytest.mark.parametrize("options", CASES.values(), ids=CASES.keys())
+def test_skipped_variables_match_fixed_columns(data, options):
+    """Test that leaving out chip variables reaches the objective of the matrix builder, which fixes them to 0 instead."""
+    skipped = solve_scores(data, model_builder="sasoptpy", **options)
+    assert skipped == pytest.approx(solve_scores(data, model_builder="matrix", **options), abs=1e-4)
@@ -0,0 +1,72 @@
+import copy
+
+import pytest
+
+from dev.matrix_solver import solve_chip_combinations
+from tests.synthetic import BASE_OPTIONS, make_data, solve_scores
+
+COMBINATIONS = [
+    {},
+    {"use_bb": [10]},
+    {"use_bb": [11]},
+    {"use_fh": [11]},
+    {"use_fh": [12]},
+    {"use_bb": [10], "use_fh": [11]},
+    {"use_bb": [10], "use_fh": [12]},
+    {"use_tc": [11]},
+    {"use_bb": [11], "use_tc": [10]},
+]
+# two chips in one gameweek
+INFEASIBLE = {"use_bb": [11], "use_fh": [11]}
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_data()
+
+
+@pytest.fixture(scope="module")
+def separate(data):
+    return [solve_scores(data, model_builder="matrix", **combination)[0] for combination in COMBINATIONS]
+
+
+def sweep(data, combinations=COMBINATIONS, **options):
+    results = solve_chip_combinations(copy.deepcopy(data), {**copy.deepcopy(BASE_OPTIONS), **options}, combinations)
+    return {str(combination): [result["score"] for result in response] for combination, response in results}
+
+
+def test_sweep_matches_separate_solves(data, separate):
+    """Test that each combination of the sweep reaches the objective of its own solve."""
+    scores = sweep(data)
+    assert [scores[str(combination)][0] for combination in COMBINATIONS] == pytest.approx(separate, abs=1e-4)
+
+
+@pytest.mark.parametrize("bound", ["root", "lp"])
+def test_pruned_sweep_keeps_top_k(data, separate, bound):
+    """Test that a pruned sweep still finds the top scores of the separate solves."""
+    scores = sweep(data, chip_sweep_top_k=2, chip_sweep_bound=bound)
+    found = sorted(score for response in scores.values() for score in response)[-2:]
+    assert found == pytest.approx(sorted(separate)[-2:], abs=1e-4)
+
+
+def test_infeasible_combination_is_empty(data, separate):
+    """Test that an infeasible combination gets no solutions and leaves the solves of the others unchanged."""
+    scores = sweep(data, [INFEASIBLE, *COMBINATIONS])
+    assert scores[str(INFEASIBLE)] == []
+    assert [scores[str(combination)][0] for combination in COMBINATIONS] == pytest.approx(separate, abs=1e-4)
+
+
+@pytest.mark.parametrize("bound", ["root", "lp"])
+def test_pruned_sweep_with_infeasible_combination(data, separate, bound):
+    """Test that a pruned sweep gives an infeasible combination no solutions and still finds the top scores."""
+    scores = sweep(data, [*COMBINATIONS[:4], INFEASIBLE], chip_sweep_top_k=2, chip_sweep_bound=bound)
+    assert scores[str(INFEASIBLE)] == []
+    found = sorted(score for response in scores.values() for score in response)[-2:]
+    assert found == pytest.approx(sorted(separate[:4])[-2:], abs=1e-4)
+
+
+def test_top_k_above_feasible_combinations(data, separate):
+    """Test that a top_k larger than the number of feasible combinations solves each of them."""
+    scores = sweep(data, [*COMBINATIONS[:4], INFEASIBLE], chip_sweep_top_k=10)
+    assert scores[str(INFEASIBLE)] == []
+    assert [scores[str(combination)][0] for combination in COMBINATIONS[:4]] == pytest.approx(separate[:4], abs=1e-4)
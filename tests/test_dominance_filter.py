@@ -0,0 +1,122 @@
+import pandas as pd
+import pytest
+
+from dev.solver import MAX_PLAYERS_PER_TEAM, get_dominated_players
+from tests.synthetic import NEXT_GW, make_data, solve_scores
+
+CASES = {
+    "default": {},
+    "free_chips": {"chip_limits": {"bb": 1, "wc": 0, "fh": 0, "tc": 1}},
+    "free_hit": {"use_fh": [11]},
+    "opposing_play": {"no_opposing_play": True},
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    """A small instance where the best players of some positions get equal and worse, pricier teammates"""
+    data = make_data()
+    merged_data = data["merged_data"]
+    rows = []
+    for player_type in [1, 2, 3, 4]:
+        best = merged_data[merged_data["element_type"] == player_type].iloc[0]
+        for k in range(5):
+            row = best.copy()
+            row.name = row["ID"] = 1000 + 10 * player_type + k
+            if k >= 3:
+                row["now_cost"] += 5
+                for w in range(NEXT_GW, NEXT_GW + 3):
+                    row[f"{w}_Pts"] -= 0.5
+            rows.append(row)
+    data["merged_data"] = pd.concat([merged_data, pd.DataFrame(rows)])
+    data["buy_price"] = (data["merged_data"]["now_cost"] / 10).to_dict()
+    return data
+
+
+def drop_dominated(data, options):
+    gws = list(range(NEXT_GW, NEXT_GW + 3))
+    type_data = data["type_data"]
+    team_limit = max(MAX_PLAYERS_PER_TEAM, data["max_players_from_team"])
+    slots = {t: min(int(type_data.loc[t, "squad_select"]), team_limit) for t in type_data.index}
+    for t in [1, 2]:
+        slots[t] = min(slots[t], options.get("max_defenders_per_team", 3))
+    dominated = get_dominated_players(data["merged_data"], gws, slots, set(data["initial_squad"]), options)
+    return {**data, "merged_data": data["merged_data"].drop(index=dominated)}, dominated
+
+
+@pytest.mark.parametrize("options", CASES.values(), ids=CASES.keys())
+def test_filter_keeps_objective(data, options):
+    """Test that dropping dominated players does not change the best objective."""
+    filtered, dominated = drop_dominated(data, options)
+    assert len(dominated) > 0
+    full = solve_scores(data, model_builder="matrix", **options)
+    reduced = solve_scores(filtered, model_builder="matrix", **options)
+    assert reduced == pytest.approx(full, abs=1e-4)
+
+
+def make_players(rows):
+    """Players from (id, team, element_type, now_cost, points, minutes) rows over gameweeks 1 and 2"""
+    data = []
+    for p, team, player_type, cost, points, minutes in rows:
+        row = {"id": p, "name": team, "element_type": player_type, "Pos": "GDMF"[player_type - 1], "now_cost": cost}
+        for w in [1, 2]:
+            row[f"{w}_Pts"] = points[w - 1]
+            row[f"{w}_xMins"] = minutes[w - 1]
+        data.append(row)
+    return pd.DataFrame(data).set_index("id")
+
+
+SLOTS = {1: 1, 2: 1, 3: 1, 4: 1}
+BEST = ("A", 3, 80, [5, 5], [90, 90])
+
+
+def get_dropped(rows, protected=(), slots=SLOTS, **options):
+    return get_dominated_players(make_players(rows), [1, 2], slots, set(protected), options)
+
+
+def test_equal_players_keep_one():
+    """Test that of two equal players only the one with the larger ID is dropped."""
+    assert get_dropped([(2, *BEST), (1, *BEST)]) == [2]
+
+
+def test_needs_a_dominating_teammate_per_slot():
+    """Test that a player is only dropped with as many dominating teammates as the squad can hold from the team."""
+    rows = [(1, *BEST), (2, *BEST), (3, "A", 3, 80, [4, 4], [90, 90])]
+    assert get_dropped(rows, slots={**SLOTS, 3: 3}) == []
+    assert get_dropped(rows, slots={**SLOTS, 3: 2}) == [3]
+
+
+def test_worse_week_price_or_team_is_not_dominated():
+    """Test that a player with more points in one week, a lower price, more playing weeks or another team is kept."""
+    rows = [
+        (1, *BEST),
+        (2, "A", 3, 80, [6, 1], [90, 90]),
+        (3, "A", 3, 75, [1, 1], [90, 90]),
+        (4, "B", 3, 90, [1, 1], [90, 90]),
+        (5, "A", 4, 90, [1, 1], [90, 90]),
+    ]
+    assert get_dropped(rows) == []
+    assert get_dropped([(1, "A", 3, 80, [5, 5], [90, 0]), (2, "A", 3, 80, [1, 1], [30, 30])]) == []
+
+
+def test_protected_banned_and_kept_positions():
+    """Test that protected players and kept positions stay, and that banned players do not dominate."""
+    rows = [(1, *BEST), (2, "A", 3, 90, [1, 1], [90, 90])]
+    assert get_dropped(rows) == [2]
+    assert get_dropped(rows, protected=[2]) == []
+    assert get_dropped(rows, banned=[1]) == []
+    assert get_dropped(rows, banned_next_gw=[[1, 1]]) == []
+    assert get_dropped(rows, pick_prices={"M": "8.0"}) == []
+    assert get_dropped(rows, pick_prices={"M": ""}) == [2]
+    goalkeepers = [(1, "A", 1, 50, [5, 5], [90, 90]), (2, "A", 1, 50, [1, 1], [90, 90])]
+    assert get_dropped(goalkeepers) == [2]
+    assert get_dropped(goalkeepers, no_gk_rotation_after=1) == []
+
+
+def test_opposing_play_needs_same_weeks():
+    """Test that with no_opposing_play a teammate only dominates when playing in exactly the same gameweeks."""
+    rows = [(1, *BEST), (2, "A", 3, 90, [0, 1], [0, 90])]
+    assert get_dropped(rows) == [2]
+    assert get_dropped(rows, no_opposing_play=True) == []
+    assert get_dropped(rows, no_opposing_play="penalty") == []
+    assert get_dropped(rows, no_opposing_play=False) == [2]
@@ -0,0 +1,43 @@
+import pytest
+
+from dev.solver import OPPOSING_POSITIONS, get_opposing_pairs, get_player_groups
+from tests.synthetic import NEXT_GW, make_data
+
+GWS = [NEXT_GW, NEXT_GW + 1, NEXT_GW + 2]
+
+
+@pytest.fixture(scope="module")
+def data():
+    data = make_data()
+    # a double gameweek against the same team, and a blank gameweek for the two teams of the dropped fixture
+    fixtures = data["fixtures"][:10] + data["fixtures"][11:] + [data["fixtures"][0]]
+    return {**data, "fixtures": fixtures}
+
+
+def scan_pairs(data, w, group):
+    """Pairs found by comparing every two players against every fixture of gameweek ``w``"""
+    team = data["merged_data"]["name"].to_dict()
+    pos = data["merged_data"]["Pos"].to_dict()
+    meetings = [{f["home"], f["away"]} for f in data["fixtures"] if f["gw"] == w]
+    pairs = set()
+    for p1 in team:
+        for p2 in team:
+            meet = team[p1] != team[p2] and {team[p1], team[p2]} in meetings
+            if meet and (group == "all" or (pos[p1], pos[p2]) in OPPOSING_POSITIONS):
+                pairs.add((p1, p2))
+    return pairs
+
+
+@pytest.mark.parametrize("group", ["all", "position"])
+def test_pairs_match_player_scan(data, group):
+    """Test that the fixture index yields each pair of opposing players once, and the same pairs as a scan over all players."""
+    pairs = get_opposing_pairs(data["fixtures"], GWS, get_player_groups(data["merged_data"]), group)
+    for w in GWS:
+        assert len(pairs[w]) == len(set(pairs[w]))
+        assert set(pairs[w]) == scan_pairs(data, w, group)
+
+
+def test_gameweeks_without_fixtures_have_no_pairs(data):
+    """Test that gameweeks outside the fixtures get an empty list of pairs."""
+    pairs = get_opposing_pairs(data["fixtures"], [NEXT_GW + 5], get_player_groups(data["merged_data"]))
+    assert pairs == {NEXT_GW + 5: []}
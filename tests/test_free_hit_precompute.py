@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+import dev.matrix_solver
+from dev.matrix_solver import get_free_hit_values
+from dev.solver import get_player_week_matrices, set_highs_options
+from tests.synthetic import BASE_OPTIONS, NEXT_GW, make_data, solve_scores
+
+# 59 is not in the current squad, 52 is
+CASES = {
+    "second_week": {"use_fh": [NEXT_GW + 1]},
+    "first_week": {"use_fh": [NEXT_GW]},
+    "free": {"chip_limits": {"bb": 0, "wc": 0, "fh": 1, "tc": 0}},
+    "banned": {"use_fh": [NEXT_GW + 1], "banned": "best"},
+    "banned_next_gw": {"use_fh": [NEXT_GW], "banned_next_gw": "best"},
+    "locked_in_squad": {"use_fh": [NEXT_GW + 1], "locked": [52]},
+    "locked_first_week": {"use_fh": [NEXT_GW], "locked": [59]},
+    "locked_free": {"chip_limits": {"bb": 0, "wc": 0, "fh": 1, "tc": 0}, "locked": [59]},
+    "transfer_loss": {"use_fh": [NEXT_GW + 2], "itb_loss_per_transfer": 0.3},
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_data()
+
+
+@pytest.fixture(scope="module")
+def poor_data():
+    data = make_data(seed=3)
+    data["itb"] = 0
+    return data
+
+
+def get_options(data, options):
+    best = [p for p in data["merged_data"].index if p not in data["initial_squad"]][:3]
+    if options.get("banned") == "best":
+        options = {**options, "banned": best}
+    if options.get("banned_next_gw") == "best":
+        options = {**options, "banned_next_gw": best}
+    return options
+
+
+@pytest.mark.parametrize("options", CASES.values(), ids=CASES.keys())
+def test_precompute_matches_full_model(data, options):
+    """Test that Free Hit values precomputed over the budget grid reach the objective of the full Free Hit block."""
+    options = get_options(data, options)
+    full = solve_scores(data, model_builder="matrix", **options)
+    assert solve_scores(data, model_builder="matrix", fh_precompute=True, **options) == pytest.approx(full, abs=1e-4)
+
+
+def test_precompute_matches_full_model_on_tight_budget(poor_data):
+    """Test that a Free Hit without money in the bank, after sale price drops, keeps the objective of the full model."""
+    options = {"use_fh": [NEXT_GW + 1], "num_transfers": 2}
+    full = solve_scores(poor_data, model_builder="matrix", **options)
+    assert solve_scores(poor_data, model_builder="matrix", fh_precompute=True, **options) == pytest.approx(full, abs=1e-4)
+
+
+def test_unsolved_levels_are_lower_bounds(data, capsys, monkeypatch):
+    """Test that grid solves stopped before optimality only fill their own budget level, with a value below the optimum."""
+    points, _ = get_player_week_matrices(data, [NEXT_GW])
+    budgets = np.round(np.arange(70, 101) * 1.0, 1)
+    exact, _ = get_free_hit_values(data, BASE_OPTIONS, points, budgets, [0])
+
+    def stop_at_first_solution(solver_instance, options):
+        set_highs_options(solver_instance, options)
+        solver_instance.setOptionValue("mip_max_improving_sols", 1)
+
+    monkeypatch.setattr(dev.matrix_solver, "set_highs_options", stop_at_first_solution)
+    capsys.readouterr()
+    values, picks = get_free_hit_values(data, BASE_OPTIONS, points, budgets, [0])
+    assert "not solved to optimality" in capsys.readouterr().out
+    assert np.array_equal(np.isfinite(values), np.isfinite(exact))
+    assert np.all(values[np.isfinite(values)] <= exact[np.isfinite(exact)] + 1e-6)
+    price = np.array([data["sell_price"].get(p, data["buy_price"][p]) for p in data["merged_data"].index])
+    for k in np.flatnonzero(np.isfinite(values[0])):
+        assert np.dot(price, picks[(0, k)]["squad"]) <= budgets[k] + 1e-6
@@ -0,0 +1,35 @@
+import pytest
+
+from tests.synthetic import NEXT_GW, make_data, solve, solve_scores
+
+BUILDERS = ["sasoptpy", "matrix"]
+CASES = {
+    "default": {},
+    "hits": {"num_transfers": 3},
+    "wildcard_free_hit": {"use_wc": [11], "use_fh": [12]},
+    "free_chips": {"chip_limits": {"bb": 1, "wc": 1, "fh": 0, "tc": 1}},
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_data()
+
+
+@pytest.mark.parametrize("builder", BUILDERS)
+@pytest.mark.parametrize("formulation", ["big_m", "state"])
+def test_one_hit_on_one_ft(data, builder, formulation):
+    """Test that two transfers on a single FT, i.e. exactly one hit, are feasible in a week before the last."""
+    response = solve(data, model_builder=builder, ft_formulation=formulation, num_transfers=2)
+    picks = response[0]["picks"]
+    assert picks.loc[picks["week"] == NEXT_GW, "transfer_in"].sum() == 2
+    assert response[0]["statistics"][NEXT_GW]["pt"] == 1
+
+
+@pytest.mark.parametrize("builder", BUILDERS)
+@pytest.mark.parametrize("options", CASES.values(), ids=CASES.keys())
+def test_state_formulation_matches_big_m(data, builder, options):
+    """Test that the state-move FT formulation reaches the objective of the big-M one."""
+    big_m = solve_scores(data, model_builder=builder, ft_formulation="big_m", **options)
+    state = solve_scores(data, model_builder=builder, ft_formulation="state", **options)
+    assert state == pytest.approx(big_m, abs=1e-4)
@@ -0,0 +1,56 @@
+import pytest
+
+from tests.synthetic import NEXT_GW, make_data, solve, solve_scores
+
+CASES = {
+    "default": {},
+    "hits": {"num_transfers": 2},
+    "bench_boost": {"use_bb": [NEXT_GW + 1], "use_tc": [NEXT_GW]},
+    "free_hit": {"use_fh": [NEXT_GW + 1]},
+    "wildcard": {"use_wc": [NEXT_GW + 1]},
+    "opposing_play": {"no_opposing_play": True},
+    "lineup_rules": {"double_defense_pick": True},
+    "defenders_per_team": {"max_defenders_per_team": 1},
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_data()
+
+
+def check_plan(data, result):
+    """Asserts that each gameweek of the plan has a valid squad, lineup and captain, and money left in the bank"""
+    picks = result["picks"]
+    squad_select = data["type_data"]["squad_select"].to_dict()
+    for w, week in picks.groupby("week"):
+        squad = week[week["squad"] == 1]
+        assert len(squad) == 15
+        assert squad["type"].value_counts().to_dict() == squad_select
+        assert squad["team"].value_counts().max() <= data["max_players_from_team"]
+        assert squad["lineup"].sum() == (15 if (week["chip"] == "BB").any() else 11)
+        assert squad["captain"].sum() == 1
+        assert result["statistics"][w]["itb"] >= -1e-6
+
+
+@pytest.mark.parametrize("options", CASES.values(), ids=CASES.keys())
+def test_heuristic_plan_is_feasible(data, options):
+    """Test that the heuristic solver gives a valid plan that scores at most the optimum."""
+    (optimum,) = solve_scores(data, model_builder="matrix", **options)
+    (result,) = solve(data, solver="heuristic", **options)
+    check_plan(data, result)
+    assert result["score"] <= optimum + 1e-4
+
+
+def test_heuristic_plan_follows_chips(data):
+    """Test that the heuristic solver plays the chips it is asked to, in their gameweeks."""
+    (result,) = solve(data, solver="heuristic", use_bb=[NEXT_GW + 1], use_fh=[NEXT_GW + 2])
+    picks = result["picks"]
+    assert set(picks.loc[picks["chip"] == "BB", "week"]) == {NEXT_GW + 1}
+    assert set(picks.loc[picks["chip"] == "FH", "week"]) == {NEXT_GW + 2}
+
+
+def test_heuristic_plan_needs_full_squad(data):
+    """Test that the heuristic solver rejects a current squad that is not full."""
+    with pytest.raises(ValueError, match="full current squad"):
+        solve({**data, "initial_squad": data["initial_squad"][1:]}, solver="heuristic")
@@ -0,0 +1,44 @@
+import copy
+
+import numpy as np
+import pytest
+
+from dev.matrix_solver import build_matrix_model, get_heuristic_plan
+from tests.synthetic import BASE_OPTIONS, NEXT_GW, make_data, solve_scores
+
+CASES = {
+    "default": {},
+    "hits": {"num_transfers": 2},
+    "bench_boost": {"use_bb": [NEXT_GW + 1]},
+    "free_hit": {"use_fh": [NEXT_GW + 1]},
+    "wildcard": {"use_wc": [NEXT_GW + 1]},
+    "free_chips": {"chip_limits": {"bb": 1, "wc": 0, "fh": 0, "tc": 1}},
+    "opposing_play": {"no_opposing_play": True},
+    "lineup_rules": {"double_defense_pick": True},
+    "iterations": {"num_iterations": 2},
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_data()
+
+
+@pytest.mark.parametrize("options", CASES.values(), ids=CASES.keys())
+def test_heuristic_start_matches_cold_start(data, options):
+    """Test that starting HiGHS from the heuristic plan reaches the objectives of a cold start."""
+    cold = solve_scores(data, model_builder="matrix", **options)
+    assert solve_scores(data, heuristic_start=True, **options) == pytest.approx(cold, abs=1e-4)
+
+
+@pytest.mark.parametrize("options", CASES.values(), ids=CASES.keys())
+def test_start_columns_keep_bounds(data, options):
+    """Test that the heuristic plan keeps its columns within their bounds, with 15 players in each regular squad."""
+    options = {**copy.deepcopy(BASE_OPTIONS), **options}
+    problem = build_matrix_model(copy.deepcopy(data), options)
+    model = problem["model"]
+    x, cols = get_heuristic_plan(problem, data, options)
+    assert np.all(x[cols] >= model.col_lower[cols] - 1e-9)
+    assert np.all(x[cols] <= model.col_upper[cols] + 1e-9)
+    squads = x[model.variables["squad"][:, 1:]]
+    assert np.allclose(squads.sum(axis=0), 15)
@@ -0,0 +1,64 @@
+import highspy
+import numpy as np
+import pytest
+import sasoptpy as so
+
+from dev.solver import add_sasoptpy_rows, sasoptpy_to_highs
+
+
+def make_model():
+    """Small model with every variable type, constraint direction and an objective constant"""
+    model = so.Model(name="handoff")
+    items = range(6)
+    pick = model.add_variables(items, name="pick", vartype=so.binary)
+    count = model.add_variable(name="count", vartype=so.integer, lb=0, ub=4)
+    slack = model.add_variable(name="slack", vartype=so.continuous, lb=-1, ub=2.5)
+    weights = [3, 4, 2, 5, 1, 3]
+    values = [4.5, 5, 2.5, 7, 1, 3.5]
+    model.add_constraint(so.expr_sum(weights[i] * pick[i] for i in items) + slack <= 9, name="capacity")
+    model.add_constraint(so.expr_sum(pick[i] for i in items) == count, name="count_def")
+    model.add_constraint(pick[0] + pick[3] >= 1, name="either")
+    model.set_objective(-so.expr_sum(values[i] * pick[i] for i in items) - 0.5 * slack + 2, sense="N", name="value")
+    return model
+
+
+def solve_mps(model, path):
+    model.export_mps(str(path))
+    solver_instance = highspy.Highs()
+    solver_instance.setOptionValue("output_flag", False)
+    solver_instance.readModel(str(path))
+    solver_instance.run()
+    return solver_instance
+
+
+def solve_memory(model):
+    solver_instance = sasoptpy_to_highs(model)
+    solver_instance.setOptionValue("output_flag", False)
+    solver_instance.run()
+    return solver_instance
+
+
+def test_memory_matches_mps(tmp_path):
+    """Test that the model passed in memory has the columns, objective and solution of the MPS round-trip."""
+    model = make_model()
+    memory = solve_memory(model)
+    mps = solve_mps(model, tmp_path / "handoff.mps")
+    # the MPS file sasoptpy writes drops the objective constant, which the model in memory keeps as its offset
+    assert memory.getLp().offset_ == pytest.approx(2)
+    assert memory.getInfo().objective_function_value == pytest.approx(mps.getInfo().objective_function_value + 2)
+    assert memory.getLp().col_names_ == mps.getLp().col_names_
+    assert np.allclose(memory.getSolution().col_value, mps.getSolution().col_value)
+
+
+def test_added_rows_match_rebuilt_model(tmp_path):
+    """Test that rows appended to the HiGHS instance give the solution of the model rebuilt with them."""
+    model = make_model()
+    solver_instance = solve_memory(model)
+    pick = model.get_variable("pick[3]")
+    cut = model.add_constraint(pick <= 0, name="cut")
+    add_sasoptpy_rows(solver_instance, model, [cut])
+    solver_instance.run()
+    rebuilt = solve_mps(model, tmp_path / "rebuilt.mps")
+    assert solver_instance.getInfo().objective_function_value == pytest.approx(rebuilt.getInfo().objective_function_value + 2)
+    column = next(i for i, v in enumerate(model.get_variables()) if v is pick)
+    assert solver_instance.getSolution().col_value[column] == pytest.approx(0)
@@ -0,0 +1,53 @@
+import pytest
+
+from tests.synthetic import make_data, solve, solve_scores
+
+CASES = {
+    "default": {},
+    "chips": {"use_bb": [11], "use_tc": [10]},
+    "free_chips": {"chip_limits": {"bb": 1, "wc": 0, "fh": 0, "tc": 1}},
+    "free_hit": {"use_fh": [11]},
+    "opposing_play": {"no_opposing_play": True},
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_data()
+
+
+@pytest.mark.parametrize("builder", ["sasoptpy", "matrix"])
+@pytest.mark.parametrize("options", CASES.values(), ids=CASES.keys())
+def test_compact_matches_full(data, builder, options):
+    """Test that the compact lineup formulation reaches the objective of the full one."""
+    full = solve_scores(data, model_builder=builder, lineup_formulation="full", **options)
+    compact = solve_scores(data, model_builder=builder, lineup_formulation="compact", **options)
+    assert compact == pytest.approx(full, abs=1e-4)
+
+
+CHIP_CASES = {
+    "tc_then_fh": {"use_tc": [10], "use_fh": [11]},
+    "fh_then_tc": {"use_fh": [10], "use_tc": [12]},
+    "free_tc_with_fh": {"use_fh": [11], "chip_limits": {"bb": 0, "wc": 0, "fh": 0, "tc": 1}},
+}
+
+
+@pytest.mark.parametrize("builder", ["sasoptpy", "matrix"])
+@pytest.mark.parametrize("options", CHIP_CASES.values(), ids=CHIP_CASES.keys())
+def test_compact_picks_follow_chips(data, builder, options):
+    """Test that compact plans with TC and FH reach the full objective, with a valid lineup and one tripled captain."""
+    full = solve_scores(data, model_builder=builder, lineup_formulation="full", **options)
+    (result,) = solve(data, model_builder=builder, lineup_formulation="compact", **options)
+    assert result["score"] == pytest.approx(full[0], abs=1e-4)
+    picks = result["picks"]
+    for _, week in picks.groupby("week"):
+        squad = week[week["squad"] == 1]
+        assert len(squad) == 15
+        assert squad["lineup"].sum() == 11
+        assert squad["captain"].sum() == 1
+        assert (squad["captain"] <= squad["lineup"]).all()
+        tripled = (squad["multiplier"] == 3).sum()
+        assert tripled == int((week["chip"] == "TC").any())
+    assert picks.loc[picks["chip"] == "TC", "week"].nunique() == 1
+    if "use_fh" in options:
+        assert set(picks.loc[picks["chip"] == "FH", "week"]) == set(options["use_fh"])
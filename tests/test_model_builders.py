@@ -0,0 +1,99 @@
+import pytest
+
+from dev.solver import get_model_builder
+from tests.synthetic import BASE_OPTIONS, NEXT_GW, make_data, solve, solve_scores
+
+CASES = {
+    "default": {},
+    "chips": {"use_bb": [11], "use_tc": [10]},
+    "free_chips": {"chip_limits": {"bb": 1, "wc": 0, "fh": 0, "tc": 1}},
+    "no_chip_gws": {"chip_limits": {"bb": 1, "wc": 0, "fh": 0, "tc": 0}, "no_chip_gws": [6, 11, 20]},
+    "wildcard": {"use_wc": [11]},
+    "free_hit": {"use_fh": [11]},
+    "opposing_play": {"no_opposing_play": True},
+    "opposing_play_penalty": {"no_opposing_play": "penalty", "opposing_play_penalty": 1},
+    "iterations": {"num_iterations": 3},
+}
+
+# options only the matrix builder implements, on top of the options both builders solve, and whether the plan they give is
+# optimal or only feasible
+FREE_CHIPS = {"chip_limits": {"bb": 1, "wc": 0, "fh": 0, "tc": 1}}
+MATRIX_CASES = {
+    "chip_decomposition": (FREE_CHIPS, {"chip_decomposition": True}, False),
+    "chip_decomposition_check": (FREE_CHIPS, {"chip_decomposition": True, "chip_decomposition_check": True}, True),
+    "pool_expansion": ({"num_transfers": 2}, {"pool_expansion": True, "pool_expansion_size": 2}, True),
+    "rolling_horizon": ({}, {"rolling_horizon": True, "rolling_window": 1}, True),
+    "fh_precompute": ({"use_fh": [NEXT_GW + 1]}, {"fh_precompute": True}, True),
+    "opposing_play_lazy": ({"no_opposing_play": True}, {"opposing_play_lazy": True}, True),
+    "heuristic_start": ({"use_bb": [NEXT_GW + 1]}, {"heuristic_start": True}, True),
+    "race": ({}, {"race": True, "race_configs": [{}, {"random_seed": 1}]}, True),
+    "heuristic_solver": ({}, {"solver": "heuristic"}, False),
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_data()
+
+
+@pytest.mark.parametrize("options", CASES.values(), ids=CASES.keys())
+def test_builders_agree(data, options):
+    """Test that the sasoptpy and matrix model builders reach the same objectives."""
+    sasoptpy = solve_scores(data, model_builder="sasoptpy", **options)
+    matrix = solve_scores(data, model_builder="matrix", **options)
+    assert matrix == pytest.approx(sasoptpy, abs=1e-4)
+
+
+@pytest.mark.parametrize(("options", "matrix_options", "optimal"), MATRIX_CASES.values(), ids=MATRIX_CASES.keys())
+def test_matrix_options_match_sasoptpy(data, options, matrix_options, optimal):
+    """Test that options only the matrix builder implements reach the sasoptpy objective, or stay below it when they are heuristic."""
+    (sasoptpy,) = solve_scores(data, model_builder="sasoptpy", **options)
+    (matrix,) = solve_scores(data, **options, **matrix_options)
+    if optimal:
+        assert matrix == pytest.approx(sasoptpy, abs=1e-4)
+    else:
+        assert matrix <= sasoptpy + 1e-4
+
+
+def test_previous_plan_matches_sasoptpy(data):
+    """Test that a warm start from an earlier plan reaches the sasoptpy objective."""
+    (sasoptpy,) = solve_scores(data, model_builder="sasoptpy", num_transfers=2)
+    plan = solve(data, model_builder="matrix", num_transfers=2)[0]["picks"]
+    (matrix,) = solve_scores({**data, "previous_plan": plan}, num_transfers=2)
+    assert matrix == pytest.approx(sasoptpy, abs=1e-4)
+
+
+@pytest.mark.parametrize(
+    ("options", "builder"),
+    [
+        ({}, "sasoptpy"),
+        ({"model_presolve": True}, "sasoptpy"),
+        ({"heuristic_start": True}, "matrix"),
+        ({"solver": "heuristic"}, "matrix"),
+        ({"model_builder": "matrix"}, "matrix"),
+    ],
+)
+def test_auto_picks_builder(data, options, builder):
+    """Test that the builder is sasoptpy unless an option only the matrix builder implements is set."""
+    assert get_model_builder(data, {**BASE_OPTIONS, **options}) == builder
+
+
+def test_previous_plan_picks_matrix(data):
+    """Test that a warm start from an earlier plan picks the matrix builder."""
+    assert get_model_builder({**data, "previous_plan": "plan"}, BASE_OPTIONS) == "matrix"
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"model_builder": "sasoptpy", "race": True},
+        {"model_builder": "sasoptpy", "solver": "heuristic"},
+        {"model_builder": "matrix", "model_presolve": True},
+        {"model_presolve": True, "pool_expansion": True},
+        {"model_builder": "cplex"},
+    ],
+)
+def test_rejects_options_of_other_builder(data, options):
+    """Test that options the chosen model builder does not implement are rejected."""
+    with pytest.raises(ValueError):
+        get_model_builder(data, {**BASE_OPTIONS, **options})
@@ -0,0 +1,96 @@
+import glob
+
+import highspy
+import pytest
+
+import dev.solver
+from tests.synthetic import NEXT_GW, make_data, solve_scores
+
+CASES = {
+    "default": {},
+    "free_chips": {"chip_limits": {"bb": 1, "wc": 0, "fh": 0, "tc": 1}},
+    "wildcard_free_hit": {"use_wc": [NEXT_GW], "use_fh": [NEXT_GW + 1]},
+    "fixed_tc": {"use_tc": [NEXT_GW + 1]},
+    "rules": {"banned": [1, 2], "no_transfer_gws": [NEXT_GW + 1], "no_transfer_by_position": ["G"], "num_transfers": 1},
+    "next_gw_rules": {"banned_next_gw": [2, [3, NEXT_GW + 1]], "locked_next_gw": [[59, NEXT_GW + 1]]},
+    "booked_transfers": {"booked_transfers": [{"gw": NEXT_GW, "transfer_in": 59, "transfer_out": 57}], "only_booked_transfers": True},
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_data()
+
+
+@pytest.fixture(scope="module")
+def poor_data():
+    data = make_data(seed=2)
+    data["itb"] = 0
+    # a squad player without minutes but with points, whom TC must still be able to pick
+    player = data["initial_squad"][5]
+    data["merged_data"].loc[player, [f"{NEXT_GW}_xMins", f"{NEXT_GW}_Pts"]] = [0, 20]
+    return data
+
+
+@pytest.mark.parametrize("options", CASES.values(), ids=CASES.keys())
+def test_presolve_keeps_objective(data, options):
+    """Test that the reductions of model_presolve leave the objective unchanged."""
+    assert solve_scores(data, model_presolve=True, **options) == pytest.approx(solve_scores(data, model_presolve=False, **options), abs=1e-6)
+
+
+def test_presolve_keeps_objective_on_tight_budget(poor_data):
+    """Test that unaffordable players and TC on players without minutes are handled without changing the objective."""
+    options = {"chip_limits": {"bb": 0, "wc": 0, "fh": 0, "tc": 1}}
+    with_presolve = solve_scores(poor_data, model_presolve=True, **options)
+    assert with_presolve == pytest.approx(solve_scores(poor_data, model_presolve=False, **options), abs=1e-6)
+
+
+def run_gurobi_with_highs(mps_file_name, sol_file_name, options):
+    """Stands in for gurobi_cl: solves the exported MPS file with HiGHS and writes the solution in the Gurobi format"""
+    solver_instance = highspy.Highs()
+    solver_instance.setOptionValue("output_flag", False)
+    solver_instance.readModel(mps_file_name)
+    solver_instance.run()
+    lp = solver_instance.getLp()
+    with open(sol_file_name, "w") as f:
+        f.write("# Objective value\n")
+        for name, value in zip(lp.col_names_, solver_instance.getSolution().col_value, strict=True):
+            f.write(f"{name} {value}\n")
+
+
+def read_mps(file_name):
+    """Returns the model of an exported MPS file, as HiGHS reads it"""
+    solver_instance = highspy.Highs()
+    solver_instance.setOptionValue("output_flag", False)
+    solver_instance.readModel(file_name)
+    return solver_instance.getLp()
+
+
+def test_presolve_exports_smaller_model(data, tmp_path, monkeypatch):
+    """Test that the model exported with model_presolve has fewer rows and columns, and none of them fixed."""
+    options = CASES["rules"]
+    sizes = {}
+    for presolve in [False, True]:
+        folder = tmp_path / str(presolve)
+        folder.mkdir()
+        monkeypatch.chdir(folder)
+        solve_scores(data, model_presolve=presolve, export_mps=True, **options)
+        lp = read_mps(glob.glob("tmp/*.mps")[0])
+        sizes[presolve] = (lp.num_row_, lp.num_col_)
+    assert sizes[True][0] < sizes[False][0]
+    assert sizes[True][1] < sizes[False][1]
+    assert all(lower < upper for lower, upper in zip(lp.col_lower_, lp.col_upper_, strict=True))
+
+
+def test_presolve_for_gurobi(data, tmp_path, monkeypatch):
+    """Test that model_presolve leaves the fixed columns out of the MPS file for Gurobi and that the Gurobi path keeps the objective."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(dev.solver, "run_gurobi", run_gurobi_with_highs)
+    options = CASES["rules"]
+    gurobi = solve_scores(data, solver="gurobi", model_presolve=True, delete_tmp=False, **options)
+    assert gurobi == pytest.approx(solve_scores(data, model_presolve=False, **options), abs=1e-6)
+
+    lp = read_mps(glob.glob("tmp/*.mps")[0])
+    # player 1 is banned, so their squad columns are fixed to zero
+    assert f"squad[1,{NEXT_GW}]" not in lp.col_names_
+    assert all(lower < upper for lower, upper in zip(lp.col_lower_, lp.col_upper_, strict=True))
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from dev.solver import build_player_week_matrices, get_objective_coefficients, get_player_week_matrices
+from tests.synthetic import NEXT_GW, make_data
+
+GWS = [NEXT_GW, NEXT_GW + 1, NEXT_GW + 2]
+BENCH_WEIGHTS = {0: 0.03, 1: 0.21, 2: 0.06, 3: 0.002}
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_data()
+
+
+def test_matrices_match_lookups(data):
+    """Test that the points and minutes matrices hold the per-(player, gameweek) values of merged_data."""
+    merged_data = data["merged_data"]
+    points, minutes = build_player_week_matrices(merged_data, GWS)
+    for i, p in enumerate(merged_data.index):
+        for j, w in enumerate(GWS):
+            assert points[i, j] == merged_data.loc[p, f"{w}_Pts"]
+            assert minutes[i, j] == merged_data.loc[p, f"{w}_xMins"]
+
+
+def test_coefficients_match_expression(data):
+    """Test that the coefficient block weights each slot like the per-player objective expression."""
+    points, _ = build_player_week_matrices(data["merged_data"], GWS)
+    coefficients = get_objective_coefficients(points, 0.1, BENCH_WEIGHTS)
+    assert coefficients.shape == (len(points), len(GWS), 4 + len(BENCH_WEIGHTS))
+    for i in range(len(points)):
+        for j in range(len(GWS)):
+            p = points[i, j]
+            expected = [p, p, 0.1 * p, p, *[BENCH_WEIGHTS[o] * p for o in sorted(BENCH_WEIGHTS)]]
+            assert coefficients[i, j] == pytest.approx(expected)
+
+
+def test_prepared_matrices_are_reused(data):
+    """Test that the matrices of prep_data are reused for the same gameweeks and rebuilt for others."""
+    prepared = {**data, "gws": GWS, "points_matrix": np.zeros((len(data["merged_data"]), len(GWS))), "minutes_matrix": None}
+    points, _ = get_player_week_matrices(prepared, GWS)
+    assert points is prepared["points_matrix"]
+    points, _ = get_player_week_matrices(prepared, GWS[:2])
+    assert np.array_equal(points, build_player_week_matrices(data["merged_data"], GWS[:2])[0])
@@ -0,0 +1,40 @@
+import re
+
+import pytest
+
+from tests.synthetic import NEXT_GW, make_data, solve, solve_scores
+
+CASES = {
+    "all": {"no_opposing_play": True},
+    "position": {"no_opposing_play": True, "opposing_play_group": "position"},
+    "penalty": {"no_opposing_play": "penalty", "opposing_play_penalty": 1},
+    "penalty_all": {"no_opposing_play": "penalty", "opposing_play_group": "all", "opposing_play_penalty": 0.5},
+    "free_hit": {"no_opposing_play": True, "use_fh": [NEXT_GW + 1]},
+    "bench_boost": {"no_opposing_play": True, "use_bb": [NEXT_GW]},
+    "iterations": {"no_opposing_play": True, "num_iterations": 2},
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_data()
+
+
+@pytest.mark.parametrize("options", CASES.values(), ids=CASES.keys())
+def test_lazy_matches_up_front(data, options):
+    """Test that adding opposing pairs lazily reaches the objectives of the model with every pair."""
+    up_front = solve_scores(data, model_builder="matrix", **options)
+    assert solve_scores(data, model_builder="matrix", opposing_play_lazy=True, **options) == pytest.approx(up_front, abs=1e-4)
+
+
+def test_lazy_lineups_have_no_opposing_players(data, capsys):
+    """Test that the lazy lineups field no two players of teams that face each other, with only some pairs added."""
+    (result,) = solve(data, model_builder="matrix", no_opposing_play=True, opposing_play_lazy=True)
+    added, total = map(int, re.search(r"(\d+) of (\d+) pairs added", capsys.readouterr().out).groups())
+    assert added < total
+    picks = result["picks"]
+    teams = data["merged_data"]["name"].to_dict()
+    for w in picks["week"].unique():
+        fielded = {teams[p] for p in picks.loc[(picks["week"] == w) & (picks["lineup"] == 1), "id"]}
+        meetings = [{f["home"], f["away"]} for f in data["fixtures"] if f["gw"] == w]
+        assert not any(meeting <= fielded for meeting in meetings)
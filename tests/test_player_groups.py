@@ -0,0 +1,35 @@
+import pytest
+
+from dev.solver import get_player_groups
+from tests.synthetic import make_data, solve_scores
+
+CASES = {
+    "defenders_per_team": {"max_defenders_per_team": 2, "num_transfers": 2},
+    "double_defense": {"double_defense_pick": True},
+    "no_transfer_by_position": {"no_transfer_by_position": ["M"], "num_transfers": 1},
+    "pick_prices": {"pick_prices": {"G": "", "D": "", "M": "7.5", "F": ""}},
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_data()
+
+
+def test_groups_match_player_scan(data):
+    """Test that each group holds the players a scan over all players finds, in the order of merged_data."""
+    merged_data = data["merged_data"]
+    groups = get_player_groups(merged_data)
+    for key, column in [("type", "element_type"), ("team", "name"), ("pos", "Pos")]:
+        assert set(groups[key]) == set(merged_data[column])
+        for value, players in groups[key].items():
+            assert players == [p for p in merged_data.index if merged_data.loc[p, column] == value]
+    for (team, pos), players in groups["team_pos"].items():
+        assert players == [p for p in merged_data.index if merged_data.loc[p, "name"] == team and merged_data.loc[p, "Pos"] == pos]
+
+
+@pytest.mark.parametrize("options", CASES.values(), ids=CASES.keys())
+def test_group_rules_match_matrix_builder(data, options):
+    """Test that the rules built from player groups reach the objective of the matrix builder, which builds them from masks."""
+    sasoptpy = solve_scores(data, model_builder="sasoptpy", **options)
+    assert sasoptpy == pytest.approx(solve_scores(data, model_builder="matrix", **options), abs=1e-4)
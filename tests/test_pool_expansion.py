@@ -0,0 +1,58 @@
+import copy
+
+import numpy as np
+import pytest
+
+from dev.matrix_solver import build_matrix_model, get_pool_prices, get_seed_pool
+from dev.solver import set_highs_options
+from tests.synthetic import BASE_OPTIONS, NEXT_GW, make_data, solve_scores
+
+CASES = {
+    "default": {},
+    "small_seed": {"pool_expansion_size": 1},
+    "hits": {"pool_expansion_size": 2, "num_transfers": 2},
+    "free_hit": {"pool_expansion_size": 2, "use_fh": [NEXT_GW + 1]},
+    "triple_captain": {"pool_expansion_size": 2, "use_tc": [NEXT_GW]},
+    "opposing_play": {"pool_expansion_size": 2, "no_opposing_play": True},
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_data()
+
+
+@pytest.fixture(scope="module")
+def prices(data):
+    options = {**BASE_OPTIONS, "pool_expansion_size": 1}
+    problem = build_matrix_model(copy.deepcopy(data), options)
+    model = problem["model"]
+    solver_instance = model.to_highs(problem["weights"])
+    set_highs_options(solver_instance, options)
+    pool = get_seed_pool(problem, data, options)
+    bound, prices = get_pool_prices(problem, solver_instance, pool)
+    return problem, pool, bound, prices
+
+
+@pytest.mark.parametrize("options", CASES.values(), ids=CASES.keys())
+def test_pool_expansion_matches_full_pool(data, options):
+    """Test that the plan of the expanded pool reaches the objective of the model with every player."""
+    full = solve_scores(data, model_builder="matrix", **options)
+    assert solve_scores(data, pool_expansion=True, **options) == pytest.approx(full, abs=1e-4)
+
+
+def test_prices_leave_players_out(prices):
+    """Test that the LP pricing leaves players out of the pool, and prices only the players outside it."""
+    problem, pool, _, prices = prices
+    assert 0 < pool.sum() < len(problem["players"])
+    assert np.all(prices[pool] == -np.inf)
+    assert np.all(prices[~pool] <= 1e-6)
+
+
+def test_price_bounds_plans_with_player(data, prices):
+    """Test that a plan holding a player outside the pool scores at most the LP bound plus the player's price."""
+    problem, pool, bound, prices = prices
+    outside = np.flatnonzero(~pool)
+    for i in outside[np.argsort(-prices[outside])[:3]]:
+        (score,) = solve_scores(data, model_builder="matrix", locked=[problem["players"][i]])
+        assert score <= bound + prices[i] + 1e-6
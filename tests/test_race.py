@@ -0,0 +1,32 @@
+import pytest
+
+from tests.synthetic import NEXT_GW, make_data, solve_scores
+
+CONFIGS = [{}, {"random_seed": 1}]
+CASES = {
+    "default": {},
+    "free_hit": {"use_fh": [NEXT_GW + 1]},
+    "iterations": {"num_iterations": 2},
+    "heuristic_start": {"num_transfers": 2, "heuristic_start": True},
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_data()
+
+
+@pytest.mark.parametrize("options", CASES.values(), ids=CASES.keys())
+def test_race_matches_single_solve(data, options, capsys):
+    """Test that racing HiGHS configurations reaches the objectives of a single solve and reports a winner."""
+    single = solve_scores(data, model_builder="matrix", **options)
+    assert solve_scores(data, race=True, race_configs=CONFIGS, **options) == pytest.approx(single, abs=1e-4)
+    assert "(winner)" in capsys.readouterr().out
+
+
+def test_lazy_opposing_play_solves_without_race(data, capsys):
+    """Test that lazy opposing play falls back to a single solve with the same objective."""
+    single = solve_scores(data, model_builder="matrix", no_opposing_play=True)
+    raced = solve_scores(data, race=True, race_configs=CONFIGS, no_opposing_play=True, opposing_play_lazy=True)
+    assert raced == pytest.approx(single, abs=1e-4)
+    assert "solving without a race" in capsys.readouterr().out
@@ -0,0 +1,46 @@
+import copy
+
+import pytest
+
+from dev.matrix_solver import solve_randomized_scenarios
+from dev.solver import randomize_points
+from tests.synthetic import BASE_OPTIONS, NEXT_GW, make_data, solve_scores
+
+GWS = [NEXT_GW, NEXT_GW + 1, NEXT_GW + 2]
+COUNT = 3
+SEED = 7
+
+CASES = {
+    "default": {},
+    "free_hit": {"use_fh": [NEXT_GW + 1]},
+    "opposing_play": {"no_opposing_play": True},
+}
+MATRIX_CASES = {
+    "fh_precompute": ({"use_fh": [NEXT_GW + 1]}, {"fh_precompute": True}),
+    "opposing_play_lazy": ({"no_opposing_play": True}, {"opposing_play_lazy": True}),
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_data()
+
+
+def scenario_data(data, scenario):
+    """``data`` with the noise of ``scenario``, as a separate randomized solve would see it"""
+    merged_data = data["merged_data"].copy()
+    randomize_points(merged_data, GWS, {"randomization_seed": SEED + scenario, "randomization_strength": 1})
+    return {**data, "merged_data": merged_data}
+
+
+def scenario_scores(data, **options):
+    options = {**copy.deepcopy(BASE_OPTIONS), "randomization_seed": SEED, "randomization_strength": 1, **options}
+    return [response[0]["score"] for response in solve_randomized_scenarios(copy.deepcopy(data), options, COUNT)]
+
+
+@pytest.mark.parametrize(("options", "matrix_options"), [(o, {}) for o in CASES.values()] + list(MATRIX_CASES.values()), ids=[*CASES, *MATRIX_CASES])
+def test_scenarios_match_separate_solves(data, options, matrix_options):
+    """Test that the scenarios solved on one model reach the objectives of separate solves on the randomized data."""
+    separate = [solve_scores(scenario_data(data, scenario), model_builder="sasoptpy", **options)[0] for scenario in range(COUNT)]
+    assert len(set(separate)) == COUNT
+    assert scenario_scores(data, **options, **matrix_options) == pytest.approx(separate, abs=1e-4)
@@ -0,0 +1,73 @@
+import re
+
+import pytest
+
+from dev.matrix_solver import get_rolling_horizon
+from tests.synthetic import BASE_OPTIONS, NEXT_GW, make_data, solve, solve_scores
+
+# with decay_base 0.9, the weights of the five gameweeks are 1, 0.9, 0.81, 0.729 and 0.6561
+HORIZONS = {
+    "off": ({}, 5),
+    "default_weight": ({"rolling_min_weight": 0.8}, 3),
+    "all_kept": ({"rolling_min_weight": 0.6}, 5),
+    "first_only": ({"rolling_min_weight": 1.1}, 1),
+    "regular_objective": ({"rolling_min_weight": 0.8, "objective": "regular"}, 5),
+    "chip": ({"rolling_min_weight": 0.8, "use_bb": [NEXT_GW + 3]}, 4),
+    "booked_transfer": ({"rolling_min_weight": 0.8, "booked_transfers": [{"gw": NEXT_GW + 4, "transfer_in": 59}]}, 5),
+    "banned_gw": ({"rolling_min_weight": 0.8, "banned_next_gw": [[59, NEXT_GW + 3]]}, 4),
+    "ft_state": ({"rolling_min_weight": 0.8, "force_ft_state_lb": [[NEXT_GW + 3, 2]]}, 4),
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_data(horizon=5)
+
+
+def get_report(output):
+    plan, bound, gap = re.search(r"plan (\S+), GW\d+-GW\d+ model bound (\S+), gap (\S+)%", output).groups()
+    return float(plan), float(bound), float(gap) / 100
+
+
+@pytest.mark.parametrize(("options", "horizon"), HORIZONS.values(), ids=HORIZONS.keys())
+def test_min_weight_drops_trailing_weeks(data, options, horizon):
+    """Test that rolling_min_weight drops the trailing gameweeks below the weight, unless an option names them."""
+    assert get_rolling_horizon(data, {**BASE_OPTIONS, "horizon": 5, **options}) == horizon
+
+
+def test_dropped_weeks_leave_the_plan(data):
+    """Test that the plan of a rolling horizon solve only covers the gameweeks kept by rolling_min_weight."""
+    (result,) = solve(data, horizon=5, rolling_horizon=True, rolling_window=2, rolling_min_weight=0.8)
+    assert sorted(result["picks"]["week"].unique()) == [NEXT_GW, NEXT_GW + 1, NEXT_GW + 2]
+
+
+@pytest.mark.parametrize("polish", [True, False], ids=["polish", "root_node"])
+def test_gap_is_against_full_model(data, capsys, polish):
+    """Test that the reported plan is the returned one, and that its gap is to a valid bound of the full model."""
+    (best,) = solve_scores(data, model_builder="matrix")
+    capsys.readouterr()
+    (result,) = solve(data, rolling_horizon=True, rolling_window=1, rolling_polish=polish)
+    plan, bound, gap = get_report(capsys.readouterr().out)
+    assert plan == pytest.approx(result["score"], abs=1e-3)
+    assert plan <= best + 1e-4
+    assert bound >= best - 1e-4
+    assert gap == pytest.approx((bound - plan) / abs(bound), abs=1e-4)
+    assert (result["rolling_horizon_bound"], result["rolling_horizon_gap"]) == pytest.approx((bound, gap), abs=1e-4)
+    if polish:
+        assert plan == pytest.approx(best, abs=1e-4)
+        assert gap == pytest.approx(0, abs=1e-4)
+
+
+def test_gap_covers_dropped_weeks(data, capsys):
+    """Test that with gameweeks dropped by rolling_min_weight, the bound is still above the optimum over the full horizon."""
+    (best,) = solve_scores(data, model_builder="matrix", horizon=5)
+    (truncated,) = solve_scores(data, model_builder="matrix")
+    capsys.readouterr()
+    (result,) = solve(data, horizon=5, rolling_horizon=True, rolling_window=2, rolling_min_weight=0.8)
+    _, bound, gap = get_report(capsys.readouterr().out)
+    assert result["score"] == pytest.approx(truncated, abs=1e-4)
+    assert result["rolling_horizon_bound"] == pytest.approx(bound, abs=1e-3)
+    assert bound >= best - 1e-4
+    assert bound > truncated + 1
+    assert gap == pytest.approx(result["rolling_horizon_gap"], abs=1e-4)
+    assert gap > 0
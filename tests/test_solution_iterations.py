@@ -0,0 +1,45 @@
+import pytest
+
+from tests.synthetic import NEXT_GW, make_data, solve, solve_scores
+
+CRITERIA = ["this_gw_transfer_in", "this_gw_transfer_out", "this_gw_transfer_in_out", "this_gw_lineup"]
+BB_WEEKS = [None, NEXT_GW, NEXT_GW + 1, NEXT_GW + 2]
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_data()
+
+
+def get_move(picks, criterion):
+    week = picks[picks["week"] == NEXT_GW]
+    bought = frozenset(week.loc[week["transfer_in"] == 1, "id"])
+    sold = frozenset(week.loc[week["transfer_out"] == 1, "id"])
+    lineup = frozenset(week.loc[week["lineup"] == 1, "id"])
+    moves = {"this_gw_transfer_in": bought, "this_gw_transfer_out": sold, "this_gw_transfer_in_out": (bought, sold), "this_gw_lineup": lineup}
+    return moves[criterion]
+
+
+@pytest.mark.parametrize("criterion", CRITERIA)
+def test_iterations_are_distinct_and_match_builders(data, criterion):
+    """Test that the iterations on one HiGHS instance find distinct moves, worse each time, with the same scores in both builders."""
+    options = {"num_iterations": 3, "iteration_criteria": criterion}
+    results = solve(data, model_builder="sasoptpy", **options)
+    scores = [result["score"] for result in results]
+    assert len(scores) == 3
+    assert scores == sorted(scores, reverse=True)
+    moves = [get_move(result["picks"], criterion) for result in results]
+    assert len(set(moves)) == 3
+    assert solve_scores(data, model_builder="matrix", **options) == pytest.approx(scores, abs=1e-4)
+
+
+@pytest.mark.parametrize("builder", ["sasoptpy", "matrix"])
+def test_chip_iterations_match_separate_solves(data, builder):
+    """Test that iterating over chip gameweeks finds the best placements of separate solves, one per new model."""
+    separate = []
+    for w in BB_WEEKS:
+        chips = {"use_bb": [w]} if w else {}
+        separate += solve_scores(data, model_builder=builder, **chips)
+    options = {"num_iterations": 3, "iteration_criteria": "chip_gws", "chip_limits": {"bb": 1, "wc": 0, "fh": 0, "tc": 0}}
+    scores = solve_scores(data, model_builder=builder, **options)
+    assert scores == pytest.approx(sorted(separate, reverse=True)[:3], abs=1e-4)
@@ -0,0 +1,109 @@
+import pandas as pd
+import pytest
+
+import dev.matrix_solver
+import dev.solver
+from dev.solver import BINARY_THRESHOLD
+from tests.synthetic import NEXT_GW, make_data, solve
+
+CASES = {
+    "transfers": {"num_transfers": 2},
+    "chips": {"use_fh": [NEXT_GW + 1], "use_tc": [NEXT_GW], "use_bb": [NEXT_GW + 2]},
+    "wildcard": {"use_wc": [NEXT_GW + 1]},
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_data()
+
+
+def loop_picks(solution_data, values, iteration):
+    """Picks built one player and gameweek at a time, as before the column-wise extraction"""
+    merged_data = solution_data["merged_data"]
+    type_data = solution_data["type_data"]
+    num_transfers = values["transfer_out"].sum(axis=0)
+    picks = []
+    for j, w in enumerate(solution_data["gws"]):
+        for i, p in enumerate(solution_data["players"]):
+            if values["squad"][i, j + 1] + values["squad_fh"][i, j] + values["transfer_out"][i, j] <= BINARY_THRESHOLD:
+                continue
+            lp = merged_data.loc[p]
+            fh_active = values["use_fh"][j] > BINARY_THRESHOLD
+            in_squad = values["squad_fh"][i, j] if fh_active else values["squad"][i, j + 1]
+            is_lineup = int(values["lineup"][i, j] > BINARY_THRESHOLD)
+            is_captain = int(values["captain"][i, j] > BINARY_THRESHOLD)
+            is_tc = int(values["use_tc"][i, j] > BINARY_THRESHOLD)
+            is_transfer_in = values["transfer_in"][i, j] > BINARY_THRESHOLD
+            is_transfer_out = values["transfer_out"][i, j] > BINARY_THRESHOLD
+            bench_value = -1
+            for o in range(values["bench"].shape[2]):
+                if values["bench"][i, j, o] > BINARY_THRESHOLD:
+                    bench_value = o
+            sold_first = solution_data["price_modified"][i] and values["transfer_out_first"][i, j] > BINARY_THRESHOLD
+            sell_price = solution_data["sell_price"][i] if sold_first else solution_data["buy_price"][i]
+            multiplier = is_lineup + is_captain + is_tc
+            if values["use_wc"][j] > BINARY_THRESHOLD:
+                chip_text = "WC"
+            elif fh_active:
+                chip_text = "FH"
+            elif values["use_bb"][j] > BINARY_THRESHOLD:
+                chip_text = "BB"
+            elif is_tc:
+                chip_text = "TC"
+            else:
+                chip_text = ""
+            picks.append(
+                {
+                    "id": p,
+                    "week": w,
+                    "name": lp["web_name"],
+                    "pos": type_data.loc[lp["element_type"], "singular_name_short"],
+                    "type": lp["element_type"],
+                    "team": lp["name"],
+                    "buy_price": solution_data["buy_price"][i] if is_transfer_in else 0,
+                    "sell_price": sell_price if is_transfer_out else 0,
+                    "xP": round(solution_data["points"][i, j], 2),
+                    "xMin": solution_data["minutes"][i, j],
+                    "squad": int(in_squad > BINARY_THRESHOLD),
+                    "lineup": is_lineup,
+                    "bench": bench_value,
+                    "captain": is_captain,
+                    "vicecaptain": int(values["vicecap"][i, j] > BINARY_THRESHOLD),
+                    "transfer_in": int(is_transfer_in),
+                    "transfer_out": int(is_transfer_out),
+                    "multiplier": multiplier,
+                    "xp_cont": solution_data["points"][i, j] * multiplier,
+                    "chip": chip_text,
+                    "iter": iteration,
+                    "ft": values["ft"][j + 1],
+                    "transfer_count": num_transfers[j],
+                }
+            )
+    return pd.DataFrame(picks)
+
+
+@pytest.mark.parametrize("builder", ["sasoptpy", "matrix"])
+@pytest.mark.parametrize("options", CASES.values(), ids=CASES.keys())
+def test_picks_match_player_loop(data, builder, options, monkeypatch):
+    """Test that the column-wise picks, statistics and xP match those built one player and gameweek at a time."""
+    summaries = []
+    summarize_solution = dev.solver.summarize_solution
+
+    def record_summary(solution_data, values, iteration, summary_options):
+        summary = summarize_solution(solution_data, values, iteration, summary_options)
+        summaries.append((loop_picks(solution_data, values, iteration), summary))
+        return summary
+
+    monkeypatch.setattr(dev.solver, "summarize_solution", record_summary)
+    monkeypatch.setattr(dev.matrix_solver, "summarize_solution", record_summary)
+    solve(data, model_builder=builder, **options)
+    ((expected, summary),) = summaries
+    picks = summary["picks"].sort_values(["week", "id"]).reset_index(drop=True)
+    expected = expected.sort_values(["week", "id"]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(picks, expected, check_dtype=False)
+    for w, week in expected.groupby("week"):
+        assert summary["statistics"][w]["xP"] == pytest.approx(week.loc[week["lineup"] == 1, "xp_cont"].sum())
+    lineups = expected[expected["lineup"] == 1]
+    # total_xp leaves out the extra captain points of TC
+    assert summary["total_xp"] == pytest.approx((lineups["xp_cont"] * (1 + lineups["captain"]) / lineups["multiplier"]).sum())
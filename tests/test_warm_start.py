@@ -0,0 +1,90 @@
+import copy
+
+import numpy as np
+import pytest
+
+import run.solve
+from dev.matrix_solver import build_matrix_model, get_plan_targets
+from tests.synthetic import BASE_OPTIONS, NEXT_GW, make_data, solve, solve_scores
+
+CASES = {
+    "default": {},
+    "hits": {"num_transfers": 2},
+    "free_hit": {"use_fh": [NEXT_GW + 1]},
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_data()
+
+
+@pytest.fixture(scope="module")
+def plans(data):
+    return {name: solve(data, model_builder="matrix", **options)[0]["picks"] for name, options in CASES.items()}
+
+
+def get_targets(data, plan, **options):
+    problem = build_matrix_model(copy.deepcopy(data), {**BASE_OPTIONS, **options})
+    return problem, get_plan_targets(problem, plan)
+
+
+@pytest.mark.parametrize("name", ["default", "hits"])
+def test_targets_follow_plan(data, plans, name):
+    """Test that the target squads and picks of each gameweek are the ones of the plan."""
+    plan = plans[name]
+    problem, targets = get_targets(data, plan)
+    players = np.asarray(problem["players"])
+    for j, w in enumerate(problem["gws"]):
+        week = plan.loc[plan["week"] == w]
+        assert set(players[targets["squads"][j]]) == set(week.loc[week["squad"] == 1, "id"])
+        assert set(players[targets["picks"][j]["lineup"]]) == set(week.loc[week["lineup"] == 1, "id"])
+        assert set(players[targets["picks"][j]["captain"]]) == set(week.loc[week["captain"] == 1, "id"])
+        bench = targets["picks"][j]["bench"]
+        assert sorted(bench[bench >= 0]) == list(range(len(problem["order"])))
+
+
+def test_free_hit_keeps_previous_squad(data, plans):
+    """Test that a Free Hit week of the plan targets the squad of the week before it, with no picks."""
+    _, targets = get_targets(data, plans["free_hit"], use_fh=[NEXT_GW + 1])
+    assert targets["chips"] == {1: "fh"}
+    assert np.array_equal(targets["squads"][1], targets["squads"][0])
+    assert 1 not in targets["picks"]
+
+
+def test_players_out_of_pool_are_dropped(data, plans):
+    """Test that players of the plan that left the pool are dropped from the target squads."""
+    plan = plans["hits"]
+    bought = plan.loc[(plan["week"] == NEXT_GW) & (plan["transfer_in"] == 1), "id"].tolist()
+    short_data = copy.deepcopy(data)
+    short_data["merged_data"] = short_data["merged_data"].drop(index=bought[0])
+    problem, targets = get_targets(short_data, plan)
+    assert targets["squads"][0].sum() == 14
+    assert bought[0] not in problem["players"]
+
+
+@pytest.mark.parametrize(
+    ("name", "options"),
+    [("default", {}), ("hits", {}), ("hits", {"banned": "bought"}), ("free_hit", {"use_fh": [NEXT_GW + 1]}), ("free_hit", {})],
+    ids=["same_settings", "same_hits", "banned_buy", "same_free_hit", "free_hit_dropped"],
+)
+def test_warm_start_matches_cold_solve(data, plans, name, options):
+    """Test that a solve started from a plan, repaired where the settings changed, reaches the objective of a cold solve."""
+    plan = plans[name]
+    if options.get("banned") == "bought":
+        options = {"banned": plan.loc[(plan["week"] == NEXT_GW) & (plan["transfer_in"] == 1), "id"].tolist()[:1]}
+    cold = solve_scores(data, model_builder="matrix", **options)
+    warm = solve_scores({**data, "previous_plan": plan}, **options)
+    assert warm == pytest.approx(cold, abs=1e-4)
+
+
+def test_saved_plan_is_read_back(data, plans, tmp_path, monkeypatch):
+    """Test that a saved plan is found again by the warm start, and that an empty response saves nothing."""
+    monkeypatch.setattr(run.solve, "DATA_DIR", tmp_path)
+    options = {"solve_name": "test", "warm_start_plan": "latest"}
+    run.solve.save_plan([], options)
+    assert run.solve.get_previous_plan(options, NEXT_GW) is None
+    run.solve.save_plan([{"score": 1, "picks": plans["default"]}, {"score": 0, "picks": plans["hits"]}], options)
+    plan = run.solve.get_previous_plan(options, NEXT_GW)
+    assert plan[["id", "week", "squad"]].equals(plans["default"][["id", "week", "squad"]].reset_index(drop=True))
+    assert run.solve.get_previous_plan(options, NEXT_GW + 3) is None
@@ -1,7 +1,6 @@
 import json
 import random
 import string
-from itertools import product
 
 from paths import DATA_DIR
 
@@ -24,19 +23,50 @@ def xmin_to_prob(xmin, sub_on=0.5, sub_off=0.3):
     return start + (1 - start) * sub_on
 
 
-def get_dict_combinations(my_dict):
-    keys = my_dict.keys()
-    for key in keys:
-        if my_dict[key] is None or len(my_dict[key]) == 0:
-            my_dict[key] = [None]
-    all_combs = [dict(zip(my_dict.keys(), values, strict=False)) for values in product(*my_dict.values())]
-    feasible_combs = []
-    for comb in all_combs:
-        c_values = [i for i in comb.values() if i is not None]
-        if len(c_values) == len(set(c_values)):
-            feasible_combs.append({k: [v] for k, v in comb.items() if v is not None})
-        # else we have a duplicate
-    return feasible_combs
+def get_chip_combinations(chip_gameweeks, options=None):
+    """
+    Yields the feasible combinations of chip gameweeks, e.g. ``{"use_bb": [1], "use_fh": [3]}``
+
+    Parameters
+    ----------
+    chip_gameweeks: dict
+        Candidate gameweeks of each chip, e.g. ``{"use_bb": [None, 1, 2], "use_fh": [None, 2, 3]}``, where ``None`` stands
+        for not using the chip. Chips with no candidates are not used. The dict is not modified.
+    options: dict, optional
+        Solver options whose chip rules are applied: ``no_chip_gws`` (for WC, BB and FH, as in the solver) and
+        ``allowed_chip_gws``. Two chips are never played in the same gameweek.
+
+    Combinations are generated chip by chip, and a partial combination is dropped as soon as it breaks a rule.
+    """
+    options = options or {}
+    no_chip_gws = set(options.get("no_chip_gws", []))
+    allowed_chip_gws = options.get("allowed_chip_gws", {})
+
+    candidates = []
+    for key, values in chip_gameweeks.items():
+        chip = key.removeprefix("use_")
+        allowed = allowed_chip_gws.get(chip, [])
+        gws = list(dict.fromkeys(values)) if values else [None]
+        keep = [gw for gw in gws if gw is None or ((chip == "tc" or gw not in no_chip_gws) and (len(allowed) == 0 or gw in allowed))]
+        candidates.append((key, keep))
+
+    def extend(i, used_gws, combination):
+        if i == len(candidates):
+            yield combination
+            return
+        key, values = candidates[i]
+        for gw in values:
+            if gw is None:
+                yield from extend(i + 1, used_gws, combination)
+            elif gw not in used_gws:
+                yield from extend(i + 1, used_gws | {gw}, {**combination, key: [gw]})
+
+    return extend(0, frozenset(), {})
+
+
+def count_chip_combinations(chip_gameweeks, options=None):
+    """Returns the number of combinations ``get_chip_combinations`` yields, without storing them"""
+    return sum(1 for _ in get_chip_combinations(chip_gameweeks, options))
 
 
 def load_config_files(config_paths):